@@ -0,0 +1,104 @@
+import os
+import socket
+import tempfile
+import time
+
+from bench_wallet_server import HOST, PORT, start_server_process, stop_server_process
+from wallet_client import WalletClient, WalletClientPool
+from wallet_protocol import pack_request
+
+# Benchmark configuration
+SEQUENTIAL_OPS = 1000   # Requests sent one at a time
+BATCH_OPS = 20000       # Requests sent as one pipelined batch
+ACCOUNTS = 64           # Accounts the batches spread over
+POOL_SIZE = 4
+SHARDS = 0              # Server keeps the accounts in its own process
+GROUP_COMMIT_MS = 0.0   # Flush as soon as a request waits; later ones batch behind it
+
+def workload(count):
+    """count requests alternating a credit and a debit of 1 on each of ACCOUNTS accounts."""
+    return [(b'CR' if (i // ACCOUNTS) % 2 == 0 else b'DB', 1, i % ACCOUNTS) for i in range(count)]
+
+def connect_per_request(requests):
+    """The original path: a new TCP connection for every request. Returns per-request latencies."""
+    latencies = []
+    for request in requests:
+        message, response_format = pack_request(*request)
+        start = time.perf_counter()
+        with socket.create_connection((HOST, PORT)) as sock:
+            sock.sendall(message)
+            response = b''
+            while len(response) < response_format.size:
+                chunk = sock.recv(response_format.size - len(response))
+                if not chunk:
+                    raise ConnectionError("server closed the connection")
+                response += chunk
+        latencies.append(time.perf_counter() - start)
+        assert response[:2] == b'BA', response
+    return latencies
+
+def persistent(requests):
+    """One connection, one request at a time. Returns per-request latencies."""
+    latencies = []
+    with WalletClient(HOST, PORT) as client:
+        for request in requests:
+            start = time.perf_counter()
+            response_code, _ = client.request(*request)
+            latencies.append(time.perf_counter() - start)
+            assert response_code == b'BA'
+    return latencies
+
+def pipelined(requests):
+    """One connection, the whole batch pipelined."""
+    with WalletClient(HOST, PORT) as client:
+        replies = client.submit(requests)
+    assert all(response_code == b'BA' for response_code, _ in replies)
+
+def pooled(requests):
+    """POOL_SIZE pipelined connections sharing the batch."""
+    with WalletClientPool(POOL_SIZE, HOST, PORT) as pool:
+        replies = pool.submit(requests)
+    assert all(response_code == b'BA' for response_code, _ in replies)
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main():
+    print("=" * 60)
+    print("WALLET CLIENT BENCHMARK")
+    print("=" * 60)
+    print(f"Server with {SHARDS or 'no'} shards, group commit window {GROUP_COMMIT_MS:g} ms, "
+          f"{os.cpu_count()} CPU(s); every reply is durable")
+    
+    header = f"{'Path':<24}{'Ops':>7}{'Ops/s':>10}{'us/op':>9}{'p50 us':>9}{'p99 us':>9}"
+    print()
+    print(header)
+    print("-" * len(header))
+    cases = [
+        ("connect per request", connect_per_request, SEQUENTIAL_OPS),
+        ("persistent", persistent, SEQUENTIAL_OPS),
+        ("persistent, pipelined", pipelined, BATCH_OPS),
+        (f"pool of {POOL_SIZE}, pipelined", pooled, BATCH_OPS),
+    ]
+    with tempfile.TemporaryDirectory() as data_dir:
+        process = start_server_process(data_dir, SHARDS, GROUP_COMMIT_MS)
+        try:
+            for name, run, count in cases:
+                requests = workload(count)
+                start = time.perf_counter()
+                latencies = run(requests)
+                elapsed = time.perf_counter() - start
+                if latencies:
+                    p50 = f"{percentile(latencies, 0.5) * 1e6:>9.0f}"
+                    p99 = f"{percentile(latencies, 0.99) * 1e6:>9.0f}"
+                else:
+                    p50 = p99 = f"{'-':>9}"
+                print(f"{name:<24}{count:>7}{count / elapsed:>10,.0f}{elapsed / count * 1e6:>9.1f}{p50}{p99}")
+        finally:
+            stop_server_process(process)
+    
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
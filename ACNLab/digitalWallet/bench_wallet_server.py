@@ -0,0 +1,112 @@
+import asyncio
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from wallet_protocol import V2_REQUEST, V2_RESPONSE
+
+# Load test configuration
+HOST = '127.0.0.1'
+PORT = 5655
+CONCURRENCY = [1, 100, 1000]  # Simultaneous clients
+DURATION = 3.0                # Seconds per concurrency level
+GROUP_COMMIT_MS = [0.0, 1.0]  # Journal flush batching windows to compare
+SHARDS = [0, 4]               # Account worker processes to compare (0 = in the server process)
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wallet_server.py')
+
+def start_server_process(data_dir, shards, group_commit_ms):
+    """Start wallet_server.py in its own process and wait until it accepts connections."""
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, '--host', HOST, '--port', str(PORT), '--quiet',
+         '--data-dir', data_dir, '--shards', str(shards), '--group-commit-ms', str(group_commit_ms)],
+        stdout=subprocess.PIPE, text=True)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection((HOST, PORT), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("wallet server did not start")
+
+def stop_server_process(process):
+    """Interrupt the server so it closes its ledgers; return the number of fsyncs they made."""
+    process.send_signal(signal.SIGINT)
+    output, _ = process.communicate()
+    return sum(int(fsyncs) for fsyncs in re.findall(r'with (\d+) fsyncs', output))
+
+async def client(index, stop, counts):
+    """
+    One client in a loop: connect, send one instruction, read the reply.
+    Each client has its own account and alternates credits and debits of
+    1 on it, so the balance stays in range.
+    """
+    n = 0
+    while not stop.is_set():
+        opcode = b'CA' if n % 2 == 0 else b'DA'
+        n += 1
+        try:
+            reader, writer = await asyncio.open_connection(HOST, PORT)
+            writer.write(V2_REQUEST.pack(opcode, index, 1))
+            response = await reader.readexactly(V2_RESPONSE.size)
+            writer.close()
+            await writer.wait_closed()
+            counts['ok' if response[:2] == b'BA' else 'rejected'] += 1
+        except (OSError, asyncio.IncompleteReadError):
+            counts['errors'] += 1
+
+async def run_workload(num_clients):
+    """
+    Run num_clients concurrent clients for DURATION seconds.
+    
+    Returns:
+        (requests per second, rejected replies, connection errors)
+    """
+    stop = asyncio.Event()
+    counts = {'ok': 0, 'rejected': 0, 'errors': 0}
+    tasks = [asyncio.create_task(client(i, stop, counts)) for i in range(num_clients)]
+    start_time = time.perf_counter()
+    await asyncio.sleep(DURATION)
+    stop.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start_time
+    return (counts['ok'] + counts['rejected']) / elapsed, counts['rejected'], counts['errors']
+
+def main():
+    print("=" * 60)
+    print("WALLET SERVER LOAD TEST")
+    print("=" * 60)
+    print(f"One connection per request, {DURATION:.0f}s per level, "
+          f"server and clients on {os.cpu_count()} CPU(s)")
+    print("Every reply waits for its journal record to be fsynced; one account per client")
+    
+    header = (f"{'Shards':>7}{'Window ms':>10}{'Clients':>8}{'Requests/s':>14}{'Req/fsync':>11}"
+              f"{'Rejected':>10}{'Errors':>8}")
+    print()
+    print(header)
+    print("-" * len(header))
+    for shards in SHARDS:
+        for group_commit_ms in GROUP_COMMIT_MS:
+            for num_clients in CONCURRENCY:
+                # Fresh server and ledger per row, so the fsync count is this row's
+                with tempfile.TemporaryDirectory() as data_dir:
+                    process = start_server_process(data_dir, shards, group_commit_ms)
+                    try:
+                        throughput, rejected, errors = asyncio.run(run_workload(num_clients))
+                    finally:
+                        fsyncs = stop_server_process(process)
+                per_fsync = throughput * DURATION / max(fsyncs, 1)
+                print(f"{shards:>7}{group_commit_ms:>10g}{num_clients:>8}{throughput:>14,.0f}"
+                      f"{per_fsync:>11.1f}{rejected:>10}{errors:>8}")
+    
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,65 @@
+import argparse
+import asyncio
+import collections
+import json
+import random
 import socket
-import struct
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from wallet_protocol import (DEFAULT_ACCOUNT, MAX_BALANCE, MAX_BALANCE_V2, V1_REQUEST, V1_RESPONSE,
+                             V2_OPCODES, V2_REQUEST, V2_RESPONSE, FrameBuffer, pack_request, shard_of)
 
 # Server Configuration
 HOST = '127.0.0.1'
 PORT = 5555
+PIPELINE_DEPTH = 256  # Requests a persistent connection keeps in flight
+POOL_SIZE = 4         # Connections in a client pool
+
+# Load Generator Configuration
+LOAD_CONNECTIONS = 50
+LOAD_DURATION = 10.0       # Seconds of sending
+LOAD_CREDIT_RATIO = 0.5    # Fraction of requests that are credits; the rest are debits
+LOAD_ACCOUNTS = 1000       # Accounts requests spread over (0 = version 1 requests on the default account)
+LOAD_DRAIN_TIMEOUT = 5.0   # Seconds to wait for outstanding replies after sending stops
+LOAD_REQUEST_POOL = 4096   # Distinct encoded requests cycled through
 
-def send_instruction(instruction, amount):
+def send_instruction(instruction, amount, account=None):
     """
     Send instruction to wallet server and receive response.
     
+    Without an account the version 1 message is sent, which acts on the
+    server's default account; with one, the version 2 message is sent.
+    
     Args:
-        instruction: 'CR' for credit or 'DB' for debit
-        amount: Amount to credit or debit (0-65535)
+        instruction: 'CR' for credit, 'DB' for debit, 'QB' to query the
+                     balance (needs an account)
+        amount: Amount to credit or debit (0-65535, or up to 2^63-1 with
+                an account)
+        account: Account id (0 to 2^64-1), or None for the version 1 message
     """
+    if account is None:
+        request, response_format, max_amount = V1_REQUEST, V1_RESPONSE, MAX_BALANCE
+        instructions = ['CR', 'DB']
+    else:
+        request, response_format, max_amount = V2_REQUEST, V2_RESPONSE, MAX_BALANCE_V2
+        instructions = [operation.decode('ascii') for operation in V2_OPCODES]
+    
     # Validate instruction
-    if instruction not in ['CR', 'DB']:
-        print("Error: Invalid instruction. Use 'CR' or 'DB'.")
+    if instruction not in instructions:
+        print(f"Error: Invalid instruction. Use {' or '.join(repr(i) for i in instructions)}.")
         return
     
     # Validate amount
-    if not (0 <= amount <= 65535):
-        print("Error: Amount must be between 0 and 65535.")
+    if not (0 <= amount <= max_amount):
+        print(f"Error: Amount must be between 0 and {max_amount}.")
+        return
+    
+    # Validate account
+    if account is not None and not (0 <= account < 2 ** 64):
+        print("Error: Account must be between 0 and 2^64-1.")
         return
     
     try:
@@ -30,22 +68,28 @@ def send_instruction(instruction, amount):
         client_socket.connect((HOST, PORT))
         print(f"Connected to server at {HOST}:{PORT}")
         
-        # Pack instruction message: 2-byte instruction + 2-byte unsigned short amount
-        instruction_bytes = instruction.encode('ascii')
-        message = instruction_bytes + struct.pack('!H', amount)
-        
-        print(f"Sending: Instruction={instruction}, Amount={amount}")
+        if account is None:
+            # Pack instruction message: 2-byte instruction + 2-byte unsigned short amount
+            message = request.pack(instruction.encode('ascii'), amount)
+            print(f"Sending: Instruction={instruction}, Amount={amount}")
+        else:
+            # Pack version 2 message: 2-byte opcode + 8-byte account + 8-byte amount
+            message = request.pack(V2_OPCODES[instruction.encode('ascii')], account, amount)
+            print(f"Sending: Instruction={instruction}, Account={account}, Amount={amount}")
         
         # Send instruction to server
         client_socket.sendall(message)
         
-        # Receive 4-byte response
-        response = client_socket.recv(4)
+        # Receive response (it may arrive in pieces)
+        try:
+            response = FrameBuffer(response_format.size).read(client_socket, response_format)
+        except ConnectionError:
+            response = None
         
-        if len(response) == 4:
-            # Unpack response: 2-byte response code + 2-byte unsigned short value
-            response_code = response[:2].decode('ascii')
-            value = struct.unpack('!H', response[2:4])[0]
+        if response:
+            # Unpack response: 2-byte response code + value
+            response_code, value = response
+            response_code = response_code.decode('ascii')
             
             # Print result
             if response_code == 'BA':
@@ -57,7 +101,7 @@ def send_instruction(instruction, amount):
                 if instruction == 'DB':
                     print("Reason: Insufficient balance for debit operation.")
                 elif instruction == 'CR':
-                    print("Reason: Credit would exceed maximum balance (65535).")
+                    print(f"Reason: Credit would exceed maximum balance ({max_amount}).")
             else:
                 print(f"Unknown response code: {response_code}")
         else:
@@ -72,22 +116,359 @@ def send_instruction(instruction, amount):
     except Exception as e:
         print(f"Error: {e}")
 
+class WalletClient:
+    """
+    A connection to the wallet server kept open for many requests.
+    
+    submit() pipelines: it keeps up to depth requests in flight and reads
+    replies (which come back in request order) while the rest are still
+    on their way, so a batch costs a handful of round trips instead of a
+    TCP handshake and a round trip per request.
+    """
+    
+    def __init__(self, host=HOST, port=PORT, depth=PIPELINE_DEPTH):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.depth = depth
+        self.frames = FrameBuffer()
+        self.lock = threading.Lock()  # One batch at a time on the connection
+    
+    def request(self, instruction, amount, account=None):
+        """Send one request and return its (response_code, value)."""
+        return self.submit([(instruction, amount, account)])[0]
+    
+    def submit(self, requests):
+        """
+        Send a batch of requests and return their replies in order.
+        
+        Args:
+            requests: (instruction, amount) or (instruction, amount, account)
+                      tuples, instruction as bytes (b'CR', b'DB', b'QB')
+        
+        Returns:
+            list of (response_code, value)
+        """
+        encoded = [pack_request(*request) for request in requests]
+        replies = []
+        with self.lock:
+            sent = 0
+            while len(replies) < len(encoded):
+                # Top the pipeline up to depth requests in flight
+                end = min(len(replies) + self.depth, len(encoded))
+                if sent < end:
+                    self.sock.sendall(b''.join(message for message, _ in encoded[sent:end]))
+                    sent = end
+                
+                # Read the older half, so the rest stays in flight meanwhile;
+                # each recv decodes every reply it completes
+                target = len(replies) + min(max(1, self.depth // 2), sent - len(replies))
+                while len(replies) < target:
+                    reply = self.frames.unpack(encoded[len(replies)][1])
+                    if reply is not None:
+                        replies.append(reply)
+                    elif not self.frames.recv_into(self.sock):
+                        raise ConnectionError("server closed the connection")
+        return replies
+    
+    def close(self):
+        self.sock.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+class WalletClientPool:
+    """
+    A fixed set of persistent connections sharing batches.
+    
+    submit() splits a batch across the connections by account hash, so
+    all requests on one account travel in order on one connection, runs
+    the connections' pipelines side by side on threads, and returns the
+    replies in batch order.
+    """
+    
+    def __init__(self, size=POOL_SIZE, host=HOST, port=PORT, depth=PIPELINE_DEPTH):
+        self.clients = [WalletClient(host, port, depth) for _ in range(size)]
+        self.executor = ThreadPoolExecutor(size)
+    
+    def submit(self, requests):
+        """Send a batch of requests (as for WalletClient.submit) and return their replies in order."""
+        requests = list(requests)
+        parts = [[] for _ in self.clients]
+        for index, request in enumerate(requests):
+            account = request[2] if len(request) > 2 and request[2] is not None else DEFAULT_ACCOUNT
+            parts[shard_of(account, len(self.clients))].append(index)
+        
+        futures = [(indices, self.executor.submit(client.submit, [requests[i] for i in indices]))
+                   for client, indices in zip(self.clients, parts) if indices]
+        replies = [None] * len(requests)
+        for indices, future in futures:
+            for index, reply in zip(indices, future.result()):
+                replies[index] = reply
+        return replies
+    
+    def close(self):
+        self.executor.shutdown()
+        for client in self.clients:
+            client.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+class LoadStats:
+    """Outcome of a load run: reply latencies, rejections and errors."""
+    
+    def __init__(self):
+        self.sent = 0
+        self.latencies = []  # Seconds per answered request
+        self.rejected = 0    # 'ER' replies
+        self.errors = 0      # Requests never answered (connection lost or drain timeout)
+    
+    def record(self, latency, response_code):
+        self.latencies.append(latency)
+        if response_code != b'BA':
+            self.rejected += 1
+    
+    def summary(self, elapsed):
+        """Throughput and latency percentiles (in ms) as a dict."""
+        ordered = sorted(self.latencies)
+        
+        def percentile(fraction):
+            if not ordered:
+                return None
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+        
+        return {
+            'elapsed_s': elapsed,
+            'sent': self.sent,
+            'completed': len(ordered),
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'throughput_rps': len(ordered) / elapsed if elapsed else 0.0,
+            'latency_ms': {
+                'mean': sum(ordered) / len(ordered) * 1000 if ordered else None,
+                'p50': percentile(0.5),
+                'p99': percentile(0.99),
+                'p999': percentile(0.999),
+                'max': ordered[-1] * 1000 if ordered else None,
+            },
+        }
+
+class LoadConnection(asyncio.BufferedProtocol):
+    """
+    One load generator connection. Requests are pipelined; replies come
+    back in request order, so each reply completes the oldest request and
+    its latency is measured from that request's start time.
+    """
+    
+    def __init__(self, stats, on_reply=None):
+        self.stats = stats
+        self.on_reply = on_reply  # Called after each reply (closed loop sends the next request)
+        self.frames = FrameBuffer()
+        self.outstanding = collections.deque()  # (start time, response struct)
+        self.transport = None
+        self.closed = asyncio.get_running_loop().create_future()
+    
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def send(self, request, start):
+        message, response_format = request
+        self.outstanding.append((start, response_format))
+        self.stats.sent += 1
+        self.transport.write(message)
+    
+    def get_buffer(self, sizehint):
+        return self.frames.space()
+    
+    def buffer_updated(self, nbytes):
+        self.frames.commit(nbytes)
+        now = time.perf_counter()
+        while self.outstanding:
+            reply = self.frames.unpack(self.outstanding[0][1])
+            if reply is None:
+                break
+            start, _ = self.outstanding.popleft()
+            self.stats.record(now - start, reply[0])
+            if self.on_reply:
+                self.on_reply(self)
+    
+    def connection_lost(self, exc):
+        self.stats.errors += len(self.outstanding)
+        self.outstanding.clear()
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+def load_requests(credit_ratio, accounts, amount, seed=None):
+    """Encoded requests for the load mix: credits with probability credit_ratio, debits otherwise."""
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(LOAD_REQUEST_POOL):
+        instruction = b'CR' if rng.random() < credit_ratio else b'DB'
+        account = rng.randrange(accounts) if accounts else None
+        requests.append(pack_request(instruction, amount, account))
+    return requests
+
+async def run_load(host=HOST, port=PORT, connections=LOAD_CONNECTIONS, duration=LOAD_DURATION,
+                   rate=None, depth=1, credit_ratio=LOAD_CREDIT_RATIO, accounts=LOAD_ACCOUNTS,
+                   amount=1, seed=None):
+    """
+    Drive the server from many concurrent connections and measure it.
+    
+    Closed loop (rate None): each connection keeps depth requests in
+    flight and sends the next as soon as a reply comes, so the offered
+    load adapts to the server. Open loop: requests are issued at a fixed
+    total rate, round robin over the connections, whatever the replies
+    do; latency counts from when each request was due, so time spent
+    behind a slow server is not hidden.
+    
+    Returns:
+        dict of the configuration and LoadStats.summary()
+    """
+    loop = asyncio.get_running_loop()
+    stats = LoadStats()
+    requests = load_requests(credit_ratio, accounts, amount, seed)
+    counter = 0
+    sending = True
+    
+    def next_request():
+        nonlocal counter
+        counter += 1
+        return requests[counter % len(requests)]
+    
+    def send_next(connection):
+        if sending:
+            connection.send(next_request(), time.perf_counter())
+    
+    on_reply = send_next if rate is None else None
+    pool = []
+    for _ in range(connections):
+        _, connection = await loop.create_connection(lambda: LoadConnection(stats, on_reply), host, port)
+        pool.append(connection)
+    
+    start = time.perf_counter()
+    end = start + duration
+    if rate is None:
+        for connection in pool:
+            for _ in range(depth):
+                connection.send(next_request(), time.perf_counter())
+        await asyncio.sleep(duration)
+    else:
+        interval = 1 / rate
+        due = start
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            # Issue everything due by now (the sleep below wakes coarsely)
+            while due <= now:
+                pool[counter % len(pool)].send(next_request(), due)
+                due += interval
+            await asyncio.sleep(max(0.0, min(due, end) - time.perf_counter()))
+    sending = False
+    
+    # Let outstanding replies arrive, then count the rest as errors
+    drain_end = time.perf_counter() + LOAD_DRAIN_TIMEOUT
+    while any(connection.outstanding for connection in pool) and time.perf_counter() < drain_end:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    for connection in pool:
+        connection.transport.close()
+    await asyncio.gather(*(connection.closed for connection in pool))
+    
+    return {
+        'config': {
+            'host': host, 'port': port, 'connections': connections, 'duration_s': duration,
+            'mode': 'closed' if rate is None else 'open', 'rate_rps': rate, 'depth': depth,
+            'credit_ratio': credit_ratio, 'accounts': accounts, 'amount': amount,
+        },
+        **stats.summary(elapsed),
+    }
+
+def print_load_result(result):
+    """Print a run_load() result."""
+    config, latency = result['config'], result['latency_ms']
+    
+    def ms(value):
+        return f"{value:.3f} ms" if value is not None else "-"
+    
+    print("=" * 60)
+    print("WALLET LOAD TEST")
+    print("=" * 60)
+    mode = (f"open loop at {config['rate_rps']:,.0f} req/s" if config['mode'] == 'open'
+            else f"closed loop, {config['depth']} in flight per connection")
+    print(f"Server: {config['host']}:{config['port']}")
+    print(f"Load: {config['connections']} connections, {mode}, {config['duration_s']:g}s")
+    print(f"Mix: {config['credit_ratio']:.0%} credits, amount {config['amount']}, "
+          f"{config['accounts'] or 'default'} account(s)")
+    print("-" * 60)
+    print(f"Sent:       {result['sent']:,}")
+    print(f"Completed:  {result['completed']:,} ({result['rejected']:,} rejected)")
+    print(f"Errors:     {result['errors']:,}")
+    print(f"Throughput: {result['throughput_rps']:,.0f} req/s")
+    print(f"Latency:    mean {ms(latency['mean'])}, p50 {ms(latency['p50'])}, "
+          f"p99 {ms(latency['p99'])}, p999 {ms(latency['p999'])}, max {ms(latency['max'])}")
+    print("=" * 60)
+
+def load_main(argv):
+    """Command line of the load generator mode: python client.py load [options]."""
+    parser = argparse.ArgumentParser(prog="client.py load", description="Wallet server load generator")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--connections', type=int, default=LOAD_CONNECTIONS)
+    parser.add_argument('--duration', type=float, default=LOAD_DURATION, help="Seconds of sending")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Open loop: total requests per second (default: closed loop)")
+    parser.add_argument('--depth', type=int, default=1,
+                        help="Closed loop: requests in flight per connection")
+    parser.add_argument('--credit-ratio', type=float, default=LOAD_CREDIT_RATIO,
+                        help="Fraction of requests that are credits")
+    parser.add_argument('--accounts', type=int, default=LOAD_ACCOUNTS,
+                        help="Accounts to spread over (0 = version 1 requests)")
+    parser.add_argument('--amount', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', metavar='PATH', help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+    
+    result = asyncio.run(run_load(args.host, args.port, args.connections, args.duration, args.rate,
+                                  args.depth, args.credit_ratio, args.accounts, args.amount, args.seed))
+    print_load_result(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.json}")
+
 def main():
     """Main function to run the client."""
+    if len(sys.argv) > 1 and sys.argv[1] == 'load':
+        # Load generator mode: python client.py load [options]
+        load_main(sys.argv[2:])
+        return
+    
     print("=== Digital Wallet Client ===\n")
     
-    if len(sys.argv) == 3:
-        # Command line mode: python client.py CR 1000
+    if len(sys.argv) in (3, 4):
+        # Command line mode: python client.py CR 1000 [ACCOUNT]
         instruction = sys.argv[1].upper()
         try:
             amount = int(sys.argv[2])
-            send_instruction(instruction, amount)
+            account = int(sys.argv[3]) if len(sys.argv) == 4 else None
+            send_instruction(instruction, amount, account)
         except ValueError:
-            print("Error: Amount must be an integer.")
+            print("Error: Amount and account must be integers.")
     else:
         # Interactive mode
-        print("Usage: python client.py <INSTRUCTION> <AMOUNT>")
+        print("Usage: python client.py <INSTRUCTION> <AMOUNT> [ACCOUNT]")
         print("Example: python client.py CR 1000")
+        print("Example: python client.py CR 5000000 42")
+        print("Example: python client.py QB 0 42")
+        print("Load test: python client.py load --help")
         print("\nOr run interactively:\n")
         
         try:
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Journal record: lsn, account, 2-byte instruction, amount, account balance after the instruction
+RECORD = struct.Struct('<QQ2sQQ')
+CRC = struct.Struct('<I')
+RECORD_SIZE = RECORD.size + CRC.size
+
+# Every journal segment starts with a header: magic, format version.
+# Version 1 was the unversioned single-account layout ('<Q2sHQ' records).
+FORMAT_VERSION = 2
+JOURNAL_MAGIC = b'WLJN'
+JOURNAL_HEADER = struct.Struct('<4sI')
+
+JOURNAL_PREFIX = 'journal-'
+JOURNAL_SUFFIX = '.log'
+SNAPSHOT_FILE = 'snapshot.json'
+
+class Ledger:
+    """
+    Crash-safe record of every balance change of a set of accounts.
+    
+    Each successful instruction is appended to a journal as a fixed-size
+    record carrying a CRC and the account balance it produced. Appends
+    only fill an in-memory buffer; durability comes from group commit:
+    the first request that needs its record on disk starts a flush, which
+    waits group_commit_window for more records, then writes and fsyncs
+    the whole buffer on a worker thread while the event loop keeps serving.
+    Every request waiting on that flush is released by its one fsync.
+    If a flush fails, its waiters get the error and the journal is cut
+    back to what was synced before it; the ledger then refuses every
+    later wait and writes nothing more, so no record a caller was told
+    failed ever becomes durable.
+    
+    Every snapshot_interval records a flush also writes a snapshot (all
+    balances as of its last record) and starts a new journal segment, so
+    startup reads the snapshot and replays only the records after it.
+    
+    Methods must be called from the event loop thread.
+    """
+    
+    def __init__(self, directory, group_commit_window=0.001, snapshot_interval=100000, sync=True):
+        """
+        Open (or create) the ledger in directory and recover the balances.
+        
+        Args:
+            directory: Where the snapshot and journal segments live
+            group_commit_window: Seconds a flush waits for more records
+                       before syncing (0 = sync right away)
+            snapshot_interval: Records between snapshots
+            sync: If False, skip fsync (data reaches the OS only); for testing
+        """
+        self.directory = directory
+        self.group_commit_window = group_commit_window
+        self.snapshot_interval = snapshot_interval
+        self.sync = sync
+        os.makedirs(directory, exist_ok=True)
+        
+        # One writer thread, so journal writes (including close's) happen in order
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='ledger')
+        self.pending = bytearray()  # Records appended but not yet written
+        self.flushing = False
+        self.waiters = []           # Futures released when the running flush completes
+        self.failed = None          # Exception of a failed flush; nothing is written after it
+        self.stats = {'records': 0, 'fsyncs': 0, 'snapshots': 0, 'replayed': 0}
+        
+        self.balances = {}  # Account -> balance, as of last_lsn
+        self.last_lsn = 0
+        self.journal = None
+        self.synced_size = 0  # Journal size up to its last synced record
+        self.recover()
+        self.durable_lsn = self.last_lsn
+        self.snapshot_lsn = self.last_lsn
+    
+    # ------------------------------------------------------------------
+    # Logging
+    
+    def append(self, account, instruction, amount, balance):
+        """Journal a successful instruction and the account balance it produced; returns its lsn."""
+        self.last_lsn += 1
+        self.balances[account] = balance
+        record = RECORD.pack(self.last_lsn, account, instruction, amount, balance)
+        self.pending += record
+        self.pending += CRC.pack(zlib.crc32(record))
+        self.stats['records'] += 1
+        return self.last_lsn
+    
+    async def wait_durable(self, lsn):
+        """Return once every record up to lsn is on disk, starting a flush if none is running."""
+        loop = asyncio.get_running_loop()
+        while self.durable_lsn < lsn:
+            if self.failed is not None:
+                raise self.failed
+            waiter = loop.create_future()
+            self.waiters.append(waiter)
+            if not self.flushing:
+                self.flushing = True
+                loop.create_task(self._flush())
+            await waiter
+    
+    async def _flush(self):
+        """Let the batch fill, then write and sync it off the event loop."""
+        try:
+            if self.group_commit_window > 0:
+                await asyncio.sleep(self.group_commit_window)
+            if self.journal is not None:  # Else close() wrote everything out meanwhile
+                data, self.pending = self.pending, bytearray()
+                target = self.last_lsn
+                # Copy the balances now; appends go on while the worker writes
+                snapshot = dict(self.balances) if target - self.snapshot_lsn >= self.snapshot_interval else None
+                await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self._write, data, target, snapshot)
+                self.durable_lsn = target
+                if snapshot is not None:
+                    self.snapshot_lsn = target
+        except Exception as e:
+            self._fail(e)
+            raise
+        finally:
+            self.flushing = False
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+    
+    def _write(self, data, target, snapshot=None):
+        """Write and sync records up to target; then save snapshot balances if given. Runs on a worker thread."""
+        view = memoryview(data)
+        while view:
+            view = view[self.journal.write(view):]
+        if self.sync:
+            os.fsync(self.journal.fileno())
+        self.synced_size = self.journal.tell()
+        self.stats['fsyncs'] += 1
+        if snapshot is not None:
+            self._write_snapshot(target, snapshot)
+            self._open_journal(target + 1)
+            self._remove_old_journals()
+    
+    def _fail(self, error):
+        """Refuse the records not yet synced: fail their waiters and cut them off the journal."""
+        self.failed = error
+        self.pending = bytearray()
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_exception(error)
+        try:
+            os.ftruncate(self.journal.fileno(), self.synced_size)
+        except OSError:
+            pass  # Best effort; nothing more is written either way
+    
+    def close(self):
+        """
+        Write out anything buffered, after any flush still in progress, and
+        close the journal. Waiters on those records are released as
+        committed, since they now are; after a failed flush nothing is
+        written.
+        """
+        if self.journal is None:
+            return
+        try:
+            if self.failed is None:
+                try:
+                    self.executor.submit(self._write, bytes(self.pending), self.last_lsn).result()
+                except Exception as e:
+                    self._fail(e)
+                    raise
+                self.pending = bytearray()
+                self.durable_lsn = self.last_lsn
+                waiters, self.waiters = self.waiters, []
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+        finally:
+            self.executor.shutdown()
+            self.journal.close()
+            self.journal = None
+    
+    # ------------------------------------------------------------------
+    # Snapshots and recovery
+    
+    def _journals(self):
+        """Journal segment paths in lsn order."""
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+    
+    def _open_journal(self, first_lsn):
+        """Close the current segment and start a new one for records from first_lsn on."""
+        if self.journal is not None:
+            self.journal.close()
+        path = os.path.join(self.directory, f"{JOURNAL_PREFIX}{first_lsn:016d}{JOURNAL_SUFFIX}")
+        # Unbuffered: a write either reaches the file or fails, so no
+        # records linger in a buffer for a later write or close() to flush
+        self.journal = open(path, 'ab', buffering=0)
+        if self.journal.tell() == 0:
+            # Synced along with the segment's first records
+            self.journal.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, FORMAT_VERSION))
+        self.synced_size = self.journal.tell()
+        self._sync_directory()
+    
+    def _remove_old_journals(self):
+        """Delete every segment but the current one (the snapshot covers them)."""
+        for path in self._journals():
+            if path != self.journal.name:
+                os.remove(path)
+    
+    def _write_snapshot(self, lsn, balances):
+        """Atomically replace the snapshot: write a temporary file, sync it, rename it over."""
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'lsn': lsn, 'balances': {str(account): balance
+                                                for account, balance in balances.items()}}, f)
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+        os.replace(temporary, path)
+        self._sync_directory()
+        self.stats['snapshots'] += 1
+    
+    def _sync_directory(self):
+        """Make file creations and renames in the directory durable."""
+        if self.sync and hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    def recover(self):
+        """
+        Load the snapshot, then replay journal records after it in lsn
+        order. Each record holds the balance it produced, so replay only
+        checks CRCs and keeps each account's last balance.
+        
+        Only the end of the last segment may be torn by a crash (a partial
+        header, a partial record, or a last record failing its CRC); it is
+        cut back to the last good record, since nothing past it was ever
+        acknowledged. Anything else - a snapshot or segment of another
+        format version, or a bad record with more after it - raises
+        ValueError rather than dropping acknowledged balances.
+        """
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') != FORMAT_VERSION:
+                raise ValueError(f"{path} is ledger format version {snapshot.get('version', 1)}, "
+                                 f"not {FORMAT_VERSION}")
+            self.last_lsn = snapshot['lsn']
+            self.balances = {int(account): balance for account, balance in snapshot['balances'].items()}
+        
+        journals = self._journals()
+        for index, journal in enumerate(journals):
+            last = index == len(journals) - 1
+            with open(journal, 'rb') as f:
+                data = f.read()
+            header = JOURNAL_HEADER.pack(JOURNAL_MAGIC, FORMAT_VERSION)
+            if len(data) < len(header) and last and header.startswith(data):
+                # Crashed while starting the segment
+                good = 0
+            elif data[:len(header)] != header:
+                raise ValueError(f"{journal} is not a ledger format version {FORMAT_VERSION} journal")
+            else:
+                good = len(header)
+                while good + RECORD_SIZE <= len(data):
+                    (crc,) = CRC.unpack_from(data, good + RECORD.size)
+                    if zlib.crc32(data[good:good + RECORD.size]) != crc:
+                        break
+                    lsn, account, _, _, balance = RECORD.unpack_from(data, good)
+                    if lsn > self.last_lsn:
+                        self.last_lsn = lsn
+                        self.balances[account] = balance
+                        self.stats['replayed'] += 1
+                    good += RECORD_SIZE
+            if good < len(data):
+                if not last or good + RECORD_SIZE < len(data):
+                    raise ValueError(f"{journal} is corrupt at offset {good}")
+                with open(journal, 'r+b') as f:
+                    f.truncate(good)
+        
+        self._open_journal(self.last_lsn + 1)
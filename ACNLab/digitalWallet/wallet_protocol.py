@@ -0,0 +1,140 @@
+import struct
+import zlib
+
+# Every request starts with a 2-byte opcode, which tells the versions apart
+OPCODE = struct.Struct('!2s')
+OPCODE_SIZE = OPCODE.size
+
+# Version 1: one balance, 2-byte instruction + 2-byte unsigned short amount
+V1_REQUEST = struct.Struct('!2sH')
+V1_RESPONSE = struct.Struct('!2sH')   # 2-byte response code + 2-byte unsigned short value
+MAX_BALANCE = 65535
+
+# Version 2: 2-byte opcode + 8-byte account id + 8-byte unsigned amount
+V2_REQUEST = struct.Struct('!2sQQ')
+V2_RESPONSE = struct.Struct('!2sQ')   # 2-byte response code + 8-byte unsigned value
+MAX_BALANCE_V2 = 2 ** 63 - 1          # Fits a signed 64-bit integer on any client
+
+# Version 2 opcodes and the wallet operation each one runs
+V2_OPERATIONS = {
+    b'CA': b'CR',  # Credit account
+    b'DA': b'DB',  # Debit account
+    b'QA': b'QB',  # Query account balance
+}
+V2_OPCODES = {operation: opcode for opcode, operation in V2_OPERATIONS.items()}
+
+# Version 1 messages act on this account
+DEFAULT_ACCOUNT = 0
+
+FRAME_BUFFER_SIZE = 64 * 1024  # Bytes a FrameBuffer receives into at once
+
+def is_v2(opcode):
+    """True if a request starting with opcode is a version 2 request."""
+    return opcode in V2_OPERATIONS
+
+def request_size(opcode):
+    """Total size of the request that starts with opcode."""
+    return V2_REQUEST.size if is_v2(opcode) else V1_REQUEST.size
+
+def pack_request(instruction, amount, account=None):
+    """
+    Encode one request: version 1 without an account, version 2 with one.
+    
+    Returns:
+        (request bytes, struct of the reply to expect)
+    """
+    if account is None:
+        return V1_REQUEST.pack(instruction, amount), V1_RESPONSE
+    return V2_REQUEST.pack(V2_OPCODES[instruction], account, amount), V2_RESPONSE
+
+def shard_of(account, shards):
+    """
+    Shard index of an account. CRC32 of the big-endian id spreads
+    neighbouring ids and, unlike hash(), is the same in every process and
+    on every run, so an account always lands on the shard holding its ledger.
+    """
+    return zlib.crc32(account.to_bytes(8, 'big')) % shards
+
+class FrameBuffer:
+    """
+    Receive buffer that turns a byte stream back into messages.
+    
+    TCP may split a message across reads or put many in one, so nothing
+    here assumes a read holds exactly one. Bytes are received straight
+    into a preallocated bytearray (space() hands out a memoryview of its
+    free tail, for socket.recv_into or asyncio.BufferedProtocol) and
+    every complete message in it is decoded in place with unpack_from:
+    no per-message slicing, copying or concatenation. When the free space
+    runs low, the undecoded bytes (normally part of one message) are
+    moved back to the front.
+    """
+    
+    def __init__(self, capacity=FRAME_BUFFER_SIZE):
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # First byte not yet decoded
+        self.end = 0    # End of the bytes received
+    
+    @property
+    def available(self):
+        """Bytes received but not yet decoded."""
+        return self.end - self.start
+    
+    def space(self):
+        """Writable view of the free space after the received bytes (never empty)."""
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif len(self.buffer) - self.end < len(self.buffer) // 4:
+            # Move the undecoded bytes to the front (through a copy, as
+            # the two ranges may overlap)
+            count = self.end - self.start
+            self.buffer[:count] = bytes(self.view[self.start:self.end])
+            self.start, self.end = 0, count
+        if self.end == len(self.buffer):
+            self.view.release()
+            self.buffer.extend(bytes(len(self.buffer)))
+            self.view = memoryview(self.buffer)
+        return self.view[self.end:]
+    
+    def commit(self, count):
+        """Account for count bytes written into the view space() returned."""
+        self.end += count
+    
+    def recv_into(self, sock):
+        """Receive whatever sock has (blocking until something arrives); returns the byte count, 0 at EOF."""
+        count = sock.recv_into(self.space())
+        self.commit(count)
+        return count
+    
+    def unpack(self, frame):
+        """Decode the next message with the struct frame, or return None if it is not all here yet."""
+        if self.end - self.start < frame.size:
+            return None
+        values = frame.unpack_from(self.buffer, self.start)
+        self.start += frame.size
+        return values
+    
+    def read(self, sock, frame):
+        """Block until a whole frame message is here and decode it; ConnectionError if sock closes first."""
+        while self.end - self.start < frame.size:
+            if not self.recv_into(sock):
+                raise ConnectionError("connection closed mid-message")
+        return self.unpack(frame)
+    
+    def next_request(self):
+        """
+        Decode the next complete request, or return None if it is not all
+        here yet.
+        
+        Returns:
+            (opcode, account, amount, v2): version 1 requests carry no
+            account and report DEFAULT_ACCOUNT
+        """
+        if self.end - self.start < OPCODE_SIZE:
+            return None
+        (opcode,) = OPCODE.unpack_from(self.buffer, self.start)
+        if is_v2(opcode):
+            values = self.unpack(V2_REQUEST)
+            return values and (opcode, values[1], values[2], True)
+        values = self.unpack(V1_REQUEST)
+        return values and (opcode, DEFAULT_ACCOUNT, values[1], False)
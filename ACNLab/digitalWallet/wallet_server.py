@@ -1,12 +1,34 @@
+import argparse
+import asyncio
+import collections
+import multiprocessing
+import os
+import re
+import signal
 import socket
 import struct
 
+from wallet_ledger import JOURNAL_PREFIX, JOURNAL_SUFFIX, SNAPSHOT_FILE, Ledger
+from wallet_protocol import (DEFAULT_ACCOUNT, MAX_BALANCE, MAX_BALANCE_V2, V1_RESPONSE, V2_OPERATIONS,
+                             V2_RESPONSE, FrameBuffer, shard_of)
+
 # Server Configuration
 HOST = '10.85.206.149'
 PORT = 5555
-MAX_BALANCE = 65535
+BACKLOG = 1024    # Pending connections the listening socket queues
+MAX_PIPELINE = 1024  # Requests a connection may have in flight before the server stops reading it
+
+# Ledger Configuration
+DATA_DIR = 'wallet_data'
+GROUP_COMMIT_MS = 1.0        # How long a journal flush waits for more records
+SNAPSHOT_INTERVAL = 100000   # Journal records between snapshots
+
+# Shard Configuration
+SHARDS = 4                   # Worker processes holding the accounts (0 = keep them in the server process)
+SHARD_REQUEST = struct.Struct('!2sQQQ')  # operation, account, amount, max balance
+SHARD_RESPONSE = struct.Struct('!2sQ')   # response code, value
 
-def handle_instruction(instruction, amount, balance):
+def handle_instruction(instruction, amount, balance, max_balance=MAX_BALANCE):
     """
     Process wallet instruction and return response code and value.
     
@@ -14,21 +36,23 @@ def handle_instruction(instruction, amount, balance):
         instruction: 2-byte instruction ('CR' or 'DB')
         amount: Amount to credit or debit
         balance: Current wallet balance
+        max_balance: Largest balance the reply can carry
     
     Returns:
         tuple: (response_code, value)
     """
     if instruction == b'CR':
         # Credit instruction
-        if balance + amount > MAX_BALANCE:
+        if balance + amount > max_balance:
             return b'ER', 0
         else:
             new_balance = balance + amount
             return b'BA', new_balance
     
     elif instruction == b'DB':
-        # Debit instruction
-        if balance >= amount:
+        # Debit instruction (a version 2 credit can leave the default
+        # account above what a version 1 reply can carry)
+        if balance >= amount and balance - amount <= max_balance:
             new_balance = balance - amount
             return b'BA', new_balance
         else:
@@ -38,65 +62,423 @@ def handle_instruction(instruction, amount, balance):
         # Invalid instruction
         return b'ER', 0
 
-def start_server():
-    """Start the digital wallet server."""
-    balance = 0  # Initial wallet balance
+class Wallet:
+    """
+    The balances of the accounts one shard holds.
     
-    # Create TCP socket
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    A shard is served by one event loop thread and apply() never awaits,
+    so each check-and-update of a balance runs to completion before any
+    other request is looked at: updates are serialized without a lock.
     
-    try:
-        # Bind to address and port
-        server_socket.bind((HOST, PORT))
-        server_socket.listen(5)
-        print(f"Digital Wallet Server started on {HOST}:{PORT}")
-        print(f"Initial Balance: {balance}")
-        print("Waiting for client connections...\n")
+    With a ledger, the balances start from the recovered ones and every
+    successful update is journaled; replies must wait for commit() so a
+    client never hears of a balance a crash could lose.
+    """
+    
+    def __init__(self, ledger=None):
+        self.ledger = ledger
+        self.balances = dict(ledger.balances) if ledger else {}
+        self.requests = 0
+    
+    def balance(self, account=DEFAULT_ACCOUNT):
+        return self.balances.get(account, 0)
+    
+    def apply(self, account, instruction, amount, max_balance=MAX_BALANCE):
+        """
+        Run one operation against an account and return (response_code, value).
+        'QB' queries the balance; anything else goes to handle_instruction.
+        """
+        balance = self.balance(account)
+        self.requests += 1
+        if instruction == b'QB':
+            return b'BA', balance
+        response_code, value = handle_instruction(instruction, amount, balance, max_balance)
         
+        # Update balance if operation was successful
+        if response_code == b'BA':
+            self.balances[account] = value
+            if self.ledger:
+                self.ledger.append(account, instruction, amount, value)
+        return response_code, value
+    
+    async def commit(self, lsn=None):
+        """
+        Wait until every update applied so far (or up to lsn) is durable.
+        Rejections wait too, since they were decided against those updates.
+        """
+        if self.ledger:
+            await self.ledger.wait_durable(self.ledger.last_lsn if lsn is None else lsn)
+
+def print_ledger_stats(name, ledger):
+    print(f"{name}: {ledger.stats['records']} records written with "
+          f"{ledger.stats['fsyncs']} fsyncs, {ledger.stats['snapshots']} snapshots, "
+          f"{len(ledger.balances)} accounts")
+
+class LocalShard:
+    """All accounts in the server process itself, with one ledger."""
+    
+    def __init__(self, data_dir, group_commit_ms, snapshot_interval):
+        self.ledger = Ledger(data_dir, group_commit_ms / 1000, snapshot_interval)
+        self.wallet = Wallet(self.ledger)
+        print(f"Ledger: {data_dir} (replayed {self.ledger.stats['replayed']} journal records, "
+              f"{len(self.ledger.balances)} accounts)")
+    
+    async def connect(self):
+        pass
+    
+    def submit(self, account, instruction, amount, max_balance):
+        """Apply the request now; return a future of its reply, resolved once it is durable."""
+        return asyncio.ensure_future(self._reply(self.wallet.apply(account, instruction, amount, max_balance)))
+    
+    async def _reply(self, response):
+        await self.wallet.commit()
+        return response
+    
+    def close(self):
+        self.ledger.close()
+        print_ledger_stats("Ledger", self.ledger)
+
+class ShardProcess(asyncio.BufferedProtocol):
+    """
+    A worker process holding the accounts that hash to one shard, reached
+    over a socket pair. Requests are written down the socket as they come
+    and the shard replies in the same order, so each reply resolves the
+    oldest pending future. Replies are received straight into a
+    FrameBuffer and decoded in place, as on client connections.
+    """
+    
+    def __init__(self, index, data_dir, group_commit_ms, snapshot_interval):
+        self.index = index
+        self.sock, child = socket.socketpair()
+        # Spawned, not forked: a forked shard would inherit the event loop
+        # and every other shard's socket, so it would never see their EOF
+        self.process = multiprocessing.get_context('spawn').Process(
+            target=run_shard, args=(index, child, data_dir, group_commit_ms, snapshot_interval),
+            name=f'wallet-shard-{index}', daemon=True)
+        self.process.start()
+        child.close()
+        self.pending = collections.deque()
+        self.frames = FrameBuffer()
+        self.transport = None
+    
+    async def connect(self):
+        await asyncio.get_running_loop().create_connection(lambda: self, sock=self.sock)
+    
+    def connection_made(self, transport):
+        self.transport = transport
+    
+    def submit(self, account, instruction, amount, max_balance):
+        """Send the request to the shard now; return a future of its reply."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(future)
+        self.transport.write(SHARD_REQUEST.pack(instruction, account, amount, max_balance))
+        return future
+    
+    def get_buffer(self, sizehint):
+        return self.frames.space()
+    
+    def buffer_updated(self, nbytes):
+        """Match the shard's replies to pending requests, oldest first."""
+        self.frames.commit(nbytes)
+        while (response := self.frames.unpack(SHARD_RESPONSE)) is not None:
+            future = self.pending.popleft()
+            if not future.done():  # Its client may have gone away
+                future.set_result(response)
+    
+    def connection_lost(self, exc):
+        # The shard is gone; nothing more will be answered
+        while self.pending:
+            future = self.pending.popleft()
+            if not future.done():
+                future.set_exception(ConnectionError(f"shard {self.index} exited"))
+    
+    def close(self):
+        """Shut down the socket, so the shard sees EOF, syncs its ledger and exits."""
+        # Shut the socket itself down: closing the transport would only
+        # take effect on a later turn of the loop, which join() blocks
+        self.sock.shutdown(socket.SHUT_WR)
+        self.process.join()
+        self.sock.close()
+
+def run_shard(index, sock, data_dir, group_commit_ms, snapshot_interval):
+    """Entry point of a shard worker process."""
+    # Ctrl-C reaches the whole process group; the server decides when shards stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ledger = Ledger(data_dir, group_commit_ms / 1000, snapshot_interval)
+    print(f"Shard {index}: {data_dir} (replayed {ledger.stats['replayed']} journal records, "
+          f"{len(ledger.balances)} accounts)", flush=True)
+    try:
+        asyncio.run(serve_shard(sock, Wallet(ledger)))
+    finally:
+        ledger.close()
+        print_ledger_stats(f"Shard {index}", ledger)
+
+class ShardServer(asyncio.BufferedProtocol):
+    """
+    The shard worker's end of the socket pair. Every complete request a
+    read brings in (received into a FrameBuffer and decoded in place) is
+    applied at once, and the batch's replies are queued behind its last
+    lsn. A separate task sends each batch once it is durable, in order,
+    so the next batches are read and applied while the ledger syncs and
+    they can share the next fsync.
+    """
+    
+    def __init__(self, wallet):
+        self.wallet = wallet
+        self.frames = FrameBuffer()
+        self.outbox = asyncio.Queue()
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.transport = None
+        self.sender = None
+    
+    def connection_made(self, transport):
+        self.transport = transport
+        self.sender = asyncio.create_task(self.send_replies())
+    
+    def get_buffer(self, sizehint):
+        return self.frames.space()
+    
+    def buffer_updated(self, nbytes):
+        self.frames.commit(nbytes)
+        replies = bytearray()
+        while (request := self.frames.unpack(SHARD_REQUEST)) is not None:
+            instruction, account, amount, max_balance = request
+            replies += SHARD_RESPONSE.pack(*self.wallet.apply(account, instruction, amount, max_balance))
+        if replies:
+            self.outbox.put_nowait((self.wallet.ledger.last_lsn, replies))
+    
+    async def send_replies(self):
         while True:
-            # Accept client connection
-            client_socket, client_address = server_socket.accept()
-            print(f"Client connected from {client_address}")
+            lsn, replies = await self.outbox.get()
+            if replies is None:
+                break
+            await self.wallet.commit(lsn)
+            await self.writable.wait()
+            self.transport.write(replies)
+        self.transport.close()
+    
+    def pause_writing(self):
+        self.writable.clear()
+    
+    def resume_writing(self):
+        self.writable.set()
+    
+    def eof_received(self):
+        # The server is done sending; answer what it sent, then close
+        self.outbox.put_nowait((None, None))
+        return True
+    
+    def connection_lost(self, exc):
+        self.writable.set()
+        self.outbox.put_nowait((None, None))
+
+async def serve_shard(sock, wallet):
+    """Serve the server's requests on sock until it closes its end."""
+    _, protocol = await asyncio.get_running_loop().create_connection(lambda: ShardServer(wallet), sock=sock)
+    await protocol.sender
+
+def shard_directories(data_dir, shards):
+    """
+    Ledger directory of each shard. The layout is tied to the shard count
+    (accounts are placed by hash modulo the count), so refuse to start
+    with a different count than the data was written with: including
+    shards with an unsharded ledger (kept in data_dir itself) or the
+    reverse, either of which would start every account at zero.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    names = os.listdir(data_dir)
+    counts = {int(match.group(1)) for name in names
+              for match in [re.fullmatch(r'shard-\d+-of-(\d+)', name)] if match}
+    if counts - {shards}:
+        raise ValueError(f"{data_dir} holds ledgers for {sorted(counts)} shards, not {shards}")
+    unsharded = [name for name in names if name == SNAPSHOT_FILE
+                 or (name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX))]
+    if shards and unsharded:
+        raise ValueError(f"{data_dir} holds an unsharded ledger, not one for {shards} shards")
+    return [os.path.join(data_dir, f"shard-{index}-of-{shards}") for index in range(shards)]
+
+class WalletProtocol(asyncio.BufferedProtocol):
+    """
+    Serve one client connection until it closes.
+    
+    Version 1 requests (4 bytes, 'CR'/'DB') act on the default account;
+    version 2 requests (18 bytes, 'CA'/'DA'/'QA') name their account. The
+    request goes to the shard its account hashes to.
+    
+    The transport reads straight into the connection's FrameBuffer, and
+    every complete request a read brings in is decoded and handed to its
+    shard at once, however the bytes were split or coalesced. Clients may
+    pipeline: replies are written in request order as they become ready,
+    all that are ready going out in one write. Reading pauses while
+    MAX_PIPELINE requests are in flight or the client is not taking its
+    replies.
+    """
+    
+    def __init__(self, shards, verbose=True):
+        self.shards = shards
+        self.verbose = verbose
+        self.frames = FrameBuffer()
+        self.replies = collections.deque()  # (future of (response_code, value), response struct)
+        self.transport = None
+        self.reading = True
+        self.writing = True
+        self.closing = False
+    
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rejected = asyncio.get_running_loop().create_future()
+        self.rejected.set_result((b'ER', 0))
+        if self.verbose:
+            print(f"Client connected from {transport.get_extra_info('peername')}")
+    
+    def get_buffer(self, sizehint):
+        return self.frames.space()
+    
+    def buffer_updated(self, nbytes):
+        self.frames.commit(nbytes)
+        while (request := self.frames.next_request()) is not None:
+            opcode, account, amount, v2 = request
+            if self.verbose:
+                print(f"Received: Instruction={opcode.decode(errors='replace')}, "
+                      f"Account={account}, Amount={amount}")
+            
+            # Process instruction on the account's shard
+            if v2:
+                instruction, max_balance, response_format = V2_OPERATIONS[opcode], MAX_BALANCE_V2, V2_RESPONSE
+            else:
+                instruction, max_balance, response_format = opcode, MAX_BALANCE, V1_RESPONSE
+            if v2 or instruction in (b'CR', b'DB'):
+                shard = self.shards[shard_of(account, len(self.shards))]
+                reply = shard.submit(account, instruction, amount, max_balance)
+            else:
+                # Invalid instruction
+                reply = self.rejected
+            self.replies.append((reply, response_format))
+            reply.add_done_callback(self.send_replies)
+        self.update_reading()
+    
+    def send_replies(self, _=None):
+        """Write the replies at the head of the queue that are ready, in one write."""
+        out = bytearray()
+        while self.replies and self.replies[0][0].done():
+            if self.replies[0][0].cancelled():
+                # Server shutting down before the outcome was known: the
+                # ledger may still commit it, so answering ER could make a
+                # retry apply it twice. Leave it and everything behind it
+                # unanswered and close.
+                self.replies.clear()
+                self.closing = True
+                break
+            reply, response_format = self.replies.popleft()
+            if reply.exception():
+                print(f"Error handling client request: {reply.exception()}\n")
+                response_code, value = b'ER', 0
+            else:
+                response_code, value = reply.result()
             
-            try:
-                # Receive 4-byte instruction message
-                data = client_socket.recv(4)
-                
-                if len(data) == 4:
-                    # Unpack: 2-byte CHAR instruction + 2-byte unsigned short amount
-                    instruction = data[:2]
-                    amount = struct.unpack('!H', data[2:4])[0]
-                    
-                    print(f"Received: Instruction={instruction.decode()}, Amount={amount}")
-                    
-                    # Process instruction
-                    response_code, value = handle_instruction(instruction, amount, balance)
-                    
-                    # Update balance if operation was successful
-                    if response_code == b'BA':
-                        balance = value
-                        print(f"Success: New Balance={balance}")
-                    else:
-                        print(f"Error: Operation failed, Balance={balance}")
-                    
-                    # Pack and send response: 2-byte response code + 2-byte unsigned short value
-                    response = response_code + struct.pack('!H', value)
-                    client_socket.sendall(response)
-                    print(f"Sent: Response={response_code.decode()}, Value={value}\n")
-                
-            except Exception as e:
-                print(f"Error handling client request: {e}\n")
+            if self.verbose:
+                if response_code == b'BA':
+                    print(f"Success: Balance={value}")
+                else:
+                    print("Error: Operation failed")
+                print(f"Sent: Response={response_code.decode()}, Value={value}\n")
             
-            finally:
-                client_socket.close()
+            # Pack response in the request's version
+            out += response_format.pack(response_code, value)
+        if out and not self.transport.is_closing():
+            self.transport.write(out)
+        if self.closing and not self.replies:
+            self.transport.close()
+        self.update_reading()
+    
+    def update_reading(self):
+        """Pause reading while the pipeline is full or replies are backing up; resume after."""
+        reading = self.writing and len(self.replies) < MAX_PIPELINE and not self.closing
+        if reading != self.reading and not self.transport.is_closing():
+            self.reading = reading
+            if reading:
+                self.transport.resume_reading()
+            else:
+                self.transport.pause_reading()
+    
+    def pause_writing(self):
+        self.writing = False
+        self.update_reading()
+    
+    def resume_writing(self):
+        self.writing = True
+        self.update_reading()
+    
+    def eof_received(self):
+        # Client is done sending; answer what it sent, then close
+        self.closing = True
+        self.send_replies()
+        return True
+
+async def serve(host=HOST, port=PORT, verbose=True, data_dir=DATA_DIR, shards=SHARDS,
+                group_commit_ms=GROUP_COMMIT_MS, snapshot_interval=SNAPSHOT_INTERVAL):
+    """
+    Run the wallet server on the current event loop until cancelled.
+    
+    Each connection is its own task, so a slow client only delays itself
+    while thousands of others are served concurrently. Accounts are split
+    across shards worker processes by account hash, each with its own
+    ledger under data_dir, so independent accounts are updated and synced
+    on separate cores; requests that reach a shard while its journal
+    flush waits or syncs share that fsync.
+    """
+    if shards:
+        backends = [ShardProcess(index, directory, group_commit_ms, snapshot_interval)
+                    for index, directory in enumerate(shard_directories(data_dir, shards))]
+    else:
+        shard_directories(data_dir, 0)
+        backends = [LocalShard(data_dir, group_commit_ms, snapshot_interval)]
+    
+    try:
+        for backend in backends:
+            await backend.connect()
+        
+        server = await asyncio.get_running_loop().create_server(
+            lambda: WalletProtocol(backends, verbose),
+            host, port, backlog=BACKLOG, reuse_address=True)
+        
+        print(f"Digital Wallet Server started on {host}:{port}")
+        print(f"Shards: {shards or 'none (in-process)'}")
+        print("Waiting for client connections...\n")
+        
+        async with server:
+            await server.serve_forever()
+    
+    finally:
+        for backend in backends:
+            backend.close()
+
+def start_server(host=HOST, port=PORT, verbose=True, data_dir=DATA_DIR, shards=SHARDS,
+                 group_commit_ms=GROUP_COMMIT_MS, snapshot_interval=SNAPSHOT_INTERVAL):
+    """Start the digital wallet server."""
+    try:
+        asyncio.run(serve(host, port, verbose, data_dir, shards, group_commit_ms, snapshot_interval))
     
     except KeyboardInterrupt:
         print("\nServer shutting down...")
     
     finally:
-        server_socket.close()
         print("Server closed.")
 
 if __name__ == "__main__":
-    start_server()
+    parser = argparse.ArgumentParser(description="Digital wallet server")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--quiet', action='store_true', help="Don't log every request")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Where the ledgers are kept")
+    parser.add_argument('--shards', type=int, default=SHARDS,
+                        help="Worker processes holding the accounts (0 = keep them in the server process)")
+    parser.add_argument('--group-commit-ms', type=float, default=GROUP_COMMIT_MS,
+                        help="How long a journal flush waits to batch more requests")
+    parser.add_argument('--snapshot-interval', type=int, default=SNAPSHOT_INTERVAL,
+                        help="Journal records between snapshots")
+    args = parser.parse_args()
+    start_server(args.host, args.port, not args.quiet, args.data_dir, args.shards,
+                 args.group_commit_ms, args.snapshot_interval)
@@ -0,0 +1,533 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Deque, List, Optional, Callable, Union
+
+from lock_events import EventSink, NullSink
+from lock_metrics import ShardMetrics, TransactionMetrics, build_snapshot
+from lock_manager import (LockType, LockEntry, LockRequest, Transaction, WaitsForGraph,
+                          VICTIM_POLICIES, ancestors, ancestor_covers, compatible, covers,
+                          intention_for, lock_supremum)
+
+
+class AsyncLockRequest(LockRequest):
+    """A blocked lock request; its waiter awaits the future"""
+    def __init__(self, tid: int, lock_type: LockType, upgrade: bool = False):
+        super().__init__(tid, lock_type, upgrade)
+        # Result True when granted, False when cancelled (abort / timeout)
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class AsyncLockManager:
+    """
+    Asyncio front end with the LockManager protocol: 2PL / Strict 2PL,
+    lock conversions, intention locks on hierarchical items, deadlock
+    detection and the same stats.
+
+    All state is touched only from the event loop thread, so there are no
+    shard locks or latches: a blocked acquire() costs one future in the
+    item's FIFO queue instead of one OS thread. Lock escalation is not
+    implemented. Not thread-safe; call every method from the loop.
+    """
+
+    def __init__(self, strict_2pl=True,
+                 deadlock_victim: Union[str, Callable[[List[Transaction]], Transaction]] = 'youngest',
+                 event_sink: Optional[EventSink] = None):
+        """
+        Initialize lock manager.
+
+        Args:
+            strict_2pl: If True, use Strict 2PL (hold locks until commit/abort)
+                       If False, use basic 2PL (can release locks before commit)
+            deadlock_victim: 'youngest', 'fewest_locks' or a callable, as
+                       for LockManager
+            event_sink: Receives grant/wait/commit/abort/... events
+                       (see lock_events); default NullSink records nothing
+        """
+        self.strict_2pl = strict_2pl
+        if callable(deadlock_victim):
+            self.choose_victim = deadlock_victim
+        else:
+            self.choose_victim = VICTIM_POLICIES[deadlock_victim]
+
+        # Lock table: item -> LockEntry (only while the item is locked)
+        self.lock_table: Dict[str, LockEntry] = {}
+
+        # Wait queues: item -> FIFO of blocked requests (only while non-empty)
+        self.wait_queues: Dict[str, Deque[AsyncLockRequest]] = {}
+
+        # Transaction registry
+        self.transactions: Dict[int, Transaction] = {}
+
+        # Waits-for graph for deadlock detection
+        self.waits_for = WaitsForGraph()
+
+        self.event_sink = event_sink or NullSink()
+
+        self.stats = {
+            'locks_granted': 0,
+            'locks_waited': 0,
+            'transactions_aborted': 0,
+            'deadlocks_detected': 0
+        }
+        self.metrics = ShardMetrics()
+        self.txn_metrics = TransactionMetrics()
+
+    def metrics_snapshot(self, top_k: int = 10) -> dict:
+        """Point-in-time copy of the lock metrics (see LockManager.metrics_snapshot)."""
+        return build_snapshot(self.stats, self.metrics, self.txn_metrics.copy(), top_k)
+
+    def _record(self, kind: str, tid: int, item: Optional[str] = None,
+                lock_type: Optional[LockType] = None, detail=None):
+        """Emit a raw event (no-op unless the sink is enabled)."""
+        if self.event_sink.enabled:
+            self.event_sink.emit([(time.time(), kind, tid, item,
+                                   lock_type.value if lock_type is not None else None, detail)])
+
+    def begin_transaction(self, tid: int):
+        """Start a new transaction."""
+        if tid in self.transactions:
+            self._record('duplicate', tid)
+            return False
+        self.transactions[tid] = Transaction(tid)
+        self._record('begin', tid)
+        return True
+
+    def lock(self, tid: int, item: str, lock_type: LockType) -> bool:
+        """
+        Try to acquire a lock on an item without waiting.
+
+        Returns:
+            True if lock granted, False if the request would have to wait
+        """
+        txn = self.transactions.get(tid)
+        if txn is None:
+            self._record('not_found', tid)
+            return False
+
+        covered = self._covered_by_ancestor(txn, item, lock_type)
+        if covered is not None:
+            return covered
+
+        intention = intention_for(lock_type)
+        for ancestor in ancestors(item):
+            if self._try_lock(txn, ancestor, intention, wait=False) is not True:
+                return False
+        return self._try_lock(txn, item, lock_type, wait=False) is True
+
+    async def acquire(self, tid: int, item: str, lock_type: LockType,
+                      timeout: Optional[float] = None) -> bool:
+        """
+        Acquire a lock on an item, waiting until it is granted.
+
+        Conflicting requests join the item's FIFO queue and await a future
+        that a release resolves. Conversions of a held lock are queued
+        ahead of new requests. For hierarchical items the intention lock is
+        first taken on every ancestor, root first.
+
+        Args:
+            tid: Transaction ID
+            item: Data item to lock
+            lock_type: Type of lock (any LockType)
+            timeout: Seconds to wait (None = forever, 0 = do not wait)
+
+        Returns:
+            True if lock granted, False on timeout or if the transaction
+            was aborted while waiting (e.g. chosen as a deadlock victim)
+        """
+        txn = self.transactions.get(tid)
+        if txn is None:
+            self._record('not_found', tid)
+            return False
+
+        covered = self._covered_by_ancestor(txn, item, lock_type)
+        if covered is not None:
+            return covered
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        intention = intention_for(lock_type)
+        for ancestor in ancestors(item):
+            if not await self._acquire_one(txn, ancestor, intention, deadline):
+                return False
+        return await self._acquire_one(txn, item, lock_type, deadline)
+
+    def _covered_by_ancestor(self, txn: Transaction, item: str,
+                             lock_type: LockType) -> Optional[bool]:
+        """True if an S/SIX/X lock on an ancestor already grants the request, else None."""
+        for ancestor in ancestors(item):
+            held = self._held_mode(txn, ancestor)
+            if held is not None and ancestor_covers(held, lock_type):
+                self._record('held', txn.tid, item, lock_type)
+                return True
+        return None
+
+    @staticmethod
+    def _held_mode(txn: Transaction, item: str) -> Optional[LockType]:
+        """Mode txn holds on item, or None."""
+        for lock_type in LockType:
+            if (item, lock_type) in txn.locks_held:
+                return lock_type
+        return None
+
+    async def _acquire_one(self, txn: Transaction, item: str, lock_type: LockType,
+                           deadline: Optional[float]) -> bool:
+        """Acquire (or convert to) lock_type on a single item."""
+        loop = asyncio.get_running_loop()
+        wait = deadline is None or deadline > loop.time()
+        request = self._try_lock(txn, item, lock_type, wait)
+        if not isinstance(request, AsyncLockRequest):
+            return request
+
+        # A waiter holding no locks cannot be waited for, so it closes no
+        # cycle. Otherwise repeat, since one victim may only break one of
+        # several cycles.
+        victim = self._find_deadlock_victim(txn.tid) if txn.locks_held else None
+        while victim is not None:
+            self._abort_transaction(victim, reason='deadlock')
+            if victim == txn.tid:
+                break
+            victim = self._find_deadlock_victim(txn.tid)
+
+        future = request.future
+        try:
+            if deadline is None:
+                return await asyncio.shield(future)
+            return await asyncio.wait_for(asyncio.shield(future), deadline - loop.time())
+        except asyncio.TimeoutError:
+            if future.done():
+                return future.result()
+            self._record('timeout', txn.tid, item, request.lock_type)
+            self._cancel_request(txn, item, request)
+            return False
+        except asyncio.CancelledError:
+            # Caller's task was cancelled: withdraw the request. A lock
+            # granted in the meantime stays held until commit/abort.
+            if not future.done():
+                self._cancel_request(txn, item, request)
+            raise
+
+    def _try_lock(self, txn: Transaction, item: str, lock_type: LockType,
+                  wait: bool) -> Union[bool, AsyncLockRequest]:
+        """
+        Grant lock_type on item if possible.
+
+        Returns:
+            True if granted (or already held), False if it would have to
+            wait and wait is False, otherwise the queued request
+        """
+        tid = txn.tid
+        held = self._held_mode(txn, item)
+        if held is not None:
+            if covers(held, lock_type):
+                self._record('held', tid, item, lock_type)
+                return True
+            # Conversion of the held lock, e.g. S -> X or IX -> SIX
+            lock_type = lock_supremum(held, lock_type)
+
+        upgrade = held is not None
+        queue = self.wait_queues.get(item)
+
+        if upgrade:
+            if self._convert_lock(txn, item, lock_type):
+                return True
+        elif queue is None and self._can_grant_lock(tid, item, lock_type):
+            # Only grant immediately if nobody is queued ahead of us
+            self._grant_lock(txn, item, lock_type)
+            return True
+
+        # Need to wait
+        self._record('wait', tid, item, lock_type)
+        self.stats['locks_waited'] += 1
+        self.metrics.record_wait(item)
+        if not wait:
+            return False
+
+        txn.waiting_for = item
+        if queue is None:
+            queue = self.wait_queues[item] = deque()
+        request = AsyncLockRequest(tid, lock_type, upgrade)
+        if upgrade:
+            queue.appendleft(request)
+            self._refresh_wait_edges(item)
+        else:
+            # Only the new tail's edges change
+            ahead = queue[-1] if queue else None
+            queue.append(request)
+            self._set_wait_edges(item, request, ahead)
+        return request
+
+    def unlock(self, tid: int, item: str):
+        """
+        Release lock on an item.
+        Only allowed in basic 2PL, not in Strict 2PL.
+        """
+        if self.strict_2pl:
+            self._record('unlock_refused', tid, item)
+            return False
+
+        txn = self.transactions.get(tid)
+        if txn is None:
+            return False
+
+        lock_type = self._held_mode(txn, item)
+        if lock_type is not None:
+            self._release_lock(tid, item, txn.grant_times.pop(item, None))
+            txn.locks_held.discard((item, lock_type))
+            self._record('unlock', tid, item, lock_type)
+            self._process_wait_queue(item)
+        return True
+
+    def commit(self, tid: int):
+        """Commit transaction and release all locks."""
+        txn = self.transactions.pop(tid, None)
+        if txn is None:
+            self._record('not_found', tid)
+            return False
+
+        duration = time.time() - txn.start_time
+        self.txn_metrics.duration.observe(duration)
+        self._release_all(txn)
+        self._record('commit', tid, detail=duration)
+        return True
+
+    def abort(self, tid: int):
+        """Abort transaction and release all locks."""
+        self._abort_transaction(tid)
+
+    def _abort_transaction(self, tid: int, reason: str = 'user'):
+        """Internal abort implementation."""
+        txn = self.transactions.pop(tid, None)
+        if txn is None:
+            return
+        self.waits_for.remove(tid)
+        self.stats['transactions_aborted'] += 1
+        self.txn_metrics.abort_reasons[reason] += 1
+        self._release_all(txn)
+        self._record('abort', tid)
+
+    def _release_all(self, txn: Transaction):
+        """Drop a pending request and all held locks, then wake waiters."""
+        txn.finished = True
+        pending = txn.waiting_for
+        if pending is not None:
+            for request in self.wait_queues.get(pending, ()):
+                if request.tid == txn.tid:
+                    self._cancel_request(txn, pending, request)
+                    break
+
+        held = list(txn.locks_held)
+        txn.locks_held.clear()
+        for item, _ in held:
+            self._release_lock(txn.tid, item, txn.grant_times.get(item))
+        txn.grant_times = {}
+        for item, _ in held:
+            self._process_wait_queue(item)
+
+    def _cancel_request(self, txn: Transaction, item: str, request: AsyncLockRequest):
+        """Remove a pending request from its queue and resolve its future."""
+        self.wait_queues[item].remove(request)
+        request.cancelled = True
+        if not request.future.done():
+            request.future.set_result(False)
+        txn.waiting_for = None
+        self.waits_for.remove(txn.tid)
+        # The departed request may have been blocking the ones behind it
+        self._process_wait_queue(item)
+
+    def _process_wait_queue(self, item: str):
+        """
+        Grant queued requests on item in FIFO order.
+        Stops at the first request that is still incompatible.
+        """
+        queue = self.wait_queues.get(item)
+        if queue is None:
+            return
+
+        while queue:
+            request = queue[0]
+            txn = self.transactions.get(request.tid)
+            if txn is None or txn.finished or request.future.done():
+                queue.popleft()
+                request.cancelled = True
+                continue
+
+            waited = time.monotonic() - request.enqueued_at
+            if request.upgrade:
+                if not self._convert_lock(txn, item, request.lock_type, waited):
+                    break
+            elif self._can_grant_lock(request.tid, item, request.lock_type):
+                self._grant_lock(txn, item, request.lock_type, waited)
+            else:
+                break
+
+            queue.popleft()
+            request.granted = True
+            request.future.set_result(True)
+            self.waits_for.remove(request.tid)
+
+        if not queue:
+            del self.wait_queues[item]
+        else:
+            self._refresh_wait_edges(item)
+
+    def _refresh_wait_edges(self, item: str):
+        """Recompute the waits-for edges of every request queued on item."""
+        queue = self.wait_queues.get(item)
+        if queue is None:
+            return
+
+        ahead = None
+        for request in queue:
+            self._set_wait_edges(item, request, ahead)
+            ahead = request
+
+    def _set_wait_edges(self, item: str, request: AsyncLockRequest,
+                        ahead: Optional[AsyncLockRequest]):
+        """
+        Point request at the holders it conflicts with and at the request
+        directly ahead of it. Grants are strictly FIFO, so the request
+        waits for everything ahead; the chain reaches the same
+        transactions as one edge per request ahead, so detection finds the
+        same cycles, but a queue of n waiters costs O(n) edges, not O(n^2).
+        """
+        entry = self.lock_table.get(item)
+        blockers = set()
+        if entry is not None:
+            blockers = {holder for holder, held in entry.holders.items()
+                        if not compatible(held, request.lock_type)}
+        if ahead is not None:
+            blockers.add(ahead.tid)
+        blockers.discard(request.tid)
+        self.waits_for.set_waits(request.tid, blockers)
+
+    def _find_deadlock_victim(self, tid: int) -> Optional[int]:
+        """Search for a cycle through tid and pick a victim if one exists."""
+        cycle = self.waits_for.find_cycle(tid)
+        if cycle is None:
+            return None
+
+        txns = [self.transactions[t] for t in cycle if t in self.transactions]
+        if not txns:
+            return None
+        self.stats['deadlocks_detected'] += 1
+        victim = self.choose_victim(txns)
+        self.waits_for.remove(victim.tid)
+        self._record('deadlock', victim.tid, detail=cycle)
+        return victim.tid
+
+    def _can_grant_lock(self, tid: int, item: str, lock_type: LockType) -> bool:
+        """Check if lock can be granted. Never creates a lock-table entry."""
+        entry = self.lock_table.get(item)
+        return entry is None or entry.others_compatible(tid, lock_type)
+
+    def _grant_lock(self, txn: Transaction, item: str, lock_type: LockType,
+                    waited: float = 0.0):
+        """Grant lock to transaction."""
+        entry = self.lock_table.get(item)
+        if entry is None:
+            entry = self.lock_table[item] = LockEntry()
+        entry.add(txn.tid, lock_type)
+        txn.locks_held.add((item, lock_type))
+        txn.grant_times.setdefault(item, time.monotonic())
+        txn.waiting_for = None
+        self.stats['locks_granted'] += 1
+        self.metrics.record_grant(item, waited)
+        self._record('grant', txn.tid, item, lock_type)
+
+    def _release_lock(self, tid: int, item: str, granted_at: Optional[float] = None):
+        """Drop tid's lock on item, removing the entry once it is unheld."""
+        if granted_at is not None:
+            self.metrics.hold_time.observe(time.monotonic() - granted_at)
+        entry = self.lock_table.get(item)
+        if entry is None:
+            return
+        entry.remove(tid)
+        if not entry.holders:
+            del self.lock_table[item]
+
+    def _convert_lock(self, txn: Transaction, item: str, lock_type: LockType,
+                      waited: float = 0.0) -> bool:
+        """Convert txn's held lock on item to lock_type (e.g. S -> X)."""
+        entry = self.lock_table.get(item)
+        tid = txn.tid
+        if entry is None or tid not in entry.holders or not entry.others_compatible(tid, lock_type):
+            return False
+
+        old = entry.holders[tid]
+        entry.add(tid, lock_type)
+        txn.locks_held.discard((item, old))
+        txn.locks_held.add((item, lock_type))
+        txn.waiting_for = None
+        self._record('upgrade', tid, item, lock_type, old.value)
+        self.stats['locks_granted'] += 1
+        self.metrics.record_grant(item, waited)
+        return True
+
+    def print_statistics(self):
+        """Print lock manager statistics."""
+        print("\n" + "=" * 60)
+        print("STATISTICS")
+        print("=" * 60)
+        print(f"Locks granted: {self.stats['locks_granted']}")
+        print(f"Locks waited: {self.stats['locks_waited']}")
+        print(f"Transactions aborted: {self.stats['transactions_aborted']}")
+        print(f"Deadlocks detected: {self.stats['deadlocks_detected']}")
+        print("=" * 60)
+
+
+# Example usage
+if __name__ == "__main__":
+    import logging
+    import sys
+    from lock_events import LoggingSink
+
+    NUM_READERS = 5000
+
+    async def demo():
+        print("=" * 60)
+        print("ASYNC LOCK MANAGER DEMO")
+        print("=" * 60)
+
+        lm = AsyncLockManager(strict_2pl=True)
+
+        # T0 writes A; thousands of readers queue behind it as futures
+        lm.begin_transaction(0)
+        await lm.acquire(0, "A", LockType.EXCLUSIVE)
+
+        async def reader(tid):
+            lm.begin_transaction(tid)
+            await lm.acquire(tid, "A", LockType.SHARED)
+            lm.commit(tid)
+
+        readers = [asyncio.create_task(reader(tid)) for tid in range(1, NUM_READERS + 1)]
+        await asyncio.sleep(0.1)
+        print(f"Readers waiting on A: {len(lm.wait_queues['A'])}")
+
+        # Commit grants the whole run of shared requests at once
+        start = time.perf_counter()
+        lm.commit(0)
+        await asyncio.gather(*readers)
+        print(f"Woke {NUM_READERS} readers in {(time.perf_counter() - start) * 1e3:.1f} ms")
+        lm.print_statistics()
+
+        print("=" * 60)
+        print("ASYNC DEADLOCK DEMO")
+        print("=" * 60)
+
+        logging.basicConfig(level=logging.DEBUG, format="%(message)s", stream=sys.stdout)
+        lm = AsyncLockManager(strict_2pl=True, event_sink=LoggingSink())
+        lm.begin_transaction(1)
+        lm.begin_transaction(2)
+        await lm.acquire(1, "A", LockType.EXCLUSIVE)
+        await lm.acquire(2, "B", LockType.EXCLUSIVE)
+
+        t1 = asyncio.create_task(lm.acquire(1, "B", LockType.EXCLUSIVE))
+        await asyncio.sleep(0)
+        # Closes the cycle: youngest (T2) is aborted, T1 gets B
+        print(f"T2 request on A granted: {await lm.acquire(2, 'A', LockType.EXCLUSIVE)}")
+        print(f"T1 request on B granted: {await t1}")
+        lm.commit(1)
+        lm.print_statistics()
+
+    asyncio.run(demo())
@@ -0,0 +1,106 @@
+import random
+import threading
+import time
+from bisect import bisect_left
+from itertools import accumulate
+
+from lock_manager import LockManager, LockType
+
+SCHEMES = [None, 'wait_die', 'wound_wait']
+THREAD_COUNTS = [4, 16, 32]
+TXNS_PER_THREAD = 300
+ITEMS_PER_TXN = 4
+WRITE_RATIO = 0.5
+NUM_KEYS = 1000
+ZIPF_S = 1.1
+RESTART_BACKOFF = 0.0002  # Seconds; doubles per restart of the same transaction, capped at 2^6
+
+
+def zipf_sampler(num_keys, s, rng):
+    """Return a function drawing key ranks 0..num_keys-1 with P(k) ~ 1 / (k + 1)^s."""
+    cumulative = list(accumulate(1.0 / (k + 1) ** s for k in range(num_keys)))
+    total = cumulative[-1]
+    return lambda: bisect_left(cumulative, rng.random() * total)
+
+
+def run_workload(scheme, num_threads):
+    """
+    Run TXNS_PER_THREAD transactions on each of num_threads threads. Each
+    locks ITEMS_PER_TXN Zipfian keys in random order (so deadlocks are
+    possible) and restarts with its original timestamp until it commits,
+    after a randomised exponential backoff so an aborted transaction does
+    not immediately run into the same conflict again.
+
+    Args:
+        scheme: deadlock_prevention for the LockManager (None = detection)
+        num_threads: Worker threads
+
+    Returns:
+        (committed transactions per second, aborts per committed transaction)
+    """
+    lm = LockManager(strict_2pl=True, deadlock_prevention=scheme)
+    barrier = threading.Barrier(num_threads + 1)
+    aborts = [0] * num_threads
+
+    def worker(index):
+        rng = random.Random(index)
+        next_key = zipf_sampler(NUM_KEYS, ZIPF_S, rng)
+        attempt = 0
+        barrier.wait()
+        for _ in range(TXNS_PER_THREAD):
+            keys = set()
+            while len(keys) < ITEMS_PER_TXN:
+                keys.add(next_key())
+            requests = [(f"k{key}", LockType.EXCLUSIVE if rng.random() < WRITE_RATIO
+                         else LockType.SHARED) for key in keys]
+            timestamp = None
+            restarts = 0
+            while True:
+                attempt += 1
+                tid = index * 1_000_000 + attempt
+                lm.begin_transaction(tid, timestamp)
+                if timestamp is None:
+                    timestamp = lm.transactions[tid].timestamp
+                if all(lm.acquire(tid, item, lock_type) for item, lock_type in requests) \
+                        and lm.commit(tid):
+                    break
+                lm.abort(tid)
+                aborts[index] += 1
+                time.sleep(rng.uniform(0, RESTART_BACKOFF * 2 ** min(restarts, 6)))
+                restarts += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start_time = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start_time
+
+    committed = num_threads * TXNS_PER_THREAD
+    return committed / elapsed, sum(aborts) / committed
+
+
+def main():
+    print("=" * 60)
+    print("DEADLOCK HANDLING BENCHMARK")
+    print("=" * 60)
+    print(f"{TXNS_PER_THREAD} transactions per thread, {ITEMS_PER_TXN} locks each, "
+          f"{WRITE_RATIO:.0%} writes, Zipf(s={ZIPF_S}) over {NUM_KEYS} keys")
+
+    header = f"{'Threads':>7}  {'Scheme':<12}{'Commits/s':>12}{'Aborts/commit':>16}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for num_threads in THREAD_COUNTS:
+        for scheme in SCHEMES:
+            throughput, abort_rate = run_workload(scheme, num_threads)
+            print(f"{num_threads:>7}  {scheme or 'detection':<12}"
+                  f"{throughput:>12,.0f}{abort_rate:>16.3f}")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
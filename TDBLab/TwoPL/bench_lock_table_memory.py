@@ -0,0 +1,63 @@
+import gc
+import tracemalloc
+from collections import defaultdict
+
+from lock_manager import LockEntry, LockType
+
+NUM_ITEMS = 100_000
+
+
+def measure(build):
+    """Return bytes allocated by build() per item, and the built object."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / NUM_ITEMS, table
+
+
+def legacy_table():
+    """Original layout: item -> {SHARED: set(), EXCLUSIVE: set()}."""
+    table = defaultdict(lambda: {LockType.SHARED: set(), LockType.EXCLUSIVE: set()})
+    for i in range(NUM_ITEMS):
+        table[f"item{i}"][LockType.SHARED].add(1)
+    return table
+
+
+def compact_table():
+    """Current layout: item -> LockEntry, only while locked."""
+    table = {}
+    for i in range(NUM_ITEMS):
+        entry = table[f"item{i}"] = LockEntry()
+        entry.add(1, LockType.SHARED)
+    return table
+
+
+def main():
+    print("=" * 60)
+    print("LOCK TABLE MEMORY")
+    print("=" * 60)
+    print(f"Items locked (one shared holder each): {NUM_ITEMS:,}")
+
+    legacy_bytes, legacy = measure(legacy_table)
+    compact_bytes, compact = measure(compact_table)
+
+    # Release every lock the way commit does
+    for i in range(NUM_ITEMS):
+        legacy[f"item{i}"][LockType.SHARED].discard(1)
+    for i in range(NUM_ITEMS):
+        key = f"item{i}"
+        compact[key].remove(1)
+        if not compact[key].holders:
+            del compact[key]
+
+    print(f"\n{'Layout':<12}{'bytes/locked item':>20}{'entries after release':>24}")
+    print(f"{'legacy':<12}{legacy_bytes:>20.0f}{len(legacy):>24,}")
+    print(f"{'LockEntry':<12}{compact_bytes:>20.0f}{len(compact):>24,}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
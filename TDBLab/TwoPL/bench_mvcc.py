@@ -0,0 +1,103 @@
+import random
+import threading
+import time
+
+from lock_manager import LockManager
+
+READER_THREADS = 4
+WRITER_COUNTS = [0, 2, 8]
+DURATION = 1.0  # Seconds per run
+NUM_KEYS = 100
+READS_PER_TXN = 8
+WRITES_PER_TXN = 2
+WRITER_THINK_TIME = 0.002  # Seconds a writer holds its X locks before committing
+
+
+def run_workload(snapshot_isolation, num_writers):
+    """
+    Run READER_THREADS read-only transactions against num_writers writers
+    for DURATION seconds. Writers sleep while holding their X locks, so
+    they cost little CPU but keep hot keys locked. Both sides lock keys in
+    sorted order, so the only aborts are snapshot write conflicts.
+
+    Args:
+        snapshot_isolation: LockManager mode under test
+        num_writers: Concurrent writer threads
+
+    Returns:
+        (reader transactions per second, writer transactions per second)
+    """
+    lm = LockManager(strict_2pl=True, snapshot_isolation=snapshot_isolation)
+    lm.start_vacuum(interval=0.1)
+    stop = threading.Event()
+    barrier = threading.Barrier(READER_THREADS + num_writers + 1)
+    reads_done = [0] * READER_THREADS
+    writes_done = [0] * num_writers
+
+    def reader(index):
+        rng = random.Random(index)
+        n = 0
+        barrier.wait()
+        while not stop.is_set():
+            n += 1
+            tid = index * 1_000_000 + n
+            lm.begin_transaction(tid)
+            keys = sorted(rng.sample(range(NUM_KEYS), READS_PER_TXN))
+            if all(lm.read(tid, f"k{key}")[0] for key in keys):
+                lm.commit(tid)
+                reads_done[index] += 1
+            else:
+                lm.abort(tid)
+
+    def writer(index):
+        rng = random.Random(-index - 1)
+        n = 0
+        barrier.wait()
+        while not stop.is_set():
+            n += 1
+            tid = (READER_THREADS + index) * 1_000_000 + n
+            lm.begin_transaction(tid)
+            keys = sorted(rng.sample(range(NUM_KEYS), WRITES_PER_TXN))
+            if all(lm.write(tid, f"k{key}", n) for key in keys):
+                time.sleep(WRITER_THINK_TIME)
+                if lm.commit(tid):
+                    writes_done[index] += 1
+            else:
+                lm.abort(tid)
+
+    threads = ([threading.Thread(target=reader, args=(i,)) for i in range(READER_THREADS)]
+               + [threading.Thread(target=writer, args=(i,)) for i in range(num_writers)])
+    for t in threads:
+        t.start()
+    barrier.wait()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+    lm.stop_vacuum()
+
+    return sum(reads_done) / DURATION, sum(writes_done) / DURATION
+
+
+def main():
+    print("=" * 60)
+    print("SNAPSHOT ISOLATION READ BENCHMARK")
+    print("=" * 60)
+    print(f"{READER_THREADS} reader threads, {READS_PER_TXN} reads per transaction, "
+          f"{NUM_KEYS} keys, writers hold X for {WRITER_THINK_TIME * 1e3:.0f} ms")
+
+    header = f"{'Writers':>7}  {'Mode':<10}{'Reader txn/s':>14}{'Writer txn/s':>14}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for num_writers in WRITER_COUNTS:
+        for snapshot_isolation in (False, True):
+            reads, writes = run_workload(snapshot_isolation, num_writers)
+            mode = "snapshot" if snapshot_isolation else "2PL"
+            print(f"{num_writers:>7}  {mode:<10}{reads:>14,.0f}{writes:>14,.0f}")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import random
+import threading
+import time
+
+from lock_manager import LockManager, LockType
+
+THREAD_COUNTS = [1, 2, 4, 8, 16, 32]
+SHARD_COUNTS = [1, 16]
+OPS_PER_THREAD = 2000
+ITEMS_PER_TXN = 4
+HOT_KEYS = 8
+
+
+def run_workload(num_shards, num_threads, hot):
+    """
+    Run begin / lock x ITEMS_PER_TXN / commit loops on num_threads threads.
+
+    Args:
+        num_shards: Lock-table partitions for the LockManager
+        num_threads: Worker threads
+        hot: If True every thread share-locks the same HOT_KEYS items,
+             otherwise each thread exclusively locks its own key range
+
+    Returns:
+        Lock operations per second
+    """
+    lm = LockManager(strict_2pl=True, num_shards=num_shards)
+    txns_per_thread = OPS_PER_THREAD // ITEMS_PER_TXN
+    barrier = threading.Barrier(num_threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        barrier.wait()
+        for n in range(txns_per_thread):
+            tid = index * 1_000_000 + n
+            lm.begin_transaction(tid)
+            if hot:
+                items = sorted(rng.sample(range(HOT_KEYS), ITEMS_PER_TXN))
+                for key in items:
+                    lm.acquire(tid, f"hot{key}", LockType.SHARED)
+            else:
+                for key in rng.sample(range(1000), ITEMS_PER_TXN):
+                    lm.acquire(tid, f"t{index}:k{key}", LockType.EXCLUSIVE)
+            lm.commit(tid)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start_time = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start_time
+
+    return num_threads * txns_per_thread * ITEMS_PER_TXN / elapsed
+
+
+def main():
+    print("=" * 60)
+    print("LOCK MANAGER SHARDING BENCHMARK")
+    print("=" * 60)
+    print(f"Lock ops per thread: {OPS_PER_THREAD:,} ({ITEMS_PER_TXN} per transaction)")
+
+    for hot in (False, True):
+        workload = f"hot-key ({HOT_KEYS} shared keys)" if hot else "disjoint keys"
+        print(f"\nWorkload: {workload}")
+        header = "Threads" + "".join(f"{f'{n} shard(s)':>16}" for n in SHARD_COUNTS)
+        print(header)
+        print("-" * len(header))
+        for num_threads in THREAD_COUNTS:
+            row = f"{num_threads:>7}"
+            for num_shards in SHARD_COUNTS:
+                ops = run_workload(num_shards, num_threads, hot)
+                row += f"{ops:>12,.0f} op/s"
+            print(row)
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import shutil
+import tempfile
+import threading
+import time
+
+from lock_manager import LockManager
+from wal import WriteAheadLog
+
+THREAD_COUNTS = [1, 4, 16, 64]
+WINDOWS = [0.0, 0.001]  # Group commit latency windows in seconds
+COMMITS_PER_THREAD = 200
+
+
+def run_workload(window, num_threads):
+    """
+    Run single-write transactions on num_threads threads against a
+    LockManager logging to a fresh WAL in a temporary directory.
+
+    Returns:
+        (commits per second, commits per fsync)
+    """
+    directory = tempfile.mkdtemp(prefix="bench_wal_")
+    try:
+        wal = WriteAheadLog(directory, group_commit_window=window)
+        lm = LockManager(strict_2pl=True, wal=wal)
+        barrier = threading.Barrier(num_threads + 1)
+
+        def worker(index):
+            barrier.wait()
+            for n in range(COMMITS_PER_THREAD):
+                tid = index * 1_000_000 + n
+                lm.begin_transaction(tid)
+                lm.write(tid, f"account{index}", n)
+                lm.commit(tid)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+        for t in threads:
+            t.start()
+        fsyncs_before = wal.stats['fsyncs']
+        barrier.wait()
+        start_time = time.perf_counter()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start_time
+        wal.close()
+
+        commits = num_threads * COMMITS_PER_THREAD
+        return commits / elapsed, commits / max(1, wal.stats['fsyncs'] - fsyncs_before)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    print("=" * 60)
+    print("WRITE-AHEAD LOG GROUP COMMIT BENCHMARK")
+    print("=" * 60)
+    print(f"{COMMITS_PER_THREAD} single-write transactions per thread, fsync on commit")
+
+    header = f"{'Threads':>7}  {'Window':>8}{'Commits/s':>12}{'Commits/fsync':>16}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for num_threads in THREAD_COUNTS:
+        for window in WINDOWS:
+            throughput, per_fsync = run_workload(window, num_threads)
+            print(f"{num_threads:>7}  {window * 1e3:>6.1f}ms{throughput:>12,.0f}{per_fsync:>16.1f}")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Callable, List, Optional
+
+from async_lock_manager import AsyncLockManager
+from lock_manager import LockManager, LockType
+
+RESULT_FORMAT_VERSION = 1
+DEFAULT_SHARDS = 16
+THREADS_ONLY_OPTIONS = ('shards', 'deadlock_prevention')  # Not in asyncio mode
+
+
+def zipf_sampler(num_keys, s, rng):
+    """Return a function drawing key ranks 0..num_keys-1 with P(k) ~ 1 / (k + 1)^s."""
+    cumulative = list(accumulate(1.0 / (k + 1) ** s for k in range(num_keys)))
+    total = cumulative[-1]
+    return lambda: bisect_left(cumulative, rng.random() * total)
+
+
+def key_sampler(config, rng) -> Callable[[], int]:
+    """Key generator for the configured distribution."""
+    if config.distribution == 'zipf':
+        return zipf_sampler(config.keys, config.zipf_s, rng)
+    return lambda: rng.randrange(config.keys)
+
+
+def generate_transaction(config, rng, next_key) -> List[tuple]:
+    """One transaction: txn_length distinct (item, lock_type) requests in access order."""
+    keys = []
+    seen = set()
+    while len(keys) < min(config.txn_length, config.keys):
+        key = next_key()
+        if key not in seen:
+            seen.add(key)
+            keys.append(key)
+    return [(f"k{key}", LockType.EXCLUSIVE if rng.random() < config.write_ratio
+             else LockType.SHARED) for key in keys]
+
+
+class WorkerResult:
+    """Counters and raw lock latencies of one worker."""
+
+    def __init__(self):
+        self.commits = 0
+        self.aborts = 0
+        self.lock_ops = 0
+        self.latencies: List[float] = []
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Exact (nearest-rank) q-th quantile of sorted samples."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def run_threads(config) -> tuple:
+    """Run the workload on config.workers threads against a LockManager."""
+    lm = LockManager(strict_2pl=True, num_shards=config.shards,
+                     deadlock_prevention=config.deadlock_prevention)
+    results = [WorkerResult() for _ in range(config.workers)]
+    barrier = threading.Barrier(config.workers + 1)
+
+    def worker(index):
+        rng = random.Random(config.seed * 1_000_003 + index)
+        next_key = key_sampler(config, rng)
+        result = results[index]
+        barrier.wait()
+        for n in range(config.txns_per_worker):
+            tid = index * 1_000_000 + n
+            requests = generate_transaction(config, rng, next_key)
+            lm.begin_transaction(tid)
+            ok = True
+            for item, lock_type in requests:
+                start = time.perf_counter()
+                ok = lm.acquire(tid, item, lock_type, timeout=config.lock_timeout)
+                result.latencies.append(time.perf_counter() - start)
+                result.lock_ops += 1
+                if not ok:
+                    break
+                if config.think_time:
+                    time.sleep(config.think_time)
+            if ok and lm.commit(tid):
+                result.commits += 1
+            else:
+                lm.abort(tid)
+                result.aborts += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(config.workers)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start_time = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start_time, results, lm.stats
+
+
+def run_asyncio(config) -> tuple:
+    """Run the workload as config.workers asyncio tasks against an AsyncLockManager."""
+    results = [WorkerResult() for _ in range(config.workers)]
+
+    async def main():
+        lm = AsyncLockManager(strict_2pl=True)
+
+        async def worker(index):
+            rng = random.Random(config.seed * 1_000_003 + index)
+            next_key = key_sampler(config, rng)
+            result = results[index]
+            for n in range(config.txns_per_worker):
+                tid = index * 1_000_000 + n
+                requests = generate_transaction(config, rng, next_key)
+                lm.begin_transaction(tid)
+                ok = True
+                for item, lock_type in requests:
+                    start = time.perf_counter()
+                    ok = await lm.acquire(tid, item, lock_type, timeout=config.lock_timeout)
+                    result.latencies.append(time.perf_counter() - start)
+                    result.lock_ops += 1
+                    if not ok:
+                        break
+                    # Yield even without think time so tasks interleave
+                    await asyncio.sleep(config.think_time)
+                if ok and lm.commit(tid):
+                    result.commits += 1
+                else:
+                    lm.abort(tid)
+                    result.aborts += 1
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(config.workers)))
+        return time.perf_counter() - start_time, lm.stats
+
+    elapsed, stats = asyncio.run(main())
+    return elapsed, results, stats
+
+
+def git_revision() -> Optional[str]:
+    """Current git commit, if run inside a checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(config) -> dict:
+    """Run the configured workload and return the JSON-ready result document."""
+    runner = run_asyncio if config.mode == 'asyncio' else run_threads
+    elapsed, results, stats = runner(config)
+
+    # Exact percentiles from every sample, so --compare sees small shifts
+    latencies = sorted(sample for result in results for sample in result.latencies)
+    commits = sum(r.commits for r in results)
+    aborts = sum(r.aborts for r in results)
+    lock_ops = sum(r.lock_ops for r in results)
+
+    return {
+        'format_version': RESULT_FORMAT_VERSION,
+        'config': {key: value for key, value in vars(config).items()
+                   if key not in ('output', 'compare')
+                   and not (config.mode == 'asyncio' and key in THREADS_ONLY_OPTIONS)},
+        'environment': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': {
+            'elapsed_seconds': elapsed,
+            'commits': commits,
+            'aborts': aborts,
+            'throughput_txn_per_s': commits / elapsed,
+            'lock_ops_per_s': lock_ops / elapsed,
+            'abort_rate': aborts / max(1, commits + aborts),
+            'deadlocks': stats.get('deadlocks_detected', 0),
+            'lock_latency_seconds': {
+                'mean': sum(latencies) / max(1, len(latencies)),
+                'p50': percentile(latencies, 0.50),
+                'p99': percentile(latencies, 0.99),
+                'p999': percentile(latencies, 0.999),
+                'max': latencies[-1] if latencies else 0.0
+            }
+        }
+    }
+
+
+def flatten(results: dict, prefix: str = '') -> dict:
+    """Nested result dict -> {'a.b': value}."""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def print_report(document: dict, baseline: Optional[dict] = None):
+    """Print the results, side by side with a baseline run if given."""
+    print("=" * 60)
+    print("LOCK MANAGER WORKLOAD BENCHMARK")
+    print("=" * 60)
+    config = document['config']
+    print(f"{config['workers']} workers ({config['mode']}) x {config['txns_per_worker']} txns, "
+          f"{config['txn_length']} locks/txn, {config['write_ratio']:.0%} writes, "
+          f"{config['distribution']} over {config['keys']} keys")
+
+    current = flatten(document['results'])
+    if baseline is None:
+        for key, value in current.items():
+            print(f"{key:<32}{value:>16.6g}")
+    else:
+        if baseline.get('format_version') != document['format_version']:
+            print("WARNING: baseline was written in a different result format")
+        if baseline['config'] != config:
+            print("WARNING: baseline was run with a different configuration")
+        previous = flatten(baseline['results'])
+        print(f"{'metric':<32}{'baseline':>14}{'current':>14}{'change':>10}")
+        for key, value in current.items():
+            before = previous.get(key)
+            if before is None:
+                print(f"{key:<32}{'-':>14}{value:>14.6g}")
+            else:
+                change = f"{(value - before) / before:+.1%}" if before else "-"
+                print(f"{key:<32}{before:>14.6g}{value:>14.6g}{change:>10}")
+    print("=" * 60)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reproducible lock manager workload benchmark")
+    parser.add_argument('--mode', choices=['threads', 'asyncio'], default='threads')
+    parser.add_argument('--workers', type=int, default=8, help="Threads or asyncio tasks")
+    parser.add_argument('--txns-per-worker', type=int, default=500)
+    parser.add_argument('--txn-length', type=int, default=4, help="Locks per transaction")
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--distribution', choices=['uniform', 'zipf'], default='zipf')
+    parser.add_argument('--zipf-s', type=float, default=1.1)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help="Seconds between lock requests")
+    parser.add_argument('--lock-timeout', type=float, default=None,
+                        help="Seconds before a lock request gives up (default: wait)")
+    parser.add_argument('--shards', type=int, default=None,
+                        help=f"Lock table shards (threads mode; default {DEFAULT_SHARDS})")
+    parser.add_argument('--deadlock-prevention', choices=['wait_die', 'wound_wait'],
+                        default=None,
+                        help="Threads mode only; default: waits-for graph detection")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the result document as JSON here")
+    parser.add_argument('--compare', help="Baseline result JSON to compare against")
+    config = parser.parse_args(argv)
+    if config.mode == 'asyncio':
+        # AsyncLockManager has neither; don't record a config that didn't run
+        for option in THREADS_ONLY_OPTIONS:
+            if getattr(config, option) is not None:
+                parser.error(f"--{option.replace('_', '-')} is not supported with --mode asyncio")
+    elif config.shards is None:
+        config.shards = DEFAULT_SHARDS
+    return config
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    document = run(config)
+
+    baseline = None
+    if config.compare:
+        with open(config.compare) as f:
+            baseline = json.load(f)
+    print_report(document, baseline)
+
+    if config.output:
+        with open(config.output, "w") as f:
+            json.dump(document, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+# Raw event recorded by the lock manager:
+# (timestamp, kind, tid, item, lock_type value, detail)
+Event = Tuple[float, str, int, Optional[str], Optional[str], object]
+
+# Kinds that indicate a problem rather than routine progress
+PROBLEM_EVENTS = {'duplicate', 'not_found', 'timeout', 'unlock_refused',
+                  'deadlock', 'die', 'wound', 'write_conflict', 'abort'}
+
+
+def format_event(event: Event) -> str:
+    """Render a raw event as the lock manager's console message."""
+    _, kind, tid, item, lock_type, detail = event
+    if kind == 'begin':
+        return f"SUCCESS: Transaction T{tid} started"
+    if kind == 'duplicate':
+        return f"WARNING: Transaction T{tid} already exists!"
+    if kind == 'not_found':
+        return f"ERROR: Transaction T{tid} not found!"
+    if kind == 'held':
+        return f"  T{tid} already holds {lock_type} lock on {item}"
+    if kind == 'grant':
+        return f"LOCK GRANTED: T{tid} acquired {lock_type} lock on {item}"
+    if kind == 'wait':
+        return f"WAITING: T{tid} waiting for {lock_type} lock on {item}"
+    if kind == 'timeout':
+        return f"TIMEOUT: T{tid} gave up waiting for {lock_type} lock on {item}"
+    if kind == 'upgrade':
+        return f"UPGRADE: T{tid} upgraded lock on {item} ({detail} -> {lock_type})"
+    if kind == 'downgrade':
+        return f"DOWNGRADE: T{tid} returned lock on {item} to {lock_type} ({detail} rolled back)"
+    if kind == 'unlock':
+        return f"UNLOCK: T{tid} released {lock_type} lock on {item}"
+    if kind == 'unlock_refused':
+        return "WARNING: Cannot unlock in Strict 2PL mode. Use commit/abort."
+    if kind == 'commit':
+        return f"COMMIT: T{tid} COMMITTED (duration: {detail:.3f}s)"
+    if kind == 'abort':
+        return f"ABORT: T{tid} ABORTED"
+    if kind == 'escalate':
+        return f"ESCALATE: T{tid} replaced {detail} child locks with {lock_type} lock on {item}"
+    if kind == 'die':
+        return f"DIE: T{tid} is younger than T{detail}, aborted instead of waiting for {lock_type} lock on {item}"
+    if kind == 'wound':
+        return f"WOUND: older T{detail} aborts T{tid} to get {lock_type} lock on {item}"
+    if kind == 'write_conflict':
+        return f"WRITE CONFLICT: {item} was committed after T{tid}'s snapshot, aborting T{tid}"
+    if kind == 'deadlock':
+        path = " -> ".join(f"T{t}" for t in detail + [detail[0]])
+        return f"DEADLOCK: cycle {path}, aborting victim T{tid}"
+    return f"{kind.upper()}: T{tid} {item or ''} {detail or ''}".rstrip()
+
+
+class EventSink:
+    """
+    Destination for lock manager events. The base sink is disabled, so the
+    lock manager skips recording entirely.
+    """
+    enabled = False
+
+    def emit(self, events: List[Event]):
+        """Receive a batch of events. Called with no lock manager locks held."""
+
+
+class NullSink(EventSink):
+    """Default sink: drops everything."""
+
+
+class RingBufferTracer(EventSink):
+    """Keeps the most recent events in memory for debugging."""
+    enabled = True
+
+    def __init__(self, capacity: int = 10000):
+        self.events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def emit(self, events: List[Event]):
+        with self._lock:
+            self.events.extend(events)
+
+    def dump(self) -> List[str]:
+        """Formatted events, oldest first."""
+        with self._lock:
+            events = list(self.events)
+        return [f"{time.strftime('%H:%M:%S', time.localtime(e[0]))}"
+                f".{int(e[0] % 1 * 1e6):06d} {format_event(e)}" for e in events]
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+
+
+class LoggingSink(EventSink):
+    """
+    Forwards events to a logging.Logger. Routine events go out at level,
+    problem events (deadlocks, aborts, timeouts) at WARNING. Each record
+    carries lock_event, tid and item attributes for structured handlers.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger("lock_manager")
+        self.level = level
+
+    @property
+    def enabled(self) -> bool:
+        return self.logger.isEnabledFor(min(self.level, logging.WARNING))
+
+    def emit(self, events: List[Event]):
+        for event in events:
+            kind = event[1]
+            level = logging.WARNING if kind in PROBLEM_EVENTS else self.level
+            if self.logger.isEnabledFor(level):
+                self.logger.log(level, format_event(event),
+                                extra={'lock_event': kind, 'tid': event[2], 'item': event[3]})
@@ -1,81 +1,534 @@
+import itertools
 import threading
 import time
 from enum import Enum
-from collections import defaultdict
-from typing import Set, Dict, Optional
+from collections import defaultdict, deque
+from typing import Set, Dict, Optional, Deque, List, Callable, Union
+
+from lock_events import EventSink, NullSink
+from lock_metrics import ShardMetrics, TransactionMetrics, build_snapshot
+from mvcc import VersionStore
+from wal import WriteAheadLog
 
 class LockType(Enum):
     """Types of locks"""
     SHARED = "S"      # Read lock
     EXCLUSIVE = "X"   # Write lock
+    INTENTION_SHARED = "IS"       # Will S-lock descendants
+    INTENTION_EXCLUSIVE = "IX"    # Will X-lock descendants
+    SHARED_INTENTION_EXCLUSIVE = "SIX"  # S on the node + IX
 
 class LockMode(Enum):
     """Lock compatibility modes"""
     COMPATIBLE = "compatible"
     INCOMPATIBLE = "incompatible"
 
+IS = LockType.INTENTION_SHARED
+IX = LockType.INTENTION_EXCLUSIVE
+S = LockType.SHARED
+SIX = LockType.SHARED_INTENTION_EXCLUSIVE
+X = LockType.EXCLUSIVE
+
+# Requested modes compatible with each held mode
+_COMPATIBLE_WITH = {
+    IS: {IS, IX, S, SIX},
+    IX: {IS, IX},
+    S: {IS, S},
+    SIX: {IS},
+    X: set(),
+}
+
+# Compatibility matrix: (held, requested) -> LockMode
+LOCK_COMPATIBILITY = {
+    (held, requested): LockMode.COMPATIBLE if requested in _COMPATIBLE_WITH[held]
+    else LockMode.INCOMPATIBLE
+    for held in LockType for requested in LockType
+}
+
+def compatible(held: LockType, requested: LockType) -> bool:
+    """Check whether two lock types can be held on the same item."""
+    return LOCK_COMPATIBILITY[(held, requested)] == LockMode.COMPATIBLE
+
+def lock_supremum(a: LockType, b: LockType) -> LockType:
+    """Weakest mode at least as strong as both (the conversion target)."""
+    if a == b or b == IS:
+        return a
+    if a == IS:
+        return b
+    if X in (a, b):
+        return X
+    return SIX  # Any two of IX, S, SIX
+
+def covers(held: LockType, requested: LockType) -> bool:
+    """Check whether holding `held` already grants `requested`."""
+    return lock_supremum(held, requested) == held
+
+def intention_for(lock_type: LockType) -> LockType:
+    """Intention mode required on ancestors before taking lock_type."""
+    return IS if lock_type in (IS, S) else IX
+
+def ancestor_covers(held: LockType, requested: LockType) -> bool:
+    """Check whether `held` on an ancestor implicitly grants `requested` below it."""
+    return held == X or (held in (S, SIX) and requested in (IS, S))
+
+# Hierarchical item names: "table/page/row"
+ITEM_SEPARATOR = "/"
+
+def ancestors(item: str) -> List[str]:
+    """Ancestors of item, root first ("t/p/r" -> ["t", "t/p"])."""
+    parts = item.split(ITEM_SEPARATOR)
+    return [ITEM_SEPARATOR.join(parts[:i]) for i in range(1, len(parts))]
+
+def parent_of(item: str) -> Optional[str]:
+    """Parent of item, or None for a root item."""
+    cut = item.rfind(ITEM_SEPARATOR)
+    return item[:cut] if cut > 0 else None
+
 class Transaction:
     """Represents a database transaction"""
-    def __init__(self, tid: int):
+    def __init__(self, tid: int, timestamp: int = 0):
         self.tid = tid
+        self.timestamp = timestamp  # Age for deadlock prevention: lower is older
         self.locks_held: Set[tuple] = set()  # (item, lock_type)
         self.waiting_for: Optional[str] = None
         self.start_time = time.time()
+        self.grant_times: Dict[str, float] = {}  # item -> monotonic grant time
+        self.child_counts: Dict[str, int] = {}   # parent -> child locks held
+        self.snapshot_ts: Optional[int] = None   # Commit timestamp it reads as of
+        self.write_set: Dict[str, object] = {}   # Buffered writes, installed at commit
+        # Guards locks_held/waiting_for, which are updated from whichever
+        # shard grants the lock; finished stops grants once release begins
+        self.latch = threading.Lock()
+        self.finished = False
     
     def __repr__(self):
         return f"T{self.tid}"
 
+class LockRequest:
+    """A blocked lock request waiting in an item's queue"""
+    def __init__(self, tid: int, lock_type: LockType, upgrade: bool = False):
+        self.tid = tid
+        self.lock_type = lock_type
+        self.upgrade = upgrade      # Conversion of a held lock to lock_type
+        self.granted = False
+        self.cancelled = False      # Set when the requester aborts or times out
+        self.enqueued_at = time.monotonic()
+
+    def __repr__(self):
+        return f"T{self.tid}:{self.lock_type.value}"
+
+class WaitsForGraph:
+    """
+    Waits-for graph: edge Ti -> Tj means Ti is blocked behind Tj.
+    Maintained incrementally - a waiter's out-edges are set when it blocks,
+    refreshed when its item's holders/queue change, and dropped when it is
+    granted or leaves. Any new cycle must pass through the transaction whose
+    edges just changed, so detection only searches from that node.
+    """
+    def __init__(self):
+        self.edges: Dict[int, Set[int]] = {}
+    
+    def set_waits(self, tid: int, blockers: Set[int]):
+        """Replace the out-edges of tid."""
+        if blockers:
+            self.edges[tid] = blockers
+        else:
+            self.edges.pop(tid, None)
+    
+    def remove(self, tid: int):
+        """Drop the out-edges of tid (granted, cancelled or finished)."""
+        self.edges.pop(tid, None)
+    
+    def find_cycle(self, start: int) -> Optional[List[int]]:
+        """Return a cycle through start as a list of tids, or None."""
+        path = [start]
+        visited = {start}
+        stack = [iter(self.edges.get(start, ()))]
+        while stack:
+            for nxt in stack[-1]:
+                if nxt == start:
+                    return list(path)
+                if nxt not in visited and nxt in self.edges:
+                    visited.add(nxt)
+                    path.append(nxt)
+                    stack.append(iter(self.edges[nxt]))
+                    break
+            else:
+                stack.pop()
+                path.pop()
+        return None
+
+# Victim selection policies: list of transactions in the cycle -> victim
+VICTIM_POLICIES: Dict[str, Callable[[List[Transaction]], Transaction]] = {
+    'youngest': lambda txns: max(txns, key=lambda t: (t.start_time, t.tid)),
+    'fewest_locks': lambda txns: min(txns, key=lambda t: (len(t.locks_held), -t.start_time)),
+}
+
+# Timestamp-based deadlock prevention schemes
+DEADLOCK_PREVENTION = ('wait_die', 'wound_wait')
+
+def older(a: Transaction, b: Transaction) -> bool:
+    """Check whether a started before b (by timestamp, then tid)."""
+    return (a.timestamp, a.tid) < (b.timestamp, b.tid)
+
+class LockEntry:
+    """
+    Lock-table entry for one item.
+    Exists only while at least one transaction holds a lock on the item.
+    """
+    __slots__ = ('holders', 'x_owner', 'mode')
+    
+    def __init__(self):
+        self.holders: Dict[int, LockType] = {}  # Holder -> mode it holds
+        self.x_owner: Optional[int] = None  # Holder of the EXCLUSIVE lock
+        self.mode: Optional[LockType] = None  # Group mode (supremum of holders)
+    
+    def held_type(self, tid: int) -> LockType:
+        """Lock type held by tid (which must be a holder)."""
+        return self.holders[tid]
+    
+    def add(self, tid: int, lock_type: LockType):
+        """Record a granted lock, or a conversion of tid's lock to lock_type."""
+        self.holders[tid] = lock_type
+        if lock_type == X:
+            self.x_owner = tid
+        self.mode = lock_type if self.mode is None else lock_supremum(self.mode, lock_type)
+    
+    def remove(self, tid: int):
+        """Drop tid's lock."""
+        removed = self.holders.pop(tid, None)
+        if self.x_owner == tid:
+            self.x_owner = None
+        if removed == self.mode:
+            # Recompute the group mode; it can only have weakened
+            mode = None
+            for held in self.holders.values():
+                mode = held if mode is None else lock_supremum(mode, held)
+                if mode == removed:
+                    break
+            self.mode = mode
+    
+    def others_compatible(self, tid: int, lock_type: LockType) -> bool:
+        """Check lock_type against every holder except tid."""
+        if tid not in self.holders:
+            return compatible(self.mode, lock_type)
+        return all(compatible(held, lock_type)
+                   for holder, held in self.holders.items() if holder != tid)
+
+class WaitQueue:
+    """
+    FIFO queue of blocked requests for a single item.
+    Waiters sleep on the per-item condition, which shares the shard lock,
+    so a release only wakes the threads queued on the items it touched.
+    """
+    def __init__(self, shard_lock):
+        self.requests: Deque[LockRequest] = deque()
+        self.cond = threading.Condition(shard_lock)
+
+class LockShard:
+    """
+    One independently locked partition of the lock table.
+    Items hash to a shard; everything about an item (holders, wait queue,
+    grant counters) lives in its shard and is guarded by the shard lock.
+    """
+    def __init__(self, index: int):
+        self.index = index
+        self.lock = threading.Lock()
+        
+        # Lock table: item -> LockEntry (only while the item is locked)
+        self.lock_table: Dict[str, LockEntry] = {}
+        
+        # Wait queues: item -> FIFO of blocked requests (only while non-empty)
+        self.wait_queues: Dict[str, WaitQueue] = {}
+        
+        self.stats = {
+            'locks_granted': 0,
+            'locks_waited': 0
+        }
+        self.metrics = ShardMetrics()
+
 class LockManager:
     """
     Implements lock-based concurrency control protocols.
     Supports:
     - Two-Phase Locking (2PL)
     - Strict Two-Phase Locking (Strict 2PL)
-    - Deadlock detection
+    - Deadlock detection, or wait-die / wound-wait deadlock prevention
+    - Multi-granularity locking (IS/IX/S/SIX/X on "table/page/row" items)
+      with automatic lock escalation
+    - Optional snapshot isolation: read() serves committed versions from
+      the transaction's snapshot without locking, write() still takes X
+    - Optional write-ahead logging of writes and commits (see wal)
+    
+    The lock table is split into independently locked shards. Lock order is
+    shard lock -> transaction latch -> manager_lock; a thread never holds
+    two shard locks at once, and commit/abort visit shards in index order.
     """
     
-    def __init__(self, strict_2pl=True):
+    def __init__(self, strict_2pl=True,
+                 deadlock_victim: Union[str, Callable[[List[Transaction]], Transaction]] = 'youngest',
+                 num_shards: int = 16,
+                 event_sink: Optional[EventSink] = None,
+                 escalation_threshold: Optional[int] = 1000,
+                 deadlock_prevention: Optional[str] = None,
+                 snapshot_isolation: bool = False,
+                 wal: Optional[WriteAheadLog] = None):
         """
         Initialize lock manager.
         
         Args:
             strict_2pl: If True, use Strict 2PL (hold locks until commit/abort)
                        If False, use basic 2PL (can release locks before commit)
+            deadlock_victim: Policy picking which transaction in a deadlock
+                       cycle to abort: 'youngest' (latest start_time),
+                       'fewest_locks', or a callable taking the cycle's
+                       transactions and returning the victim
+            num_shards: Number of independently locked lock-table partitions
+            event_sink: Receives grant/wait/commit/abort/... events
+                       (see lock_events); default NullSink records nothing
+            escalation_threshold: Once a transaction holds this many locks
+                       directly under one parent item, the next request
+                       locks the parent instead (S, or X if any child is
+                       written) and releases the children. None disables.
+            deadlock_prevention: None for waits-for graph detection, or a
+                       timestamp scheme deciding on the spot whether a
+                       conflicting requester may wait:
+                       'wait_die' - an older requester waits, a younger
+                       one is aborted (dies);
+                       'wound_wait' - an older requester aborts (wounds)
+                       the younger transactions in its way, a younger one
+                       waits.
+                       Either way no waits-for graph is maintained.
+            snapshot_isolation: If True, read() returns the version
+                       committed as of begin_transaction without taking a
+                       lock, and write() aborts a transaction whose item
+                       was committed by someone else after its snapshot
+                       (first updater wins). If False, read() takes S.
+            wal: Write-ahead log. Writes are logged as they happen and
+                       commit() returns once the commit record is durable.
+                       The state the log recovered becomes the initial
+                       committed version of every item.
         """
+        if deadlock_prevention not in (None,) + DEADLOCK_PREVENTION:
+            raise ValueError(f"Unknown deadlock prevention scheme: {deadlock_prevention!r}")
         self.strict_2pl = strict_2pl
+        self.deadlock_prevention = deadlock_prevention
+        self.snapshot_isolation = snapshot_isolation
+        self.escalation_threshold = escalation_threshold
+        if callable(deadlock_victim):
+            self.choose_victim = deadlock_victim
+        else:
+            self.choose_victim = VICTIM_POLICIES[deadlock_victim]
         
-        # Lock table: item -> {lock_type: set of transaction_ids}
-        self.lock_table: Dict[str, Dict[LockType, Set[int]]] = defaultdict(
-            lambda: {LockType.SHARED: set(), LockType.EXCLUSIVE: set()}
-        )
+        # Lock table partitions
+        self.shards = [LockShard(i) for i in range(num_shards)]
         
         # Transaction registry
         self.transactions: Dict[int, Transaction] = {}
         
-        # Lock to protect lock manager operations
+        # Protects the transaction registry, waits-for graph and global stats
         self.manager_lock = threading.Lock()
         
-        # Statistics
-        self.stats = {
-            'locks_granted': 0,
-            'locks_waited': 0,
-            'transactions_aborted': 0
+        # Waits-for graph for deadlock detection
+        self.waits_for = WaitsForGraph()
+        
+        # Transaction timestamps for deadlock prevention
+        self._tickets = itertools.count(1)
+        
+        # Committed item values, multi-versioned for snapshot reads
+        self.versions = VersionStore()
+        self._vacuum_stop: Optional[threading.Event] = None
+        
+        self.wal = wal
+        if wal is not None and wal.image:
+            self.versions.install(dict(wal.image))
+        
+        # Events are buffered per thread inside critical sections and handed
+        # to the sink once the public call has dropped its locks
+        self.event_sink = event_sink or NullSink()
+        self._local = threading.local()
+        
+        # Statistics not tied to a shard
+        self.txn_stats = {
+            'transactions_aborted': 0,
+            'deadlocks_detected': 0,
+            'prevention_aborts': 0,
+            'write_conflicts': 0,
+            'lock_escalations': 0,
+            'versions_vacuumed': 0
         }
+        self.txn_metrics = TransactionMetrics()
     
-    def begin_transaction(self, tid: int):
-        """Start a new transaction."""
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Statistics summed over all shards."""
+        stats = {'locks_granted': 0, 'locks_waited': 0}
+        for shard in self.shards:
+            for key in stats:
+                stats[key] += shard.stats[key]
+        stats.update(self.txn_stats)
+        return stats
+    
+    def metrics_snapshot(self, top_k: int = 10) -> dict:
+        """
+        Point-in-time copy of the lock metrics: time-to-grant, lock hold
+        time and transaction duration histograms, the top_k most contended
+        items and abort reasons. Export with lock_metrics.snapshot_to_json
+        or snapshot_to_prometheus.
+        """
+        merged = ShardMetrics()
+        for shard in self.shards:
+            with shard.lock:
+                merged.merge(shard.metrics)
+        with self.manager_lock:
+            txn_metrics = self.txn_metrics.copy()
+        return build_snapshot(self.stats, merged, txn_metrics, top_k)
+    
+    def _shard_for(self, item: str) -> LockShard:
+        """Shard owning item."""
+        return self.shards[hash(item) % len(self.shards)]
+    
+    def _record(self, kind: str, tid: int, item: Optional[str] = None,
+                lock_type: Optional[LockType] = None, detail=None):
+        """Buffer a raw event for this thread (no-op unless the sink is enabled)."""
+        if self.event_sink.enabled:
+            buffer = getattr(self._local, 'events', None)
+            if buffer is None:
+                buffer = self._local.events = []
+            buffer.append((time.time(), kind, tid, item,
+                           lock_type.value if lock_type is not None else None, detail))
+    
+    def _flush_events(self):
+        """Hand this thread's buffered events to the sink. Call with no locks held."""
+        buffer = getattr(self._local, 'events', None)
+        if buffer:
+            self._local.events = []
+            self.event_sink.emit(buffer)
+    
+    def begin_transaction(self, tid: int, timestamp: Optional[int] = None):
+        """
+        Start a new transaction.
+        
+        Args:
+            tid: Transaction ID
+            timestamp: Age used by deadlock prevention (lower is older).
+                       Defaults to a fresh ticket; pass the timestamp of
+                       an aborted attempt when restarting it, so it ages
+                       and eventually gets through.
+        """
         with self.manager_lock:
             if tid in self.transactions:
-                print(f"WARNING: Transaction T{tid} already exists!")
+                self._record('duplicate', tid)
+                started = False
+            else:
+                if timestamp is None:
+                    timestamp = next(self._tickets)
+                txn = self.transactions[tid] = Transaction(tid, timestamp)
+                # Taken under manager_lock so vacuum never trims below it
+                txn.snapshot_ts = self.versions.snapshot()
+                self._record('begin', tid)
+                started = True
+        
+        self._flush_events()
+        return started
+    
+    def read(self, tid: int, item: str, timeout: Optional[float] = None) -> tuple:
+        """
+        Read an item's committed value; a transaction sees its own writes.
+        
+        Under snapshot isolation this never touches the lock table: the
+        value is the newest version committed at or before the snapshot
+        taken in begin_transaction. Otherwise a SHARED lock is acquired
+        first and the latest committed value returned.
+        
+        Returns:
+            (True, value) - value is None if the item was never written -
+            or (False, None) if the lock was not granted
+        """
+        txn = self.transactions.get(tid)
+        if txn is None:
+            self._record('not_found', tid)
+            self._flush_events()
+            return False, None
+        if item in txn.write_set:
+            return True, txn.write_set[item]
+        if self.snapshot_isolation:
+            return True, self.versions.read(item, txn.snapshot_ts)
+        if not self.acquire(tid, item, LockType.SHARED, timeout):
+            return False, None
+        return True, self.versions.read(item)
+    
+    def write(self, tid: int, item: str, value, timeout: Optional[float] = None) -> bool:
+        """
+        Write an item: take an EXCLUSIVE lock and buffer the value until
+        commit installs it as a new version.
+        
+        Returns:
+            True if buffered. False if the lock was not granted, or - under
+            snapshot isolation - if another transaction committed the item
+            after this one's snapshot; the transaction is then aborted.
+        """
+        if not self.acquire(tid, item, LockType.EXCLUSIVE, timeout):
+            return False
+        txn = self.transactions.get(tid)
+        if txn is None:
+            return False
+        if self.snapshot_isolation and self.versions.latest_ts(item) > txn.snapshot_ts:
+            with self.manager_lock:
+                self.txn_stats['write_conflicts'] += 1
+            self._record('write_conflict', tid, item, LockType.EXCLUSIVE)
+            self._abort_transaction(tid, reason='write_conflict')
+            self._flush_events()
+            return False
+        with txn.latch:
+            if txn.finished:
                 return False
-            
-            self.transactions[tid] = Transaction(tid)
-            print(f"SUCCESS: Transaction T{tid} started")
-            return True
+            if self.wal is not None:
+                self.wal.log_update(tid, item, value)
+            txn.write_set[item] = value
+        return True
+    
+    def checkpoint(self):
+        """Checkpoint the write-ahead log, letting it drop replayed segments."""
+        if self.wal is not None:
+            self.wal.checkpoint()
+    
+    def vacuum(self) -> int:
+        """
+        Trim versions older than the oldest active snapshot.
+        
+        Returns:
+            Number of versions removed
+        """
+        with self.manager_lock:
+            oldest = min((txn.snapshot_ts for txn in self.transactions.values()),
+                         default=self.versions.snapshot())
+        removed = self.versions.vacuum(oldest)
+        with self.manager_lock:
+            self.txn_stats['versions_vacuumed'] += removed
+        return removed
+    
+    def start_vacuum(self, interval: float = 1.0):
+        """Run vacuum() every interval seconds on a daemon thread."""
+        if self._vacuum_stop is not None:
+            return
+        stop = self._vacuum_stop = threading.Event()
+        
+        def run():
+            while not stop.wait(interval):
+                self.vacuum()
+        
+        threading.Thread(target=run, name="lock-manager-vacuum", daemon=True).start()
+    
+    def stop_vacuum(self):
+        """Stop the background vacuum thread."""
+        if self._vacuum_stop is not None:
+            self._vacuum_stop.set()
+            self._vacuum_stop = None
     
     def lock(self, tid: int, item: str, lock_type: LockType) -> bool:
         """
-        Acquire a lock on an item.
+        Try to acquire a lock on an item without blocking.
         
         Args:
             tid: Transaction ID
@@ -83,153 +536,803 @@ class LockManager:
             lock_type: Type of lock (SHARED or EXCLUSIVE)
         
         Returns:
-            True if lock granted, False if deadlock detected
+            True if lock granted, False if the request would have to wait
         """
-        with self.manager_lock:
-            if tid not in self.transactions:
-                print(f"ERROR: Transaction T{tid} not found!")
-                return False
+        return self.acquire(tid, item, lock_type, timeout=0)
+    
+    def acquire(self, tid: int, item: str, lock_type: LockType,
+                timeout: Optional[float] = None) -> bool:
+        """
+        Acquire a lock on an item, blocking until it is granted.
+        
+        Conflicting requests join the item's FIFO wait queue and sleep on the
+        item's condition variable until a release grants them. Conversions
+        of a held lock (e.g. S -> X, IX + S -> SIX) are queued ahead of new
+        requests.
+        
+        For hierarchical items ("table/page/row") the matching intention
+        lock (IS or IX) is first taken on every ancestor, root first. A
+        request already covered by an S/SIX/X lock on an ancestor is
+        granted without touching the lock table. If the request fails,
+        the intention locks it took are released (or converted back).
+        
+        Args:
+            tid: Transaction ID
+            item: Data item to lock
+            lock_type: Type of lock (any LockType)
+            timeout: Seconds to wait (None = forever, 0 = do not wait)
+        
+        Returns:
+            True if lock granted, False on timeout or if the transaction
+            was aborted while waiting (e.g. chosen as a deadlock victim)
+        """
+        try:
+            return self._acquire(tid, item, lock_type, timeout)
+        finally:
+            self._flush_events()
+    
+    def lock_many(self, tid: int, requests: List[tuple],
+                  timeout: Optional[float] = None) -> bool:
+        """
+        Acquire a set of locks known up front, all or nothing.
+        
+        Requests (plus the intention locks their ancestors need) are merged
+        per item and sorted into a canonical order - parents before
+        children, then by shard, then by name - so two batch callers can
+        never deadlock on each other. Consecutive requests in the same shard
+        are granted in one critical section; at the first one that has to
+        wait, the rest are acquired one by one through the wait queues.
+        Batches that would push a parent past escalation_threshold lock the
+        parent directly.
+        
+        Args:
+            tid: Transaction ID
+            requests: List of (item, lock_type) pairs
+            timeout: Seconds to wait for the whole batch (None = forever)
+        
+        Returns:
+            True if every lock was granted. On False, locks newly granted by
+            this call are released again and locks it converted go back to
+            their previous mode (the transaction may also have been aborted
+            as a deadlock victim).
+        """
+        try:
+            return self._lock_many(tid, requests, timeout)
+        finally:
+            self._flush_events()
+    
+    def _acquire(self, tid: int, item: str, lock_type: LockType,
+                 timeout: Optional[float]) -> bool:
+        """acquire() without the event flush."""
+        txn = self.transactions.get(tid)
+        if txn is None:
+            self._record('not_found', tid)
+            return False
+        
+        path = ancestors(item)
+        if path:
+            # Already covered by a coarse lock on an ancestor?
+            for ancestor in path:
+                held = self._held_mode(txn, ancestor)
+                if held is not None and ancestor_covers(held, lock_type):
+                    self._record('held', tid, item, lock_type)
+                    return True
             
-            txn = self.transactions[tid]
+            deadline = None if timeout is None else time.monotonic() + timeout
+            intention = intention_for(lock_type)
+            # Intention locks this call adds, undone if the request fails
+            granted: Set[str] = set()
+            converted: Dict[str, LockType] = {}
+            for ancestor in path:
+                held = self._held_mode(txn, ancestor)
+                if held is not None and covers(held, intention):
+                    continue
+                if not self._acquire_one(txn, ancestor, intention, self._remaining(deadline)):
+                    self._roll_back(txn, granted, converted)
+                    return False
+                if held is None:
+                    granted.add(ancestor)
+                else:
+                    converted[ancestor] = held
             
-            # Check if already holding this lock
+            parent = path[-1]
+            if (self.escalation_threshold is not None
+                    and self._held_mode(txn, item) is None
+                    and txn.child_counts.get(parent, 0) >= self.escalation_threshold):
+                acquired = self._escalate(txn, parent, lock_type, self._remaining(deadline))
+            else:
+                acquired = self._acquire_one(txn, item, lock_type, self._remaining(deadline))
+            if not acquired:
+                self._roll_back(txn, granted, converted)
+            return acquired
+        
+        return self._acquire_one(txn, item, lock_type, timeout)
+    
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """Timeout left until deadline (None = no deadline)."""
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+    
+    @staticmethod
+    def _held_mode(txn: Transaction, item: str) -> Optional[LockType]:
+        """Mode txn holds on item, or None."""
+        for lock_type in LockType:
             if (item, lock_type) in txn.locks_held:
-                print(f"  T{tid} already holds {lock_type.value} lock on {item}")
-                return True
+                return lock_type
+        return None
+    
+    def _plan_lock_many(self, txn: Transaction, requests: List[tuple]):
+        """
+        Merge a lock_many batch into canonical order.
+        
+        Returns:
+            (list of (item, lock_type) to acquire, set of parents escalated)
+        """
+        # Escalate parents whose child-lock count the batch would push past the threshold
+        escalated = {}
+        if self.escalation_threshold is not None:
+            new_children: Dict[str, List[LockType]] = defaultdict(list)
+            for item, lock_type in requests:
+                parent = parent_of(item)
+                if parent is not None and self._held_mode(txn, item) is None:
+                    new_children[parent].append(lock_type)
+            for parent, modes in new_children.items():
+                if txn.child_counts.get(parent, 0) + len(modes) > self.escalation_threshold:
+                    prefix = parent + ITEM_SEPARATOR
+                    writes = any(intention_for(m) == IX for m in modes) or any(
+                        intention_for(held) == IX for item, held in txn.locks_held
+                        if item.startswith(prefix))
+                    escalated[parent] = X if writes else S
+        
+        wanted: Dict[str, LockType] = {}
+        for item, lock_type in requests:
+            parent = parent_of(item)
+            if parent in escalated:
+                item, lock_type = parent, escalated[parent]
+            wanted[item] = lock_supremum(wanted[item], lock_type) if item in wanted else lock_type
+        
+        # Drop requests implied by a coarse lock, held or requested, on an ancestor
+        for item in list(wanted):
+            for ancestor in ancestors(item):
+                held = self._held_mode(txn, ancestor)
+                if ((held is not None and ancestor_covers(held, wanted[item]))
+                        or (ancestor in wanted and ancestor_covers(wanted[ancestor], wanted[item]))):
+                    del wanted[item]
+                    break
+        
+        # Intention locks on ancestors
+        for item, lock_type in list(wanted.items()):
+            intention = intention_for(lock_type)
+            for ancestor in ancestors(item):
+                wanted[ancestor] = (lock_supremum(wanted[ancestor], intention)
+                                    if ancestor in wanted else intention)
+        
+        order = sorted(wanted.items(), key=lambda r: (
+            r[0].count(ITEM_SEPARATOR), self._shard_for(r[0]).index, r[0]))
+        return order, set(escalated)
+    
+    def _lock_many(self, tid: int, requests: List[tuple],
+                   timeout: Optional[float]) -> bool:
+        """lock_many() without the event flush."""
+        txn = self.transactions.get(tid)
+        if txn is None:
+            self._record('not_found', tid)
+            return False
+        
+        plan, escalated = self._plan_lock_many(txn, requests)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        granted_now: Set[str] = set()
+        converted: Dict[str, LockType] = {}  # Item -> mode held before this call
+        
+        i = 0
+        while i < len(plan):
+            # One critical section for the run of requests in this shard/level
+            shard = self._shard_for(plan[i][0])
+            depth = plan[i][0].count(ITEM_SEPARATOR)
+            end = i
+            while (end < len(plan) and self._shard_for(plan[end][0]) is shard
+                   and plan[end][0].count(ITEM_SEPARATOR) == depth):
+                end += 1
             
-            # Check for lock upgrade (S -> X)
-            if (item, LockType.SHARED) in txn.locks_held and lock_type == LockType.EXCLUSIVE:
-                return self._upgrade_lock(tid, item)
+            with shard.lock:
+                while i < end:
+                    item, lock_type = plan[i]
+                    held = self._held_mode(txn, item)
+                    if held is not None:
+                        if not covers(held, lock_type):
+                            if not self._convert_lock(shard, txn, item, lock_supremum(held, lock_type)):
+                                break
+                            converted.setdefault(item, held)
+                    elif (shard.wait_queues.get(item) is None
+                          and self._can_grant_lock(shard, tid, item, lock_type)):
+                        if not self._grant_lock(shard, txn, item, lock_type):
+                            return False  # Aborted concurrently
+                        granted_now.add(item)
+                    else:
+                        break
+                    i += 1
             
-            # Check if lock can be granted
-            if self._can_grant_lock(tid, item, lock_type):
-                self._grant_lock(tid, item, lock_type)
-                self.stats['locks_granted'] += 1
-                return True
-            else:
-                # Need to wait
-                print(f"WAITING: T{tid} waiting for {lock_type.value} lock on {item}")
-                self.stats['locks_waited'] += 1
+            if i < end:
+                # Conflict: wait for this one, then carry on in order
+                item, lock_type = plan[i]
+                held = self._held_mode(txn, item)
+                if not self._acquire_one(txn, item, lock_type, self._remaining(deadline)):
+                    self._roll_back(txn, granted_now, converted)
+                    return False
+                if held is None:
+                    granted_now.add(item)
+                elif self._held_mode(txn, item) != held:
+                    converted.setdefault(item, held)
+                i += 1
+        
+        # Escalated parents now cover any child locks held from before
+        for parent in escalated:
+            prefix = parent + ITEM_SEPARATOR
+            with txn.latch:
+                children = {item for item, _ in txn.locks_held if item.startswith(prefix)}
+            if children:
+                self._release_items(txn, children)
+            with self.manager_lock:
+                self.txn_stats['lock_escalations'] += 1
+            self._record('escalate', tid, parent, self._held_mode(txn, parent), len(children))
+        return True
+    
+    def _acquire_one(self, txn: Transaction, item: str, lock_type: LockType,
+                     timeout: Optional[float]) -> bool:
+        """Acquire (or convert to) lock_type on a single item."""
+        tid = txn.tid
+        shard = self._shard_for(item)
+        with shard.lock:
+            held = self._held_mode(txn, item)
+            if held is not None:
+                if covers(held, lock_type):
+                    self._record('held', tid, item, lock_type)
+                    return True
+                # Conversion of the held lock, e.g. S -> X or IX -> SIX
+                lock_type = lock_supremum(held, lock_type)
+            
+            upgrade = held is not None
+            queue = shard.wait_queues.get(item)
+            
+            if upgrade:
+                if self._convert_lock(shard, txn, item, lock_type):
+                    return True
+            elif queue is None and self._can_grant_lock(shard, tid, item, lock_type):
+                # Only grant immediately if nobody is queued ahead of us
+                return self._grant_lock(shard, txn, item, lock_type)
+            
+            # Need to wait
+            self._record('wait', tid, item, lock_type)
+            shard.stats['locks_waited'] += 1
+            shard.metrics.record_wait(item)
+            if timeout is not None and timeout <= 0:
+                return False
+            
+            with txn.latch:
+                if txn.finished:
+                    return False
+            
+            wounded = []
+            if self.deadlock_prevention is not None:
+                wounded = self._prevention_victims(shard, txn, item, lock_type, upgrade)
+            
+            if tid not in wounded:
+                with txn.latch:
+                    txn.waiting_for = item
+                if queue is None:
+                    queue = shard.wait_queues[item] = WaitQueue(shard.lock)
+                request = LockRequest(tid, lock_type, upgrade)
+                if upgrade:
+                    queue.requests.appendleft(request)
+                else:
+                    queue.requests.append(request)
+                
+                if self.deadlock_prevention is None:
+                    # New wait edges: check whether they close a cycle
+                    self._refresh_wait_edges(shard, item)
+        
+        self._flush_events()
+        
+        # Abort outside the shard lock: it visits every shard the victim holds
+        if self.deadlock_prevention is not None:
+            for victim in wounded:
+                self._abort_transaction(victim, reason=self.deadlock_prevention)
+            if tid in wounded:
                 return False
+        else:
+            # Repeat, since one victim may only break one of several cycles
+            victim = self._find_deadlock_victim(tid)
+            while victim is not None:
+                self._abort_transaction(victim, reason='deadlock')
+                if victim == tid:
+                    break
+                victim = self._find_deadlock_victim(tid)
+        
+        with shard.lock:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not request.granted and not request.cancelled:
+                if deadline is None:
+                    queue.cond.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    queue.cond.wait(remaining)
+            
+            if request.granted:
+                return True
+            
+            if not request.cancelled:
+                # Timed out: leave the queue and let requests behind us proceed
+                self._record('timeout', tid, item, lock_type)
+                self._cancel_request(shard, txn, item, request)
+            return False
     
     def unlock(self, tid: int, item: str):
         """
         Release lock on an item.
         Only allowed in basic 2PL, not in Strict 2PL.
         """
-        with self.manager_lock:
-            if self.strict_2pl:
-                print(f"WARNING: Cannot unlock in Strict 2PL mode. Use commit/abort.")
-                return False
-            
-            if tid not in self.transactions:
-                return False
-            
-            txn = self.transactions[tid]
-            
+        if self.strict_2pl:
+            self._record('unlock_refused', tid, item)
+            self._flush_events()
+            return False
+        
+        txn = self.transactions.get(tid)
+        if txn is None:
+            return False
+        
+        shard = self._shard_for(item)
+        with shard.lock:
             # Remove locks
-            for lock_type in [LockType.SHARED, LockType.EXCLUSIVE]:
-                if (item, lock_type) in txn.locks_held:
-                    self.lock_table[item][lock_type].discard(tid)
+            with txn.latch:
+                lock_type = self._held_mode(txn, item)
+                if lock_type is not None:
+                    self._release_lock(shard, tid, item, txn.grant_times.pop(item, None))
                     txn.locks_held.discard((item, lock_type))
-                    print(f"UNLOCK: T{tid} released {lock_type.value} lock on {item}")
+                    self._forget_child(txn, item)
+                    self._record('unlock', tid, item, lock_type)
             
-            return True
+            self._process_wait_queue(shard, item)
+        
+        self._flush_events()
+        return True
     
     def commit(self, tid: int):
-        """Commit transaction and release all locks."""
+        """Commit transaction: install its writes, then release all locks."""
         with self.manager_lock:
-            if tid not in self.transactions:
-                print(f"ERROR: Transaction T{tid} not found!")
-                return False
-            
-            txn = self.transactions[tid]
-            
-            # Release all locks
-            for item, lock_type in txn.locks_held:
-                self.lock_table[item][lock_type].discard(tid)
-            
-            del self.transactions[tid]
-            
-            duration = time.time() - txn.start_time
-            print(f"COMMIT: T{tid} COMMITTED (duration: {duration:.3f}s)")
-            return True
+            txn = self.transactions.pop(tid, None)
+            if txn is not None:
+                duration = time.time() - txn.start_time
+                self.txn_metrics.duration.observe(duration)
+        if txn is None:
+            self._record('not_found', tid)
+            self._flush_events()
+            return False
+        
+        try:
+            # Still under the X locks, so the next writer sees these versions
+            if txn.write_set:
+                if self.wal is not None:
+                    self.wal.commit(tid)
+                self.versions.install(txn.write_set)
+        except BaseException:
+            # The commit record didn't become durable (e.g. the disk is
+            # full). The log has cut it off, failed itself so nothing
+            # later can make it durable, and rolled the txn back: count
+            # it as aborted and pass the error on
+            with self.manager_lock:
+                self.txn_stats['transactions_aborted'] += 1
+                self.txn_metrics.abort_reasons['commit_failed'] += 1
+            self._record('abort', tid)
+            raise
+        finally:
+            # txn is already gone from transactions, so nothing else can
+            # release its locks; do it whether or not the commit succeeded
+            self._release_all(txn)
+            self._flush_events()
+        
+        self._record('commit', tid, detail=duration)
+        self._flush_events()
+        return True
     
     def abort(self, tid: int):
         """Abort transaction and release all locks."""
+        self._abort_transaction(tid)
+        self._flush_events()
+    
+    def _abort_transaction(self, tid: int, reason: str = 'user'):
+        """Internal abort implementation. Must not hold any shard lock."""
         with self.manager_lock:
-            self._abort_transaction(tid)
+            txn = self.transactions.pop(tid, None)
+            if txn is None:
+                return
+            self.waits_for.remove(tid)
+            self.txn_stats['transactions_aborted'] += 1
+            if reason in DEADLOCK_PREVENTION:
+                self.txn_stats['prevention_aborts'] += 1
+            self.txn_metrics.abort_reasons[reason] += 1
+        
+        if self.wal is not None:
+            # Stop further writes, then undo under the X locks still held
+            with txn.latch:
+                txn.finished = True
+            if txn.write_set:
+                self.wal.abort(tid)
+        
+        # Release all locks
+        self._release_all(txn)
+        
+        self._record('abort', tid)
+    
+    def _release_all(self, txn: Transaction):
+        """
+        Drop a pending request and all held locks, then wake waiters.
+        Shards are visited one at a time in index order.
+        """
+        with txn.latch:
+            # No further grants to txn once this is set
+            txn.finished = True
+            pending = txn.waiting_for
+            held = list(txn.locks_held)
+            grant_times = txn.grant_times
+            txn.locks_held.clear()
+            txn.grant_times = {}
+            txn.child_counts.clear()
+        
+        self._release_held(txn, held, grant_times, pending)
+    
+    def _release_items(self, txn: Transaction, items: Set[str]):
+        """Release txn's locks on items (used by escalation)."""
+        with txn.latch:
+            held = [(item, lock_type) for item, lock_type in txn.locks_held if item in items]
+            grant_times = {}
+            for item, lock_type in held:
+                txn.locks_held.discard((item, lock_type))
+                grant_times[item] = txn.grant_times.pop(item, None)
+                self._forget_child(txn, item)
+        
+        self._release_held(txn, held, grant_times)
+    
+    def _roll_back(self, txn: Transaction, granted: Set[str], converted: Dict[str, LockType]):
+        """Undo a failed call's progress: release the locks it granted, downgrade the ones it converted."""
+        if txn.finished:
+            return  # Aborted: everything is released anyway
+        if granted:
+            self._release_items(txn, granted)
+        if converted:
+            self._downgrade_items(txn, converted)
     
-    def _abort_transaction(self, tid: int):
-        """Internal abort implementation."""
-        if tid not in self.transactions:
+    def _downgrade_items(self, txn: Transaction, modes: Dict[str, LockType]):
+        """Put txn's locks on items back to the given (weaker) modes, waking waiters they admit."""
+        for item, mode in modes.items():
+            shard = self._shard_for(item)
+            with shard.lock:
+                entry = shard.lock_table.get(item)
+                with txn.latch:
+                    held = self._held_mode(txn, item)
+                    if txn.finished or entry is None or held is None or held == mode:
+                        continue
+                    # remove() recomputes the group mode, which may weaken
+                    entry.remove(txn.tid)
+                    entry.add(txn.tid, mode)
+                    txn.locks_held.discard((item, held))
+                    txn.locks_held.add((item, mode))
+                self._record('downgrade', txn.tid, item, mode, held.value)
+                self._process_wait_queue(shard, item)
+    
+    def _release_held(self, txn: Transaction, held: List[tuple],
+                      grant_times: Dict[str, float], pending: Optional[str] = None):
+        """Remove held (item, lock_type) pairs from the table, shard by shard in index order."""
+        by_shard: Dict[int, List[tuple]] = defaultdict(list)
+        for item, lock_type in held:
+            by_shard[self._shard_for(item).index].append((item, lock_type))
+        if pending is not None:
+            by_shard.setdefault(self._shard_for(pending).index, [])
+        
+        for index in sorted(by_shard):
+            shard = self.shards[index]
+            with shard.lock:
+                if pending is not None and self._shard_for(pending) is shard:
+                    queue = shard.wait_queues.get(pending)
+                    if queue is not None:
+                        for request in queue.requests:
+                            if request.tid == txn.tid:
+                                self._cancel_request(shard, txn, pending, request)
+                                break
+                
+                released = set()
+                for item, lock_type in by_shard[index]:
+                    self._release_lock(shard, txn.tid, item, grant_times.get(item))
+                    released.add(item)
+                
+                for item in released:
+                    self._process_wait_queue(shard, item)
+    
+    def _escalate(self, txn: Transaction, parent: str, lock_type: LockType,
+                  timeout: Optional[float]) -> bool:
+        """
+        Replace txn's child locks under parent with one lock on parent:
+        X if any child (or the new request) writes, otherwise S.
+        """
+        prefix = parent + ITEM_SEPARATOR
+        with txn.latch:
+            children = [(item, held) for item, held in txn.locks_held
+                        if item.startswith(prefix)]
+        writes = intention_for(lock_type) == IX or any(
+            intention_for(held) == IX for _, held in children)
+        target = X if writes else S
+        
+        if not self._acquire_one(txn, parent, target, timeout):
+            return False
+        
+        # The parent lock now covers every descendant
+        self._release_items(txn, {item for item, _ in children})
+        with self.manager_lock:
+            self.txn_stats['lock_escalations'] += 1
+        self._record('escalate', txn.tid, parent, target, len(children))
+        return True
+    
+    @staticmethod
+    def _forget_child(txn: Transaction, item: str):
+        """Decrement the child-lock count of item's parent. Caller holds txn.latch."""
+        parent = parent_of(item)
+        if parent is not None:
+            count = txn.child_counts.get(parent, 0) - 1
+            if count > 0:
+                txn.child_counts[parent] = count
+            else:
+                txn.child_counts.pop(parent, None)
+    
+    def _cancel_request(self, shard: LockShard, txn: Transaction, item: str,
+                        request: LockRequest):
+        """Remove a pending request from its queue and wake its waiter."""
+        queue = shard.wait_queues[item]
+        queue.requests.remove(request)
+        request.cancelled = True
+        with txn.latch:
+            txn.waiting_for = None
+        if self.deadlock_prevention is None:
+            with self.manager_lock:
+                self.waits_for.remove(txn.tid)
+        queue.cond.notify_all()
+        # The departed request may have been blocking the ones behind it
+        self._process_wait_queue(shard, item)
+    
+    def _process_wait_queue(self, shard: LockShard, item: str):
+        """
+        Grant queued requests on item in FIFO order.
+        Stops at the first request that is still incompatible, so a run of
+        shared requests at the head is granted as one batch with one wakeup.
+        """
+        queue = shard.wait_queues.get(item)
+        if queue is None:
             return
         
-        txn = self.transactions[tid]
+        notify = False
+        while queue.requests:
+            request = queue.requests[0]
+            txn = self.transactions.get(request.tid)
+            if txn is None or txn.finished:
+                # Requester is being released concurrently; drop the request
+                queue.requests.popleft()
+                request.cancelled = True
+                notify = True
+                continue
+            
+            waited = time.monotonic() - request.enqueued_at
+            if request.upgrade:
+                if not self._convert_lock(shard, txn, item, request.lock_type, waited):
+                    break
+            elif self._can_grant_lock(shard, request.tid, item, request.lock_type):
+                if not self._grant_lock(shard, txn, item, request.lock_type, waited):
+                    queue.requests.popleft()
+                    request.cancelled = True
+                    notify = True
+                    continue
+            else:
+                break
+            
+            queue.requests.popleft()
+            request.granted = True
+            if self.deadlock_prevention is None:
+                with self.manager_lock:
+                    self.waits_for.remove(request.tid)
+            notify = True
         
-        # Release all locks
-        for item, lock_type in txn.locks_held:
-            self.lock_table[item][lock_type].discard(tid)
+        if notify:
+            queue.cond.notify_all()
+        if not queue.requests:
+            del shard.wait_queues[item]
+        elif self.deadlock_prevention is None:
+            self._refresh_wait_edges(shard, item)
+    
+    def _refresh_wait_edges(self, shard: LockShard, item: str):
+        """
+        Recompute the waits-for edges of every request queued on item.
+        A request waits for holders with an incompatible lock and for the
+        request directly ahead of it. Grants are strictly FIFO, so it
+        really waits for every request ahead (even a compatible one, e.g.
+        IS queued behind IX); the chain reaches the same transactions, so
+        detection finds the same cycles, but a queue of n waiters costs
+        O(n) edges under manager_lock, not O(n^2).
+        """
+        queue = shard.wait_queues.get(item)
+        if queue is None:
+            return
         
-        del self.transactions[tid]
-        self.stats['transactions_aborted'] += 1
+        entry = shard.lock_table.get(item)
+        holders = entry.holders if entry is not None else {}
+        ahead: Optional[LockRequest] = None
+        edges = []
+        for request in queue.requests:
+            blockers = {holder for holder, held in holders.items()
+                        if not compatible(held, request.lock_type)}
+            if ahead is not None:
+                blockers.add(ahead.tid)
+            blockers.discard(request.tid)
+            edges.append((request.tid, blockers))
+            ahead = request
         
-        print(f"ABORT: T{tid} ABORTED")
+        with self.manager_lock:
+            for tid, blockers in edges:
+                self.waits_for.set_waits(tid, blockers)
     
-    def _can_grant_lock(self, tid: int, item: str, lock_type: LockType) -> bool:
-        """Check if lock can be granted."""
-        locks = self.lock_table[item]
+    def _prevention_victims(self, shard: LockShard, txn: Transaction, item: str,
+                            lock_type: LockType, upgrade: bool) -> List[int]:
+        """
+        Apply the wait-die / wound-wait rule to a request about to queue on
+        item. It would wait for the holders it conflicts with and for every
+        request ahead of it; a conversion jumps the queue, so the requests
+        already queued would then also wait for it.
         
-        if lock_type == LockType.SHARED:
-            # Shared lock compatible with other shared locks
-            # Not compatible with exclusive locks
-            if locks[LockType.EXCLUSIVE]:
-                # Check if this transaction holds the exclusive lock
-                if tid in locks[LockType.EXCLUSIVE]:
-                    return True
-                return False
+        Returns:
+            Transactions to abort; includes txn.tid if the requester dies
+            (wait-die) or is wounded by an older waiter behind it (wound-wait)
+        """
+        entry = shard.lock_table.get(item)
+        queue = shard.wait_queues.get(item)
+        queued = [request.tid for request in queue.requests] if queue is not None else []
+        
+        blockers = set()
+        if entry is not None:
+            blockers.update(holder for holder, held in entry.holders.items()
+                            if holder != txn.tid and not compatible(held, lock_type))
+        if not upgrade:
+            blockers.update(queued)
+        behind = queued if upgrade else []
+        
+        victims = []
+        if self.deadlock_prevention == 'wait_die':
+            # Only older transactions may wait for younger ones
+            for tid in blockers:
+                other = self.transactions.get(tid)
+                if other is not None and older(other, txn):
+                    self._record('die', txn.tid, item, lock_type, tid)
+                    return [txn.tid]
+            for tid in behind:
+                other = self.transactions.get(tid)
+                if other is not None and older(txn, other):
+                    self._record('die', tid, item, lock_type, txn.tid)
+                    victims.append(tid)
+        else:
+            # Only younger transactions may wait for older ones
+            for tid in behind:
+                other = self.transactions.get(tid)
+                if other is not None and older(other, txn):
+                    self._record('wound', txn.tid, item, lock_type, tid)
+                    return [txn.tid]
+            for tid in blockers:
+                other = self.transactions.get(tid)
+                if other is not None and older(txn, other):
+                    self._record('wound', tid, item, lock_type, txn.tid)
+                    victims.append(tid)
+        return victims
+    
+    def _find_deadlock_victim(self, tid: int) -> Optional[int]:
+        """
+        Search for a cycle through tid and pick a victim if one exists.
+        The caller aborts the victim once it has dropped its shard lock;
+        that cancels the victim's pending request, waking its thread and
+        letting the rest of the cycle proceed.
+        """
+        with self.manager_lock:
+            cycle = self.waits_for.find_cycle(tid)
+            if cycle is None:
+                return None
+            
+            txns = [self.transactions[t] for t in cycle if t in self.transactions]
+            if not txns:
+                return None
+            self.txn_stats['deadlocks_detected'] += 1
+            victim = self.choose_victim(txns)
+            # Drop the victim's edges now so concurrent detectors don't
+            # pick a second victim for the same cycle
+            self.waits_for.remove(victim.tid)
+        
+        self._record('deadlock', victim.tid, detail=cycle)
+        return victim.tid
+    
+    def _can_grant_lock(self, shard: LockShard, tid: int, item: str, lock_type: LockType) -> bool:
+        """Check if lock can be granted. Never creates a lock-table entry."""
+        entry = shard.lock_table.get(item)
+        if entry is None:
             return True
         
-        else:  # EXCLUSIVE lock
+        if lock_type == LockType.EXCLUSIVE:
             # Exclusive lock not compatible with any other locks
-            # Check if any locks held by other transactions
-            for lt in [LockType.SHARED, LockType.EXCLUSIVE]:
-                if locks[lt]:
-                    # Check if all locks are held by this transaction
-                    if locks[lt] != {tid}:
-                        return False
-            return True
+            holders = entry.holders
+            return not holders or (len(holders) == 1 and tid in holders)
+        
+        # Everything else: check the compatibility matrix against the
+        # group mode (or each other holder if tid already holds a lock)
+        return entry.others_compatible(tid, lock_type)
     
-    def _grant_lock(self, tid: int, item: str, lock_type: LockType):
-        """Grant lock to transaction."""
-        self.lock_table[item][lock_type].add(tid)
-        self.transactions[tid].locks_held.add((item, lock_type))
-        print(f"LOCK GRANTED: T{tid} acquired {lock_type.value} lock on {item}")
+    def _grant_lock(self, shard: LockShard, txn: Transaction, item: str,
+                    lock_type: LockType, waited: float = 0.0) -> bool:
+        """Grant lock to transaction. Returns False if txn is finishing."""
+        with txn.latch:
+            if txn.finished:
+                return False
+            entry = shard.lock_table.get(item)
+            if entry is None:
+                entry = shard.lock_table[item] = LockEntry()
+            entry.add(txn.tid, lock_type)
+            txn.locks_held.add((item, lock_type))
+            txn.grant_times.setdefault(item, time.monotonic())
+            txn.waiting_for = None
+            parent = parent_of(item)
+            if parent is not None:
+                txn.child_counts[parent] = txn.child_counts.get(parent, 0) + 1
+        shard.stats['locks_granted'] += 1
+        shard.metrics.record_grant(item, waited)
+        self._record('grant', txn.tid, item, lock_type)
+        return True
     
-    def _upgrade_lock(self, tid: int, item: str) -> bool:
-        """Upgrade lock from SHARED to EXCLUSIVE."""
-        locks = self.lock_table[item]
+    def _release_lock(self, shard: LockShard, tid: int, item: str,
+                      granted_at: Optional[float] = None):
+        """Drop tid's lock on item, removing the entry once it is unheld."""
+        if granted_at is not None:
+            shard.metrics.hold_time.observe(time.monotonic() - granted_at)
+        entry = shard.lock_table.get(item)
+        if entry is None:
+            return
+        entry.remove(tid)
+        if not entry.holders:
+            del shard.lock_table[item]
+    
+    def _convert_lock(self, shard: LockShard, txn: Transaction, item: str,
+                      lock_type: LockType, waited: float = 0.0) -> bool:
+        """Convert txn's held lock on item to lock_type (e.g. S -> X)."""
+        entry = shard.lock_table.get(item)
+        tid = txn.tid
         
-        # Check if only this transaction holds shared lock
-        if locks[LockType.SHARED] == {tid} and not locks[LockType.EXCLUSIVE]:
-            locks[LockType.SHARED].discard(tid)
-            locks[LockType.EXCLUSIVE].add(tid)
-            
-            txn = self.transactions[tid]
-            txn.locks_held.discard((item, LockType.SHARED))
-            txn.locks_held.add((item, LockType.EXCLUSIVE))
+        # Check the new mode against every other holder
+        if entry is not None and tid in entry.holders and entry.others_compatible(tid, lock_type):
+            with txn.latch:
+                if txn.finished:
+                    return False
+                old = entry.holders[tid]
+                entry.add(tid, lock_type)
+                txn.locks_held.discard((item, old))
+                txn.locks_held.add((item, lock_type))
+                txn.waiting_for = None
             
-            print(f"UPGRADE: T{tid} upgraded lock on {item} (S -> X)")
+            self._record('upgrade', tid, item, lock_type, old.value)
+            shard.stats['locks_granted'] += 1
+            shard.metrics.record_grant(item, waited)
             return True
         
         return False
     
     def _get_lock_holders(self, item: str) -> Set[int]:
         """Get all transactions holding locks on item."""
-        holders = set()
-        for lock_type in [LockType.SHARED, LockType.EXCLUSIVE]:
-            holders.update(self.lock_table[item][lock_type])
-        return holders
+        shard = self._shard_for(item)
+        with shard.lock:
+            entry = shard.lock_table.get(item)
+            return set(entry.holders) if entry is not None else set()
     
     def print_lock_table(self):
         """Print current state of lock table."""
@@ -237,40 +1340,58 @@ class LockManager:
         print("LOCK TABLE")
         print("=" * 60)
         
-        if not any(self.lock_table.values()):
+        entries = []
+        for shard in self.shards:
+            with shard.lock:
+                for item, entry in shard.lock_table.items():
+                    entries.append((item, dict(entry.holders)))
+        
+        labels = [(S, "Shared"), (X, "Exclusive"), (IS, "Intention shared"),
+                  (IX, "Intention exclusive"), (SIX, "Shared + intention exclusive")]
+        if not entries:
             print("(empty)")
         else:
-            for item, locks in sorted(self.lock_table.items()):
-                if locks[LockType.SHARED] or locks[LockType.EXCLUSIVE]:
-                    print(f"\nItem: {item}")
-                    if locks[LockType.SHARED]:
-                        holders = [f"T{tid}" for tid in sorted(locks[LockType.SHARED])]
-                        print(f"  Shared: {', '.join(holders)}")
-                    if locks[LockType.EXCLUSIVE]:
-                        holders = [f"T{tid}" for tid in sorted(locks[LockType.EXCLUSIVE])]
-                        print(f"  Exclusive: {', '.join(holders)}")
+            for item, holders in sorted(entries, key=lambda e: e[0]):
+                print(f"\nItem: {item}")
+                for lock_type, label in labels:
+                    tids = sorted(tid for tid, held in holders.items() if held == lock_type)
+                    if tids:
+                        print(f"  {label}: {', '.join(f'T{tid}' for tid in tids)}")
         
         print("=" * 60)
     
     def print_statistics(self):
         """Print lock manager statistics."""
+        stats = self.stats
         print("\n" + "=" * 60)
         print("STATISTICS")
         print("=" * 60)
-        print(f"Locks granted: {self.stats['locks_granted']}")
-        print(f"Locks waited: {self.stats['locks_waited']}")
-        print(f"Transactions aborted: {self.stats['transactions_aborted']}")
+        print(f"Locks granted: {stats['locks_granted']}")
+        print(f"Locks waited: {stats['locks_waited']}")
+        print(f"Transactions aborted: {stats['transactions_aborted']}")
+        print(f"Deadlocks detected: {stats['deadlocks_detected']}")
+        print(f"Prevention aborts: {stats['prevention_aborts']}")
+        print(f"Write conflicts: {stats['write_conflicts']}")
+        print(f"Lock escalations: {stats['lock_escalations']}")
         print("=" * 60)
 
 
 # Example usage and testing
 if __name__ == "__main__":
+    import logging
+    import sys
+    from lock_events import LoggingSink
+    
+    # Show every lock manager event on the console
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s", stream=sys.stdout)
+    sink = LoggingSink()
+    
     print("=" * 60)
     print("LOCK-BASED CONCURRENCY CONTROL DEMONSTRATION")
     print("=" * 60)
     
     # Create lock manager with Strict 2PL
-    lm = LockManager(strict_2pl=True)
+    lm = LockManager(strict_2pl=True, event_sink=sink)
     
 
     lm.begin_transaction(1)
@@ -287,26 +1408,110 @@ if __name__ == "__main__":
         
     lm.print_statistics()
     
+    print("=" * 60)
+    print("BLOCKING ACQUIRE DEMO")
+    print("=" * 60)
+    
+    lm = LockManager(strict_2pl=True, event_sink=sink)
+    
+    for tid in (1, 2, 3):
+        lm.begin_transaction(tid)
+    
+    # T1 writes A; T2 and T3 block on shared locks behind it
+    lm.acquire(1, "A", LockType.EXCLUSIVE)
+    readers = [threading.Thread(target=lm.acquire, args=(tid, "A", LockType.SHARED))
+               for tid in (2, 3)]
+    for t in readers:
+        t.start()
+    time.sleep(0.1)
+    
+    # Commit wakes both readers as one batch
+    lm.commit(1)
+    for t in readers:
+        t.join()
+    
+    lm.print_lock_table()
+    lm.commit(2)
+    lm.commit(3)
+    lm.print_statistics()
+    
+    print("=" * 60)
+    print("BATCH LOCK DEMO")
+    print("=" * 60)
+    
+    lm = LockManager(strict_2pl=True, event_sink=sink)
+    
+    lm.begin_transaction(1)
+    lm.begin_transaction(2)
+    
+    # Opposite request orders, but lock_many sorts both the same way
+    lm.lock_many(1, [("B", LockType.EXCLUSIVE), ("A", LockType.SHARED)])
+    waiter = threading.Thread(target=lm.lock_many,
+                              args=(2, [("A", LockType.EXCLUSIVE), ("B", LockType.SHARED)]))
+    waiter.start()
+    time.sleep(0.1)
+    lm.commit(1)
+    waiter.join()
+    
+    lm.print_lock_table()
+    lm.commit(2)
+    
+    print("=" * 60)
+    print("MULTI-GRANULARITY LOCKING DEMO")
+    print("=" * 60)
+    
+    lm = LockManager(strict_2pl=True, event_sink=sink, escalation_threshold=3)
+    
+    lm.begin_transaction(1)
+    lm.begin_transaction(2)
+    
+    # T1 reads rows of page 1: IS on the table and page, S on each row.
+    # The fourth row escalates to a single S lock on the page.
+    for row in range(4):
+        lm.acquire(1, f"orders/p1/r{row}", LockType.SHARED)
+    
+    # T2 writes a row on another page: IX on the table is compatible with IS
+    lm.acquire(2, "orders/p2/r7", LockType.EXCLUSIVE)
+    
+    # ...but a write on T1's page has to wait for T1's escalated S lock
+    print(f"T2 write on orders/p1/r0 granted: {lm.lock(2, 'orders/p1/r0', LockType.EXCLUSIVE)}")
+    
+    lm.print_lock_table()
+    lm.commit(1)
+    lm.commit(2)
+    lm.print_statistics()
+    
     print("=" * 60)
     print("DEADLOCK PATTERN DEMO")
     print("=" * 60)
 
-    lm = LockManager(strict_2pl=True)
+    lm = LockManager(strict_2pl=True, event_sink=sink)
 
     lm.begin_transaction(1)
     lm.begin_transaction(2)
 
     # Step 1: T1 gets X lock on A
-    lm.lock(1, "A", LockType.EXCLUSIVE)
+    lm.acquire(1, "A", LockType.EXCLUSIVE)
 
     # Step 2: T2 gets X lock on B
-    lm.lock(2, "B", LockType.EXCLUSIVE)
+    lm.acquire(2, "B", LockType.EXCLUSIVE)
 
     # Step 3: T1 tries X lock on B (held by T2) -> WAITING
-    lm.lock(1, "B", LockType.EXCLUSIVE)
+    t1 = threading.Thread(target=lm.acquire, args=(1, "B", LockType.EXCLUSIVE))
+    t1.start()
+    time.sleep(0.1)
 
-    # Step 4: T2 tries X lock on A (held by T1) -> WAITING
-    lm.lock(2, "A", LockType.EXCLUSIVE)
+    # Step 4: T2 tries X lock on A (held by T1) -> cycle, youngest (T2) aborted
+    granted = lm.acquire(2, "A", LockType.EXCLUSIVE)
+    print(f"T2 request on A granted: {granted}")
+    t1.join()
 
     lm.print_lock_table()
-
+    lm.commit(1)
+    lm.print_statistics()
+    
+    snapshot = lm.metrics_snapshot(top_k=3)
+    grant = snapshot['histograms']['time_to_grant_seconds']
+    print(f"\nTime to grant: p50 <= {grant['p50'] * 1e3:.3f} ms, p99 <= {grant['p99'] * 1e3:.3f} ms")
+    print(f"Hottest items: {snapshot['hottest_items']}")
+    print(f"Abort reasons: {snapshot['abort_reasons']}")
@@ -0,0 +1,171 @@
+import json
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+# Latency bucket upper bounds in seconds: 1us doubling up to ~134s
+LATENCY_BOUNDS = [1e-6 * 2 ** i for i in range(28)]
+
+# Contended items tracked per shard before the coldest half is dropped
+MAX_TRACKED_ITEMS = 10000
+
+
+class Histogram:
+    """Fixed-bucket histogram: O(log buckets) observe, mergeable."""
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds: List[float] = LATENCY_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: 'Histogram'):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        cumulative = []
+        seen = 0
+        for bound, n in zip(self.bounds + ['+Inf'], self.counts):
+            seen += n
+            cumulative.append([bound, seen])
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.50),
+            'p99': self.quantile(0.99),
+            'p999': self.quantile(0.999),
+            'buckets': cumulative
+        }
+
+
+class ShardMetrics:
+    """
+    Per-shard lock metrics. Updated under the owning shard's lock, so
+    recording needs no extra synchronisation.
+    """
+
+    def __init__(self):
+        self.time_to_grant = Histogram()
+        self.hold_time = Histogram()
+        self.item_waits: Counter = Counter()
+        self.item_wait_time: Dict[str, float] = defaultdict(float)
+
+    def record_wait(self, item: str):
+        self.item_waits[item] += 1
+        if len(self.item_waits) > MAX_TRACKED_ITEMS:
+            # Keep memory bounded: forget the colder half
+            for cold, _ in self.item_waits.most_common()[MAX_TRACKED_ITEMS // 2:]:
+                del self.item_waits[cold]
+                self.item_wait_time.pop(cold, None)
+
+    def record_grant(self, item: str, waited: float):
+        self.time_to_grant.observe(waited)
+        if waited > 0.0 and item in self.item_waits:
+            self.item_wait_time[item] += waited
+
+    def merge(self, other: 'ShardMetrics'):
+        self.time_to_grant.merge(other.time_to_grant)
+        self.hold_time.merge(other.hold_time)
+        self.item_waits.update(other.item_waits)
+        for item, seconds in other.item_wait_time.items():
+            self.item_wait_time[item] += seconds
+
+
+class TransactionMetrics:
+    """Transaction-level metrics, updated under the manager lock."""
+
+    def __init__(self):
+        self.duration = Histogram()
+        self.abort_reasons: Counter = Counter()
+
+    def copy(self) -> 'TransactionMetrics':
+        copy = TransactionMetrics()
+        copy.duration.merge(self.duration)
+        copy.abort_reasons.update(self.abort_reasons)
+        return copy
+
+
+def build_snapshot(stats: Dict[str, int], shard_metrics: ShardMetrics,
+                   txn_metrics: TransactionMetrics, top_k: int = 10) -> dict:
+    """Turn merged metrics into one plain-dict snapshot."""
+    return {
+        'timestamp': time.time(),
+        'stats': dict(stats),
+        'histograms': {
+            'time_to_grant_seconds': shard_metrics.time_to_grant.to_dict(),
+            'lock_hold_seconds': shard_metrics.hold_time.to_dict(),
+            'transaction_duration_seconds': txn_metrics.duration.to_dict()
+        },
+        'hottest_items': [
+            {'item': item, 'waits': n,
+             'wait_seconds': shard_metrics.item_wait_time.get(item, 0.0)}
+            for item, n in shard_metrics.item_waits.most_common(top_k)
+        ],
+        'abort_reasons': dict(txn_metrics.abort_reasons)
+    }
+
+
+def snapshot_to_json(snapshot: dict, indent: Optional[int] = None) -> str:
+    """Serialize a snapshot as JSON."""
+    return json.dumps(snapshot, indent=indent)
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def snapshot_to_prometheus(snapshot: dict, prefix: str = 'lock_manager') -> str:
+    """Render a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for key, value in sorted(snapshot['stats'].items()):
+        name = f"{prefix}_{key}_total"
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+
+    for key, hist in snapshot['histograms'].items():
+        name = f"{prefix}_{key}"
+        lines.append(f"# TYPE {name} histogram")
+        for bound, cumulative in hist['buckets']:
+            le = bound if isinstance(bound, str) else repr(bound)
+            lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum {hist['sum']}")
+        lines.append(f"{name}_count {hist['count']}")
+
+    name = f"{prefix}_item_waits"
+    lines.append(f"# TYPE {name} gauge")
+    for entry in snapshot['hottest_items']:
+        lines.append(f'{name}{{item="{_label(entry["item"])}"}} {entry["waits"]}')
+
+    name = f"{prefix}_aborts_total"
+    lines.append(f"# TYPE {name} counter")
+    for reason, count in sorted(snapshot['abort_reasons'].items()):
+        lines.append(f'{name}{{reason="{_label(reason)}"}} {count}')
+
+    return "\n".join(lines) + "\n"
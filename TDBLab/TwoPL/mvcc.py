@@ -0,0 +1,80 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# A committed version: (commit timestamp, value)
+Version = Tuple[int, object]
+
+
+class VersionStore:
+    """
+    Committed versions of every item, oldest first.
+
+    Commits are serialised by the store lock and published by bumping
+    commit_ts only after all of their versions are in place, so a reader
+    holding snapshot s sees every version with timestamp <= s without
+    taking any lock. Vacuum swaps in trimmed lists rather than editing
+    them, so a concurrent reader keeps walking the list it started on.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chains: Dict[str, List[Version]] = {}
+        self.commit_ts = 0  # Timestamp of the latest published commit
+
+    def snapshot(self) -> int:
+        """Timestamp of a snapshot covering every commit published so far."""
+        return self.commit_ts
+
+    def read(self, item: str, snapshot_ts: Optional[int] = None, default=None):
+        """Value of item as of snapshot_ts (None = latest committed)."""
+        chain = self.chains.get(item)
+        if chain:
+            if snapshot_ts is None:
+                return chain[-1][1]
+            for ts, value in reversed(chain):
+                if ts <= snapshot_ts:
+                    return value
+        return default
+
+    def latest_ts(self, item: str) -> int:
+        """Commit timestamp of the newest version of item (0 if none)."""
+        chain = self.chains.get(item)
+        return chain[-1][0] if chain else 0
+
+    def install(self, writes: Dict[str, object]) -> int:
+        """Commit writes as one new version per item; returns the commit timestamp."""
+        with self.lock:
+            ts = self.commit_ts + 1
+            for item, value in writes.items():
+                chain = self.chains.get(item)
+                if chain is None:
+                    self.chains[item] = [(ts, value)]
+                else:
+                    chain.append((ts, value))
+            # Publish only after every version is in place
+            self.commit_ts = ts
+        return ts
+
+    def vacuum(self, oldest_snapshot: int) -> int:
+        """
+        Drop versions no snapshot >= oldest_snapshot can see: per item,
+        everything older than the newest version at or before it.
+
+        Returns:
+            Number of versions removed
+        """
+        removed = 0
+        with self.lock:
+            for item, chain in self.chains.items():
+                keep = len(chain) - 1
+                while keep > 0 and chain[keep][0] > oldest_snapshot:
+                    keep -= 1
+                if keep > 0:
+                    self.chains[item] = chain[keep:]
+                    removed += keep
+        return removed
+
+    def version_count(self) -> int:
+        """Total versions held."""
+        with self.lock:
+            return sum(len(chain) for chain in self.chains.values())
@@ -0,0 +1,366 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# Record framing: payload length and CRC32, then the JSON payload
+HEADER = struct.Struct(">II")
+
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+
+class WriteAheadLog:
+    """
+    Append-only redo/undo log for transactions committed through LockManager.
+
+    Every write is logged with its before and after image and applied to
+    an in-memory image of the database, as a steal buffer pool would.
+    Commit appends a commit record and blocks until it is durable; aborts
+    restore the before images. Records go to numbered segment files
+    (wal-<first lsn>.log), each framed with a length and CRC32 so a torn
+    tail is detected on recovery.
+
+    Group commit: the first committer to need a flush becomes the leader,
+    waits up to group_commit_window for others to append, then issues one
+    fsync that covers every record appended so far. Committers arriving
+    while a flush is in progress wait for the next one, so fsyncs per
+    second stay roughly constant while commits per second grow with the
+    number of concurrent committers.
+
+    If a commit's flush fails, the log is failed for good: everything not
+    yet synced (that commit record included) is cut off the segment, the
+    committer's writes are undone in the image, and every later log
+    call raises. Records are buffered here and written unbuffered, so
+    nothing can reach the file after that.
+
+    Values must be JSON-serialisable.
+    """
+
+    def __init__(self, directory: str, group_commit_window: float = 0.001,
+                 segment_size: int = 16 * 1024 * 1024, sync: bool = True):
+        """
+        Open (or create) the log in directory and recover from it.
+
+        Args:
+            directory: Where segment files live
+            group_commit_window: Seconds a flush leader waits for more
+                       committers before syncing (0 = sync immediately)
+            segment_size: Bytes after which appends roll to a new segment
+            sync: If False, skip fsync (flush to the OS only); for testing
+        """
+        self.directory = directory
+        self.group_commit_window = group_commit_window
+        self.segment_size = segment_size
+        self.sync = sync
+        os.makedirs(directory, exist_ok=True)
+
+        # Guards appends, the image and the undo table
+        self.lock = threading.Lock()
+
+        # Committed-and-in-flight state, and undo entries of live transactions:
+        # tid -> [(lsn, item, had_before, before), ...]
+        self.image: Dict[str, object] = {}
+        self.undo: Dict[int, List[Tuple[int, str, bool, object]]] = {}
+
+        # Group commit state, guarded by flush_cond
+        self.flush_cond = threading.Condition()
+        self.flushing = False
+        self.durable_lsn = 0
+        self.failed: Optional[BaseException] = None
+
+        self.stats = {
+            'records': 0,
+            'commits': 0,
+            'fsyncs': 0,
+            'checkpoints': 0,
+            'recovered_commits': 0,
+            'recovered_losers': 0
+        }
+
+        self.next_lsn = 1
+        self.file = None
+        self.buffer = bytearray()  # Records appended but not yet written to the segment
+        self.segment_bytes = 0     # Size of the current segment, buffered records included
+        self.synced_bytes = 0      # Bytes of the current segment known to be synced
+        self.recover()
+
+    # ------------------------------------------------------------------
+    # Logging
+
+    def log_update(self, tid: int, item: str, value):
+        """Log tid's write of value to item and apply it to the image."""
+        with self.lock:
+            self._check()
+            had_before = item in self.image
+            before = self.image.get(item)
+            lsn = self._append({'type': 'update', 'tid': tid, 'item': item,
+                                'had_before': had_before, 'before': before,
+                                'after': value})
+            self.undo.setdefault(tid, []).append((lsn, item, had_before, before))
+            self.image[item] = value
+
+    def commit(self, tid: int):
+        """
+        Append tid's commit record and wait until it is durable. If that
+        fails, the log is failed (see the class docstring) and tid is
+        rolled back in the image before the error is raised.
+        """
+        with self.lock:
+            self._check()
+            lsn = self._append({'type': 'commit', 'tid': tid})
+            entries = self.undo.pop(tid, [])
+            self.stats['commits'] += 1
+        try:
+            self._wait_durable(lsn)
+        except BaseException as e:
+            with self.lock:
+                self._fail(e)
+                # Its commit record was cut off, so recovery sees a loser too
+                for _, item, had_before, before in reversed(entries):
+                    self._restore(item, had_before, before)
+                self.stats['commits'] -= 1
+            raise
+
+    def abort(self, tid: int):
+        """Undo tid's writes in the image and log the abort (no sync needed)."""
+        with self.lock:
+            for _, item, had_before, before in reversed(self.undo.pop(tid, [])):
+                self._restore(item, had_before, before)
+            # A failed log writes nothing more; recovery undoes tid anyway
+            if self.failed is None:
+                self._append({'type': 'abort', 'tid': tid})
+
+    def checkpoint(self):
+        """
+        Start a new segment with a checkpoint record holding the image and
+        the undo entries of live transactions, sync it, and delete every
+        older segment.
+        """
+        with self.lock:
+            self._check()
+            self._open_segment()
+            lsn = self._append({
+                'type': 'checkpoint',
+                'image': self.image,
+                'undo': {str(tid): entries for tid, entries in self.undo.items()}
+            })
+            self._write_buffer()
+            if self.sync:
+                os.fsync(self.file.fileno())
+            self.synced_bytes = self.segment_bytes
+            current = self.file.name
+            for path in self._segments():
+                if path != current:
+                    os.remove(path)
+            self.stats['checkpoints'] += 1
+        with self.flush_cond:
+            self.durable_lsn = max(self.durable_lsn, lsn)
+            self.flush_cond.notify_all()
+
+    def close(self):
+        """Flush, sync and close the current segment."""
+        with self.lock:
+            if self.file is not None:
+                if self.failed is None:
+                    self._write_buffer()
+                    if self.sync:
+                        os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+    def _check(self):
+        """Raise if the log has failed. Caller holds self.lock."""
+        if self.failed is not None:
+            raise OSError("write-ahead log failed earlier") from self.failed
+
+    def _fail(self, error: BaseException):
+        """
+        Fail the log: drop the buffered records and cut the unsynced ones
+        off the segment, so no record after the last successful sync can
+        become durable. Caller holds self.lock.
+        """
+        if self.failed is None:
+            self.failed = error
+            self.buffer = bytearray()
+            try:
+                os.ftruncate(self.file.fileno(), self.synced_bytes)
+            except OSError:
+                pass  # Best effort; nothing more is written either way
+        with self.flush_cond:
+            self.flush_cond.notify_all()
+
+    def _append(self, record: dict) -> int:
+        """Frame and buffer one record. Caller holds self.lock."""
+        if self.segment_bytes >= self.segment_size:
+            self._open_segment()
+        lsn = self.next_lsn
+        self.next_lsn += 1
+        record['lsn'] = lsn
+        payload = json.dumps(record, separators=(',', ':')).encode()
+        self.buffer += HEADER.pack(len(payload), zlib.crc32(payload))
+        self.buffer += payload
+        self.segment_bytes += HEADER.size + len(payload)
+        self.stats['records'] += 1
+        return lsn
+
+    def _write_buffer(self):
+        """Write the buffered records to the segment. Caller holds self.lock."""
+        view = memoryview(self.buffer)
+        while view:
+            view = view[self.file.write(view):]
+        view.release()
+        self.buffer.clear()
+
+    def _open_segment(self):
+        """Sync and close the current segment, start the next one. Caller holds self.lock."""
+        if self.file is not None:
+            self._write_buffer()
+            if self.sync:
+                os.fsync(self.file.fileno())
+            self.file.close()
+            with self.flush_cond:
+                self.durable_lsn = max(self.durable_lsn, self.next_lsn - 1)
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self.next_lsn:016d}{SEGMENT_SUFFIX}")
+        # A leftover file of this name can only hold a torn, unreplayed tail.
+        # Unbuffered: _write_buffer decides when records reach the file.
+        self.file = open(path, "wb", buffering=0)
+        self.segment_bytes = self.synced_bytes = 0
+
+    def _wait_durable(self, lsn: int):
+        """Block until every record up to lsn is on disk, leading a flush if none is running."""
+        with self.flush_cond:
+            while self.durable_lsn < lsn:
+                if self.failed is not None:
+                    raise OSError("write-ahead log failed before the record was durable") from self.failed
+                if self.flushing:
+                    self.flush_cond.wait()
+                    continue
+                self.flushing = True
+                self.flush_cond.release()
+                try:
+                    target = self._flush()
+                finally:
+                    self.flush_cond.acquire()
+                    self.flushing = False
+                    self.flush_cond.notify_all()
+                self.durable_lsn = max(self.durable_lsn, target)
+                self.flush_cond.notify_all()
+
+    def _flush(self) -> int:
+        """Let the batch fill, then sync everything appended so far. Returns the last lsn covered."""
+        if self.group_commit_window > 0:
+            time.sleep(self.group_commit_window)
+        with self.lock:
+            self._check()
+            self._write_buffer()
+            target = self.next_lsn - 1
+            file, size = self.file, self.segment_bytes
+            # A duplicate stays valid if the segment is rotated meanwhile
+            fd = os.dup(self.file.fileno())
+        try:
+            if self.sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self.lock:
+            if self.file is file:  # Else rotation synced it and reset the count
+                self.synced_bytes = max(self.synced_bytes, size)
+            self.stats['fsyncs'] += 1
+        return target
+
+    # ------------------------------------------------------------------
+    # Recovery
+
+    def _segments(self) -> List[str]:
+        """Segment paths in log order."""
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    @staticmethod
+    def _read_segment(path: str) -> Tuple[List[dict], bool]:
+        """
+        Records of a segment, up to a torn or corrupt tail.
+
+        Returns:
+            (records, True if the whole segment was intact)
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        records = []
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            length, crc = HEADER.unpack_from(data, offset)
+            payload = data[offset + HEADER.size:offset + HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return records, False
+            records.append(json.loads(payload))
+            offset += HEADER.size + length
+        return records, offset == len(data)
+
+    def _restore(self, item: str, had_before: bool, before):
+        """Put item back to its before image."""
+        if had_before:
+            self.image[item] = before
+        else:
+            self.image.pop(item, None)
+
+    def recover(self):
+        """
+        Rebuild the image from the log: start from the last checkpoint,
+        redo every update in log order (repeating history), undo aborted
+        transactions as their abort records are met, then undo the
+        transactions that never committed, newest write first. Ends with
+        a fresh checkpoint so the replayed segments can be dropped.
+
+        Only the final segment may end in a torn or corrupt record (a
+        crash mid-append); nothing after it was acknowledged, so replay
+        stops there. A bad record in an earlier segment raises ValueError:
+        later segments hold acknowledged commits, and the checkpoint would
+        delete them.
+        """
+        image: Dict[str, object] = {}
+        undo: Dict[int, list] = {}
+        last_lsn = 0
+        commits = 0
+        segments = self._segments()
+        for index, path in enumerate(segments):
+            records, intact = self._read_segment(path)
+            if not intact and index < len(segments) - 1:
+                raise ValueError(f"{path} is corrupt after {len(records)} records "
+                                 f"and is not the last segment")
+            for record in records:
+                last_lsn = record['lsn']
+                kind = record['type']
+                if kind == 'checkpoint':
+                    image = record['image']
+                    undo = {int(tid): [tuple(entry) for entry in entries]
+                            for tid, entries in record['undo'].items()}
+                elif kind == 'update':
+                    undo.setdefault(record['tid'], []).append(
+                        (record['lsn'], record['item'], record['had_before'], record['before']))
+                    image[record['item']] = record['after']
+                elif kind == 'commit':
+                    undo.pop(record['tid'], None)
+                    commits += 1
+                elif kind == 'abort':
+                    for _, item, had_before, before in reversed(undo.pop(record['tid'], [])):
+                        if had_before:
+                            image[item] = before
+                        else:
+                            image.pop(item, None)
+
+        self.image = image
+        losers = sorted((entry for entries in undo.values() for entry in entries), reverse=True)
+        for _, item, had_before, before in losers:
+            self._restore(item, had_before, before)
+        self.undo = {}
+        self.next_lsn = last_lsn + 1
+        self.durable_lsn = last_lsn
+        self.stats['recovered_commits'] = commits
+        self.stats['recovered_losers'] = len(undo)
+        self.checkpoint()
@@ -0,0 +1,86 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from create_512mb_file import create_test_file
+from external_merge_sort import ExternalMergeSort
+
+INPUT_MB = 128       # Size of the generated input when none is given
+MEMORY_MB = 16       # Budget per run, so the input spills to several runs
+FORMATS = ['text', 'binary']
+
+
+def run_workload(input_path, run_format):
+    """
+    Form runs from input_path in run_format, then time one merge pass
+    that merges them all into a single run of the same format.
+
+    Returns:
+        (runs, bytes read by the pass, bytes written, wall seconds, CPU seconds)
+    """
+    sorter = ExternalMergeSort(MEMORY_MB * 1024 * 1024, run_format=run_format)
+    run_dir = tempfile.mkdtemp(prefix='bench_runs_')
+    try:
+        runs = sorter.form_runs(input_path, run_dir)
+        sorter.fan_in = max(len(runs), 2)
+        bytes_read = sum(os.path.getsize(run) for run in runs)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        merged = sorter.merge_pass(runs, run_dir, 1)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+
+        bytes_written = sum(os.path.getsize(run) for run in merged)
+        return len(runs), bytes_read, bytes_written, wall, cpu
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of one merge pass over text vs binary runs")
+    parser.add_argument('input', nargs='?', help=f"Input file (default: generate {INPUT_MB} MB)")
+    args = parser.parse_args()
+
+    input_path = args.input
+    if input_path is None:
+        input_path = os.path.join(tempfile.mkdtemp(prefix='bench_input_'), 'input.txt')
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_test_file(input_path, INPUT_MB * 1024 * 1024)
+
+    try:
+        print("=" * 60)
+        print("RUN FORMAT MERGE PASS BENCHMARK")
+        print("=" * 60)
+        print(f"Input: {os.path.getsize(input_path) / (1024 * 1024):.0f} MB, "
+              f"{MEMORY_MB} MB runs, one pass merging all runs into one")
+
+        header = f"{'Format':<8}{'Runs':>6}{'Read MB':>10}{'Written MB':>12}{'Wall s':>9}{'CPU s':>9}"
+        print()
+        print(header)
+        print("-" * len(header))
+        results = {}
+        for run_format in FORMATS:
+            runs, bytes_read, bytes_written, wall, cpu = run_workload(input_path, run_format)
+            results[run_format] = (bytes_read + bytes_written, wall, cpu)
+            print(f"{run_format:<8}{runs:>6}{bytes_read / 2 ** 20:>10.1f}"
+                  f"{bytes_written / 2 ** 20:>12.1f}{wall:>9.2f}{cpu:>9.2f}")
+
+        text_io, text_wall, text_cpu = results['text']
+        binary_io, binary_wall, binary_cpu = results['binary']
+        print("-" * len(header))
+        print(f"Binary runs save {1 - binary_io / text_io:.0%} of the I/O, "
+              f"{1 - binary_cpu / text_cpu:.0%} of the CPU time and "
+              f"{1 - binary_wall / text_wall:.0%} of the wall time per merge pass")
+        print("=" * 60)
+    finally:
+        if args.input is None:
+            shutil.rmtree(os.path.dirname(input_path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,67 +1,194 @@
-import random
+import argparse
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 
-def create_512mb_file(filename='test_512mb.txt'):
+import numpy as np
+
+from verify_file import print_stats, scan
+
+BLOCK_SIZE = 8 * 1024 * 1024  # Bytes generated per task; each block is seeded on its own
+MAX_DIGITS = 7                # Numbers are 1 to 9,999,999
+MAX_LINE = MAX_DIGITS + 1     # Longest line: digits + newline
+
+def format_lines(numbers):
     """
-    Create a 512 MB file with random numbers.
-    Each line contains a random integer.
+    Render positive integers as newline-terminated decimal lines in one
+    vectorized pass: build a (n, 8) matrix of ASCII digits plus newline,
+    then drop the leading-zero columns of each row.
+    """
+    numbers = np.asarray(numbers, dtype=np.uint32)
+    chars = np.empty((len(numbers), MAX_LINE), dtype=np.uint8)
+    keep = np.ones((len(numbers), MAX_LINE), dtype=bool)
+    power = 1
+    for column in range(MAX_DIGITS - 1, -1, -1):
+        chars[:, column] = numbers // power % 10 + ord('0')
+        keep[:, column] = numbers >= power
+        power *= 10
+    chars[:, MAX_DIGITS] = ord('\n')
+    # Boolean indexing walks row-major, so lines stay in order
+    return chars[keep]
+
+def line_lengths(numbers):
+    """Bytes per line (digits + newline) of each number."""
+    lengths = np.ones(len(numbers), dtype=np.int64)
+    power = 1
+    for _ in range(MAX_DIGITS):
+        lengths += numbers >= power
+        power *= 10
+    return lengths
+
+def generate_block(seed, index, size):
+    """
+    Build exactly size bytes of lines for block index.
+
+    Random lines are taken while they fit; the leftover bytes (never a
+    lone byte, which can't hold a line) are filled with short numbers of
+    just the right width, so blocks can be written back to back.
+
+    Returns:
+        (bytes as a uint8 array, number of lines)
     """
-    target_size = 512 * 1024 * 1024  # 512 MB in bytes
-    avg_bytes_per_line = 8  # Average: number + newline
-    estimated_lines = target_size // avg_bytes_per_line
-    
+    rng = np.random.default_rng([seed, index])
+    # Lines average ~7.9 bytes, so size // 7 + 1 numbers always overshoot
+    numbers = rng.integers(1, 10 ** MAX_DIGITS, size // (MAX_LINE - 1) + 1, dtype=np.uint32)
+    ends = np.cumsum(line_lengths(numbers))
+    count = int(np.searchsorted(ends, size, side='right'))
+    remaining = size - (int(ends[count - 1]) if count else 0)
+    if remaining == 1:
+        count -= 1
+        remaining = size - (int(ends[count - 1]) if count else 0)
+
+    fillers = []
+    while remaining:
+        width = min(remaining, MAX_LINE)
+        if remaining - width == 1:
+            width -= 1
+        digits = width - 1
+        fillers.append(rng.integers(10 ** (digits - 1), 10 ** digits, dtype=np.uint32))
+        remaining -= width
+
+    data = format_lines(np.concatenate([numbers[:count], np.array(fillers, dtype=np.uint32)]))
+    return data, count + len(fillers)
+
+def write_block(task):
+    """Generate one block and pwrite it at its offset. Runs in a worker process."""
+    filename, seed, index, offset, size = task
+    data, lines = generate_block(seed, index, size)
+    fd = os.open(filename, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    finally:
+        os.close(fd)
+    return size, lines
+
+def create_test_file(filename, target_size, seed=42, workers=None):
+    """
+    Create a file of exactly target_size bytes with one random integer
+    (1 to 9,999,999) per line.
+
+    The file is cut into BLOCK_SIZE blocks, each generated from its own
+    (seed, block index) stream and written into its disjoint region with
+    os.pwrite by a process pool, so the content depends only on seed and
+    target_size, not on the number of workers.
+
+    Args:
+        filename: Output path
+        target_size: Size in bytes (must not be 1)
+        seed: Random seed
+        workers: Worker processes (default: one per CPU)
+
+    Returns:
+        Number of lines written
+    """
+    if target_size == 1:
+        raise ValueError("a 1-byte file can't hold a line")
+    workers = workers or os.cpu_count() or 1
+    target_mb = target_size / (1024 * 1024)
+
     print("=" * 60)
-    print("CREATING 512 MB TEST FILE")
+    print(f"CREATING {target_mb:g} MB TEST FILE")
     print("=" * 60)
-    print(f"Target size: 512 MB")
-    print(f"Estimated lines: {estimated_lines:,}")
+    print(f"Target size: {target_size:,} bytes")
+    print(f"Seed: {seed}")
+    print(f"Workers: {workers}")
     print(f"Output file: {filename}")
     print("=" * 60)
-    
+
     start_time = time.time()
+
+    # Preallocate so workers can write their regions in any order
+    with open(filename, 'wb') as f:
+        f.truncate(target_size)
+
+    tasks = []
+    for index, offset in enumerate(range(0, target_size, BLOCK_SIZE)):
+        size = min(BLOCK_SIZE, target_size - offset)
+        # A 1-byte tail can't hold a line; fold it into the previous block
+        if target_size - (offset + size) == 1:
+            size += 1
+        tasks.append((filename, seed, index, offset, size))
+        if offset + size == target_size:
+            break
+
     current_size = 0
     lines_written = 0
-    
-    with open(filename, 'w') as f:
-        while current_size < target_size:
-            # Generate random number (1 to 9,999,999)
-            number = random.randint(1, 9999999)
-            line = f"{number}\n"
-            f.write(line)
-            
-            current_size += len(line)
-            lines_written += 1
-            
-            # Progress update every 5 million lines
-            if lines_written % 5_000_000 == 0:
+    reported = 0
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        results = pool.map(write_block, tasks) if pool else map(write_block, tasks)
+        for size, lines in results:
+            current_size += size
+            lines_written += lines
+
+            # Progress update every 64 MB
+            if current_size - reported >= 64 * 1024 * 1024 or current_size == target_size:
+                reported = current_size
                 progress_mb = current_size / (1024 * 1024)
                 percent = (current_size / target_size) * 100
                 elapsed = time.time() - start_time
-                print(f"Progress: {progress_mb:.1f} MB / 512 MB ({percent:.1f}%) | "
+                print(f"Progress: {progress_mb:.1f} MB / {target_mb:g} MB ({percent:.1f}%) | "
                       f"{lines_written:,} lines | {elapsed:.1f}s elapsed")
-    
+    finally:
+        if pool:
+            pool.shutdown()
+
     # Final statistics
     elapsed_time = time.time() - start_time
-    actual_size_mb = current_size / (1024 * 1024)
-    
+    actual_size_mb = os.path.getsize(filename) / (1024 * 1024)
+
     print("\n" + "=" * 60)
     print("✓ FILE CREATED SUCCESSFULLY!")
     print("=" * 60)
     print(f"File: {filename}")
     print(f"Size: {actual_size_mb:.2f} MB")
     print(f"Lines: {lines_written:,}")
-    print(f"Time taken: {elapsed_time:.1f} seconds")
+    print(f"Time taken: {elapsed_time:.2f} seconds ({actual_size_mb / max(elapsed_time, 1e-9):,.0f} MB/s)")
     print("=" * 60)
-    
-    # Show sample of file content
-    print("\nSample content (first 10 lines):")
-    with open(filename, 'r') as f:
-        for i in range(10):
-            line = f.readline().strip()
-            if line:
-                print(f"  {line}")
-    
+
+    # One streaming pass over the result
+    print()
+    print_stats(scan(filename), "File statistics:")
+
     print("\n✓ Ready to use with merge sort!")
+    return lines_written
+
+def create_512mb_file(filename='test_512mb.txt', seed=42, workers=None):
+    """
+    Create a 512 MB file with random numbers.
+    Each line contains a random integer.
+    """
+    return create_test_file(filename, 512 * 1024 * 1024, seed, workers)
 
 if __name__ == "__main__":
-    create_512mb_file()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate a file of random integers, one per line")
+    parser.add_argument('filename', nargs='?', default='test_512mb.txt')
+    parser.add_argument('--size-mb', type=float, default=512, help="Target size in MB")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None, help="Default: one per CPU")
+    args = parser.parse_args()
+    create_test_file(args.filename, int(args.size_mb * 1024 * 1024), args.seed, args.workers)
@@ -0,0 +1,855 @@
+import argparse
+import heapq
+import mmap
+import os
+import queue
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+MAX_DIGITS = 10                 # Widest uint32 in decimal
+MIN_BUFFER = 1024 * 1024        # Smallest per-run merge buffer worth using
+READ_CHUNK = 8 * 1024 * 1024    # Bytes of input parsed at a time during run formation
+WRITE_CHUNK = 4 * 1024 * 1024   # Values handed to the write-behind thread at a time
+SAMPLES_PER_WORKER = 64         # Splitter candidates drawn per merge partition
+SELECTION_BATCHES = 8           # Replacement selection replaces memory / 8 values per step
+
+# Binary run file: magic, format version, value count, then little-endian uint32s
+RUN_HEADER = struct.Struct('<4sIQ')
+RUN_MAGIC = b'EMSR'
+RUN_VERSION = 1
+RUN_DTYPE = np.dtype('<u4')
+
+
+def parse_lines(data) -> np.ndarray:
+    """
+    Parse newline-terminated decimal lines into a uint32 array, one
+    vectorized pass per digit position counted from the end of the line.
+    """
+    chars = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(chars == ord('\n'))
+    lengths = np.diff(ends, prepend=-1) - 1
+    # Digit values behind MAX_DIGITS bytes of zero padding, so stepping
+    # back from the first line's end never leaves the array
+    digits = np.zeros(len(chars) + MAX_DIGITS, dtype=np.uint8)
+    np.subtract(chars, ord('0'), out=digits[MAX_DIGITS:])
+    shortest, longest = (int(lengths.min()), int(lengths.max())) if len(ends) else (0, 0)
+
+    values = np.zeros(len(ends), dtype=np.uint32)
+    index = ends + MAX_DIGITS
+    column = np.empty(len(ends), dtype=np.uint8)
+    scaled = np.empty(len(ends), dtype=np.uint32)
+    scale = 1
+    for position in range(1, longest + 1):
+        index -= 1
+        np.take(digits, index, out=column)
+        if position > shortest:
+            # Lines shorter than position: that byte belongs to an earlier line
+            column[lengths < position] = 0
+        np.multiply(column, np.uint32(scale), out=scaled)
+        values += scaled
+        scale *= 10
+    if shortest == 0:
+        values = values[lengths > 0]
+    return values
+
+
+def format_lines(values) -> bytes:
+    """Render uint32 values as newline-terminated decimal lines."""
+    values = np.asarray(values, dtype=np.uint32)
+    chars = np.empty((len(values), MAX_DIGITS + 1), dtype=np.uint8)
+    keep = np.ones((len(values), MAX_DIGITS + 1), dtype=bool)
+    power = 1
+    for column in range(MAX_DIGITS - 1, -1, -1):
+        chars[:, column] = values // power % 10 + ord('0')
+        keep[:, column] = values >= power
+        power *= 10
+    # Zero is the one value whose only digit is a leading zero
+    keep[:, MAX_DIGITS - 1] = True
+    chars[:, MAX_DIGITS] = ord('\n')
+    return chars[keep].tobytes()
+
+
+def line_start(fd: int, pos: int, size: int) -> int:
+    """Offset of the first line starting at or after byte pos of a file of size bytes."""
+    if pos <= 0:
+        return 0
+    while pos < size:
+        # Include the byte before pos: if it is a newline, pos starts a line
+        window = os.pread(fd, MAX_DIGITS + 1, pos - 1)
+        index = window.find(b'\n')
+        if index >= 0:
+            return pos + index
+        if pos - 1 + len(window) >= size:
+            break
+        pos += len(window) - 1
+    return size
+
+
+def value_at(fd: int, pos: int, size: int):
+    """Value of the first line starting at or after pos, or None if there is none."""
+    start = line_start(fd, pos, size)
+    if start >= size:
+        return None
+    return int(os.pread(fd, MAX_DIGITS + 1, start).split(b'\n', 1)[0])
+
+
+def upper_bound(fd: int, size: int, value) -> int:
+    """Offset of the first line of a sorted file holding more than value (size if none)."""
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        found = value_at(fd, mid, size)
+        if found is None or found > value:
+            hi = mid
+        else:
+            lo = mid + 1
+    return line_start(fd, lo, size)
+
+
+def open_run(path: str) -> np.ndarray:
+    """
+    Map a binary run read-only and return its values as a zero-copy
+    array, hinting the kernel to read ahead sequentially.
+    """
+    with open(path, 'rb') as f:
+        magic, version, count = RUN_HEADER.unpack(f.read(RUN_HEADER.size))
+        if magic != RUN_MAGIC or version != RUN_VERSION:
+            raise ValueError(f"{path} is not a version {RUN_VERSION} run file")
+        if os.fstat(f.fileno()).st_size != RUN_HEADER.size + count * RUN_DTYPE.itemsize:
+            raise ValueError(f"{path} is truncated")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, 'madvise'):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return np.frombuffer(mapped, dtype=RUN_DTYPE, count=count, offset=RUN_HEADER.size)
+
+
+class TextRunReader:
+    """Reads a file of decimal lines (or its byte range start..end) as blocks of uint32 values."""
+
+    suffix = '.txt'
+
+    def __init__(self, path: str, buffer_size: int, start: int = 0, end: int = None):
+        self.file = open(path, 'rb', buffering=0)
+        self.file.seek(start)
+        self.buffer_size = buffer_size
+        self.remaining = (os.fstat(self.file.fileno()).st_size if end is None else end) - start
+        self.carry = b''
+        self.bytes_parsed = 0
+
+    def read_block(self):
+        """Next block of about buffer_size bytes worth of values, or None at the end."""
+        while True:
+            data = self.file.read(min(self.buffer_size, self.remaining)) if self.remaining else b''
+            self.remaining -= len(data)
+            if not data:
+                self.close()
+                if self.carry:
+                    # Last line without a trailing newline
+                    self.bytes_parsed += len(self.carry)
+                    block, self.carry = parse_lines(self.carry + b'\n'), b''
+                    return block
+                return None
+            data = self.carry + data
+            cut = data.rfind(b'\n') + 1
+            self.carry = data[cut:]
+            if cut:
+                self.bytes_parsed += cut
+                return parse_lines(memoryview(data)[:cut])
+
+    def close(self):
+        self.file.close()
+
+    @staticmethod
+    def sample(path: str, count: int) -> list:
+        """About count values taken at evenly spaced byte offsets."""
+        size = os.path.getsize(path)
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            values = (value_at(fd, pos, size)
+                      for pos in range(size // (2 * count), size, max(size // count, 1)))
+            return [value for value in values if value is not None]
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def cuts(path: str, splitters: list) -> list:
+        """Byte offsets [0, first line > each splitter..., size] of a sorted run."""
+        size = os.path.getsize(path)
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return [0] + [upper_bound(fd, size, splitter) for splitter in splitters] + [size]
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def text_size(path: str, start: int, end: int) -> int:
+        """Bytes the range start..end takes as text: the range itself."""
+        return end - start
+
+
+class BinaryRunReader:
+    """
+    Reads a binary run (or its value range start..end) as blocks of
+    uint32 values. Blocks are views of the mapped file, so nothing is
+    parsed or copied until the merge combines them.
+    """
+
+    suffix = '.run'
+
+    def __init__(self, path: str, buffer_size: int, start: int = 0, end: int = None):
+        self.values = open_run(path)[start:end]
+        self.block_values = max(1, buffer_size // RUN_DTYPE.itemsize)
+        self.position = 0
+
+    def read_block(self):
+        """Next view of up to buffer_size bytes of values, or None at the end."""
+        if self.values is None or self.position >= len(self.values):
+            self.close()
+            return None
+        block = self.values[self.position:self.position + self.block_values]
+        self.position += len(block)
+        return block
+
+    def close(self):
+        # The mapping is released once the last view of it is dropped
+        self.values = None
+
+    @staticmethod
+    def sample(path: str, count: int) -> list:
+        """About count values taken at evenly spaced positions."""
+        values = open_run(path)
+        if not len(values):
+            return []
+        step = max(len(values) // count, 1)
+        return values[step // 2::step].tolist()
+
+    @staticmethod
+    def cuts(path: str, splitters: list) -> list:
+        """Value indices [0, first value > each splitter..., count] of a sorted run."""
+        values = open_run(path)
+        return [0] + np.searchsorted(values, splitters, side='right').tolist() + [len(values)]
+
+    @staticmethod
+    def text_size(path: str, start: int, end: int) -> int:
+        """
+        Bytes values start..end take as decimal lines: two per value (one
+        digit and the newline) plus one for each power of ten it reaches,
+        counted by binary search since the run is sorted.
+        """
+        values = open_run(path)[start:end]
+        thresholds = [10 ** digits for digits in range(1, MAX_DIGITS)]
+        below = np.searchsorted(values, thresholds, side='left')
+        return int(2 * len(values) + (len(values) - below).sum())
+
+
+class RunWriter:
+    """
+    Base for run writers. Encoding and writing happen on a write-behind
+    thread so the caller can keep merging; at most two chunks are queued,
+    which bounds the extra memory.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+        self.queue = queue.Queue(maxsize=2)
+        self.error = None
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def write(self, values: np.ndarray):
+        if self.error:
+            raise self.error
+        self.count += len(values)
+        for start in range(0, len(values), WRITE_CHUNK):
+            self.queue.put(values[start:start + WRITE_CHUNK])
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is None:
+            self._finish()
+        self.file.close()
+        if self.error:
+            raise self.error
+
+    def _encode(self, values: np.ndarray):
+        raise NotImplementedError
+
+    def _finish(self):
+        """Called once every chunk is written, before the file is closed."""
+
+    def _drain(self):
+        while True:
+            values = self.queue.get()
+            if values is None:
+                return
+            if self.error is None:
+                try:
+                    self.file.write(self._encode(values))
+                except BaseException as e:
+                    # Keep draining so the producer never blocks on put;
+                    # write() and close() re-raise it on its thread
+                    self.error = e
+
+
+class TextRunWriter(RunWriter):
+    """
+    Writes sorted uint32 values as decimal lines, to a new file or, given
+    an offset, into an existing one from that offset on.
+    """
+
+    def __init__(self, path: str, offset: int = None):
+        if offset is None:
+            file = open(path, 'wb')
+        else:
+            file = open(path, 'r+b')
+            file.seek(offset)
+        super().__init__(file)
+
+    def _encode(self, values: np.ndarray):
+        return format_lines(values)
+
+
+class BinaryRunWriter(RunWriter):
+    """
+    Writes sorted values as a binary run: a RUN_HEADER (magic, version,
+    value count) followed by little-endian uint32s. The count is filled in
+    on close, so a run cut short by a crash fails validation in open_run.
+    """
+
+    def __init__(self, path: str):
+        file = open(path, 'wb')
+        file.write(RUN_HEADER.pack(RUN_MAGIC, RUN_VERSION, 0))
+        super().__init__(file)
+
+    def _encode(self, values: np.ndarray):
+        return memoryview(np.ascontiguousarray(values, dtype=RUN_DTYPE))
+
+    def _finish(self):
+        self.file.seek(0)
+        self.file.write(RUN_HEADER.pack(RUN_MAGIC, RUN_VERSION, self.count))
+
+
+# Ways to form the initial runs
+RUN_FORMATIONS = ('load_sort', 'replacement_selection')
+
+# Run format name -> (reader, writer)
+RUN_FORMATS = {
+    'text': (TextRunReader, TextRunWriter),
+    'binary': (BinaryRunReader, BinaryRunWriter)
+}
+
+
+def merge_runs(readers, writer):
+    """
+    K-way merge of sorted runs, a block at a time.
+
+    A heap orders the runs by the last value of their current block. Its
+    top value is a bound every buffered value <= it can be emitted at:
+    no run holds anything smaller further on. Each step cuts those
+    prefixes from every block, merges them, hands them to the writer and
+    refills the runs whose blocks emptied, so the per-value work stays in
+    NumPy rather than in a Python loop.
+
+    Returns:
+        Number of values written
+    """
+    blocks = [reader.read_block() for reader in readers]
+    heap = []
+    for index, block in enumerate(blocks):
+        while block is not None and len(block) == 0:
+            block = blocks[index] = readers[index].read_block()
+        if block is not None:
+            heap.append((block[-1], index))
+    heapq.heapify(heap)
+
+    written = 0
+    while heap:
+        bound = heap[0][0]
+        pieces = []
+        for index, block in enumerate(blocks):
+            if block is None:
+                continue
+            cut = np.searchsorted(block, bound, side='right')
+            if cut:
+                pieces.append(block[:cut])
+                blocks[index] = block[cut:]
+        merged = pieces[0] if len(pieces) == 1 else np.sort(np.concatenate(pieces), kind='stable')
+        writer.write(merged)
+        written += len(merged)
+
+        # Every run whose last buffered value equals the bound is now empty;
+        # pop them all before refilling, as a new block may end at the bound too
+        emptied = []
+        while heap and heap[0][0] == bound:
+            emptied.append(heapq.heappop(heap)[1])
+        for index in emptied:
+            block = readers[index].read_block()
+            while block is not None and len(block) == 0:
+                block = readers[index].read_block()
+            blocks[index] = block
+            if block is not None:
+                heapq.heappush(heap, (block[-1], index))
+    return written
+
+
+class ValueStream:
+    """Hands out the values of a reader in batches of any size."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.pending = np.empty(0, dtype=np.uint32)
+
+    def take(self, count: int) -> np.ndarray:
+        """Next count values (fewer at the end of the input)."""
+        pieces = [self.pending]
+        available = len(self.pending)
+        while available < count:
+            block = self.reader.read_block()
+            if block is None:
+                break
+            pieces.append(block)
+            available += len(block)
+        values = np.concatenate(pieces) if len(pieces) > 1 else self.pending
+        self.pending = values[count:]
+        return values[:count]
+
+
+def replacement_selection(reader, memory: int, run_format: str, template: str) -> list:
+    """
+    Form runs by replacement selection: memory is kept full of input, the
+    smallest values not below the last one written go to the current run
+    and are replaced from the input, and values arriving below it are held
+    back for the next run. Runs average twice the memory on random input
+    and a sorted input yields a single run.
+
+    Values are selected SELECTION_BATCHES batches per memory load rather
+    than one at a time: the current run's pool is a sorted array, each
+    step writes its smallest batch, reads as many new values and merges
+    those that can still join the run back in, so the per-value work
+    stays in NumPy. Smaller batches approach the classic algorithm.
+
+    Args:
+        reader: TextRunReader over the input
+        memory: Bytes of input held in memory
+        run_format: Format of the runs written
+        template: Run path with a {} for the run index
+
+    Returns:
+        Paths of the runs written
+    """
+    pieces = []
+    while reader.bytes_parsed <= memory - MAX_DIGITS - 1:
+        reader.buffer_size = min(READ_CHUNK, memory - reader.bytes_parsed)
+        block = reader.read_block()
+        if block is None:
+            break
+        pieces.append(block)
+    reader.buffer_size = READ_CHUNK
+    if not pieces:
+        return []
+    current = np.sort(np.concatenate(pieces), kind='stable')
+    del pieces
+    batch = max(1, len(current) // SELECTION_BATCHES)
+    stream = ValueStream(reader)
+    held = []  # Values for the next run
+    runs = []
+    writer_type = RUN_FORMATS[run_format][1]
+
+    while len(current):
+        path = template.format(len(runs))
+        writer = writer_type(path)
+        while len(current):
+            # Copy the batch so the queued write doesn't pin the whole pool
+            written, current = current[:batch].copy(), current[batch:]
+            writer.write(written)
+            incoming = stream.take(len(written))
+            if len(incoming):
+                joins = incoming >= written[-1]
+                held.append(incoming[~joins])
+                incoming = np.sort(incoming[joins])
+                current = np.sort(np.concatenate([current, incoming]), kind='stable')
+        writer.close()
+        runs.append(path)
+        current = np.sort(np.concatenate(held), kind='stable') if held else current
+        held = []
+    return runs
+
+
+def select_range(task) -> list:
+    """Replacement selection over one byte range of the input. Runs in a worker process."""
+    input_path, start, end, memory, run_format, template = task
+    return replacement_selection(TextRunReader(input_path, READ_CHUNK, start, end), memory,
+                                 run_format, template)
+
+
+def sort_range(task) -> str:
+    """Parse, sort and spill the lines in one byte range of the input. Runs in a worker process."""
+    input_path, start, end, run_path, run_format = task
+    reader = TextRunReader(input_path, READ_CHUNK, start, end)
+    pieces = []
+    block = reader.read_block()
+    while block is not None:
+        pieces.append(block)
+        block = reader.read_block()
+    values = np.concatenate(pieces) if pieces else np.empty(0, dtype=np.uint32)
+    values.sort()
+    writer = RUN_FORMATS[run_format][1](run_path)
+    writer.write(values)
+    writer.close()
+    return run_path
+
+
+def merge_ranges(task) -> int:
+    """
+    Merge ranges of sorted runs (byte ranges of text runs, value ranges of
+    binary ones) into output_path, in output_format, at offset (None = a
+    new file). Runs in a worker process for parallel merges.
+
+    Returns:
+        Number of values written
+    """
+    run_format, ranges, output_path, output_format, offset, memory = task
+    reader_type = RUN_FORMATS[run_format][0]
+    buffer_size = max(memory // (len(ranges) + 1), MAX_DIGITS + 1)
+    readers = [reader_type(path, buffer_size, start, end) for path, start, end in ranges]
+    writer_type = RUN_FORMATS[output_format][1]
+    writer = writer_type(output_path) if offset is None else writer_type(output_path, offset)
+    try:
+        return merge_runs(readers, writer)
+    finally:
+        writer.close()
+        for reader in readers:
+            reader.close()
+
+
+class ExternalMergeSort:
+    """
+    Sorts a file of integers (one per line) that need not fit in memory.
+
+    Run formation reads memory_budget bytes of input at a time, parses it
+    into a NumPy array, sorts it in place and spills it as a run. Runs are
+    then merged fan_in at a time, in as many passes as needed, each merge
+    splitting the budget into one read buffer per input plus one for the
+    output.
+
+    run_formation='replacement_selection' forms runs by replacement
+    selection instead of load-sort-spill, about halving their number on
+    random input (see replacement_selection).
+
+    Runs are binary by default (see BinaryRunWriter), so merge passes map
+    them and compare values directly; text is parsed once, on input, and
+    produced once, on final output. run_format='text' keeps runs as
+    decimal lines instead.
+
+    With workers > 1 the budget is shared by a process pool. Run formation
+    cuts the input into newline-aligned byte ranges of memory_budget /
+    workers bytes, each parsed and sorted by one worker; intermediate
+    passes merge their groups in parallel; and the final merge is
+    partitioned: splitters sampled from the runs cut every run into
+    workers value ranges, and each worker merges one range straight into
+    its own disjoint region of the output.
+    """
+
+    def __init__(self, memory_budget: int = 64 * 1024 * 1024, fan_in: int = None,
+                 temp_dir: str = None, workers: int = 1, run_format: str = 'binary',
+                 run_formation: str = 'load_sort'):
+        """
+        Args:
+            memory_budget: Bytes of input per run, and total merge buffer space
+            fan_in: Runs merged at once (default: as many as each worker's
+                    share of the budget allows with MIN_BUFFER per run)
+            temp_dir: Where the run directory is created (default: system temp)
+            workers: Worker processes (1 = sort in this process)
+            run_format: 'binary' or 'text' intermediate runs
+            run_formation: 'load_sort' or 'replacement_selection'
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if run_format not in RUN_FORMATS:
+            raise ValueError(f"Unknown run format: {run_format}")
+        if run_formation not in RUN_FORMATIONS:
+            raise ValueError(f"Unknown run formation: {run_formation}")
+        max_fan_in = memory_budget // workers // MIN_BUFFER - 1
+        if max_fan_in < 2:
+            raise ValueError(f"memory budget must be at least {3 * MIN_BUFFER} bytes per worker")
+        if fan_in is not None and not 2 <= fan_in <= max_fan_in:
+            raise ValueError(f"fan_in must be between 2 and {max_fan_in} for this budget")
+        self.memory_budget = memory_budget
+        self.fan_in = fan_in or max_fan_in
+        self.temp_dir = temp_dir
+        self.workers = workers
+        self.run_format = run_format
+        self.run_formation = run_formation
+        self.pool = None
+        self.phases = []  # (name, seconds, runs produced)
+
+    def sort(self, input_path: str, output_path: str) -> int:
+        """
+        Sort input_path into output_path.
+
+        Returns:
+            Number of values sorted
+        """
+        self.phases = []
+        run_dir = tempfile.mkdtemp(prefix='merge_sort_', dir=self.temp_dir)
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(self.workers)
+        try:
+            start = time.perf_counter()
+            runs = self.form_runs(input_path, run_dir)
+            self.phases.append(('run formation', time.perf_counter() - start, len(runs)))
+
+            pass_number = 0
+            while len(runs) > self.fan_in:
+                pass_number += 1
+                start = time.perf_counter()
+                runs = self.merge_pass(runs, run_dir, pass_number)
+                self.phases.append((f'merge pass {pass_number}', time.perf_counter() - start,
+                                    len(runs)))
+
+            start = time.perf_counter()
+            if self.pool:
+                count = self.partitioned_merge(runs, output_path)
+            else:
+                count = self.merge(runs, output_path)
+            self.phases.append(('final merge', time.perf_counter() - start, 1))
+            return count
+        finally:
+            if self.pool:
+                self.pool.shutdown()
+                self.pool = None
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def run_template(self, run_dir: str, prefix) -> str:
+        """Run path pattern with a {} for the run index."""
+        suffix = RUN_FORMATS[self.run_format][0].suffix
+        return os.path.join(run_dir, f'run-{prefix}-{{:06d}}{suffix}')
+
+    def run_path(self, run_dir: str, pass_number: int, index: int) -> str:
+        """Path of run index written by pass_number (0 = run formation)."""
+        return self.run_template(run_dir, pass_number).format(index)
+
+    def form_runs(self, input_path: str, run_dir: str) -> list:
+        """Split the input into sorted runs of about memory_budget (/ workers) bytes each."""
+        if self.pool:
+            return self.form_runs_parallel(input_path, run_dir)
+        if self.run_formation == 'replacement_selection':
+            return replacement_selection(TextRunReader(input_path, READ_CHUNK), self.memory_budget,
+                                         self.run_format, self.run_template(run_dir, 0))
+        runs = []
+        reader = TextRunReader(input_path, READ_CHUNK)
+        pieces = []
+        run_start = 0
+        while True:
+            # Read no further than the budget; a partial last line rolls over
+            remaining = self.memory_budget - (reader.bytes_parsed - run_start)
+            reader.buffer_size = min(READ_CHUNK, max(remaining, MAX_DIGITS + 1))
+            block = reader.read_block()
+            if block is not None:
+                pieces.append(block)
+            if pieces and (block is None
+                           or reader.bytes_parsed - run_start > self.memory_budget - MAX_DIGITS - 1):
+                values = np.concatenate(pieces)
+                pieces = []
+                run_start = reader.bytes_parsed
+                values.sort()
+                path = self.run_path(run_dir, 0, len(runs))
+                writer = RUN_FORMATS[self.run_format][1](path)
+                writer.write(values)
+                writer.close()
+                runs.append(path)
+            if block is None:
+                return runs
+
+    def form_runs_parallel(self, input_path: str, run_dir: str) -> list:
+        """
+        Form runs from newline-aligned byte ranges of the input on the
+        worker pool: one run per memory_budget / workers bytes, or, with
+        replacement selection, one range per worker selecting runs with
+        its share of the budget.
+        """
+        size = os.path.getsize(input_path)
+        chunk = self.memory_budget // self.workers
+        if self.run_formation == 'replacement_selection':
+            chunk = max(-(-size // self.workers), 1)
+        with open(input_path, 'rb') as f:
+            bounds = sorted({line_start(f.fileno(), pos, size) for pos in range(0, size, chunk)})
+        bounds.append(size)
+        if self.run_formation == 'replacement_selection':
+            tasks = [(input_path, start, end, self.memory_budget // self.workers, self.run_format,
+                      self.run_template(run_dir, f'0-{index:03d}'))
+                     for index, (start, end) in enumerate(zip(bounds, bounds[1:])) if end > start]
+            return [run for runs in self.pool.map(select_range, tasks) for run in runs]
+        tasks = [(input_path, start, end, self.run_path(run_dir, 0, index), self.run_format)
+                 for index, (start, end) in enumerate(zip(bounds, bounds[1:])) if end > start]
+        return list(self.pool.map(sort_range, tasks))
+
+    def merge_pass(self, runs: list, run_dir: str, pass_number: int) -> list:
+        """Merge runs fan_in at a time into new runs (in parallel on a pool), deleting the inputs."""
+        groups = [runs[start:start + self.fan_in] for start in range(0, len(runs), self.fan_in)]
+        merged = [self.run_path(run_dir, pass_number, index) for index in range(len(groups))]
+        memory = self.memory_budget // self.workers
+        tasks = [(self.run_format, [(run, 0, None) for run in group], path, self.run_format,
+                  None, memory) for group, path in zip(groups, merged)]
+        list(self.pool.map(merge_ranges, tasks) if self.pool else map(merge_ranges, tasks))
+        for run in runs:
+            os.remove(run)
+        return merged
+
+    def merge(self, runs: list, output_path: str) -> int:
+        """Merge runs into output_path as text; returns the number of values written."""
+        return merge_ranges((self.run_format, [(run, 0, None) for run in runs], output_path,
+                             'text', None, self.memory_budget))
+
+    def partitioned_merge(self, runs: list, output_path: str) -> int:
+        """
+        Merge runs into output_path on the worker pool. Splitters sampled
+        evenly from the runs (in proportion to their size) cut the key
+        space into workers ranges, and binary search finds where each range
+        starts in every run. The text size of every range is known without
+        merging, so each partition's output offset is fixed up front.
+
+        Returns:
+            Number of values written
+        """
+        reader_type = RUN_FORMATS[self.run_format][0]
+        sizes = [os.path.getsize(run) for run in runs]
+        total = sum(sizes)
+        samples = []
+        for run, size in zip(runs, sizes):
+            count = max(1, SAMPLES_PER_WORKER * self.workers * size // max(total, 1))
+            samples.extend(reader_type.sample(run, count))
+        samples.sort()
+        splitters = sorted({samples[len(samples) * p // self.workers]
+                            for p in range(1, self.workers)}) if samples else []
+        # cuts[r][p]: where partition p starts in run r
+        cuts = [reader_type.cuts(run, splitters) for run in runs]
+
+        memory = self.memory_budget // self.workers
+        tasks = []
+        offset = 0
+        for p in range(len(splitters) + 1):
+            ranges = [(run, cut[p], cut[p + 1]) for run, cut in zip(runs, cuts) if cut[p + 1] > cut[p]]
+            tasks.append((self.run_format, ranges, output_path, 'text', offset, memory))
+            offset += sum(reader_type.text_size(*entry) for entry in ranges)
+        with open(output_path, 'wb') as f:
+            f.truncate(offset)
+        return sum(self.pool.map(merge_ranges, tasks))
+
+
+def compare_run_formations(args) -> bool:
+    """
+    Sort the input once per run formation strategy and print runs and times
+    side by side; with --verify, check each output too.
+
+    Returns:
+        False if a verified output is not a sorted permutation of the input
+    """
+    input_stats = None
+    if args.verify:
+        from verify_file import scan
+        input_stats = scan(args.input)
+    header = f"{'Run formation':<24}{'Runs':>6}{'Forming s':>11}{'Passes':>8}{'Total s':>9}"
+    if input_stats is not None:
+        header += f"{'Verified':>10}"
+    print(header)
+    print("-" * len(header))
+    all_ok = True
+    for run_formation in RUN_FORMATIONS:
+        sorter = ExternalMergeSort(int(args.memory_mb * 1024 * 1024), args.fan_in, args.temp_dir,
+                                   args.workers, args.run_format, run_formation)
+        start_time = time.perf_counter()
+        sorter.sort(args.input, args.output)
+        elapsed = time.perf_counter() - start_time
+        _, forming, runs = sorter.phases[0]
+        row = f"{run_formation:<24}{runs:>6}{forming:>11.2f}{len(sorter.phases) - 1:>8}{elapsed:>9.2f}"
+        if input_stats is not None:
+            output_stats = scan(args.output)
+            ok = output_stats.is_sorted and output_stats.same_values(input_stats)
+            all_ok = all_ok and ok
+            row += f"{'✓' if ok else '✗':>10}"
+        print(row)
+    print("=" * 60)
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="External merge sort of a file of integers")
+    parser.add_argument('input', nargs='?', default='test_512mb.txt')
+    parser.add_argument('output', nargs='?', default='sorted_512mb.txt')
+    parser.add_argument('--memory-mb', type=float, default=64, help="Memory budget in MB")
+    parser.add_argument('--fan-in', type=int, default=None, help="Runs merged at once")
+    parser.add_argument('--temp-dir', default=None, help="Directory for runs")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes")
+    parser.add_argument('--run-format', choices=list(RUN_FORMATS), default='binary',
+                        help="Format of intermediate runs")
+    parser.add_argument('--run-formation', choices=RUN_FORMATIONS, default='load_sort')
+    parser.add_argument('--compare', action='store_true',
+                        help="Sort with every run formation strategy and compare them")
+    parser.add_argument('--verify', action='store_true',
+                        help="Check the output is a sorted permutation of the input")
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    memory_budget = int(args.memory_mb * 1024 * 1024)
+    max_fan_in = memory_budget // args.workers // MIN_BUFFER - 1
+    if max_fan_in < 2:
+        parser.error(f"--memory-mb must be at least {3 * MIN_BUFFER * args.workers / (1024 * 1024):g} "
+                     f"with {args.workers} worker(s)")
+    if args.fan_in is not None and not 2 <= args.fan_in <= max_fan_in:
+        parser.error(f"--fan-in must be between 2 and {max_fan_in} with --memory-mb {args.memory_mb:g}")
+    input_mb = os.path.getsize(args.input) / (1024 * 1024)
+
+    print("=" * 60)
+    print("EXTERNAL MERGE SORT")
+    print("=" * 60)
+    print(f"Input: {args.input} ({input_mb:.1f} MB)")
+    print(f"Output: {args.output}")
+    print(f"Memory budget: {args.memory_mb:g} MB, "
+          f"fan-in {args.fan_in or max_fan_in}, "
+          f"{args.workers} worker(s), {args.run_format} runs")
+    print("=" * 60)
+
+    if args.compare:
+        if not compare_run_formations(args):
+            raise SystemExit(1)
+        return
+
+    sorter = ExternalMergeSort(memory_budget, args.fan_in, args.temp_dir,
+                               args.workers, args.run_format, args.run_formation)
+    start_time = time.perf_counter()
+    count = sorter.sort(args.input, args.output)
+    elapsed = time.perf_counter() - start_time
+
+    header = f"{'Phase':<16}{'Seconds':>10}{'Runs out':>10}{'MB/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, seconds, runs in sorter.phases:
+        print(f"{name:<16}{seconds:>10.2f}{runs:>10}{input_mb / max(seconds, 1e-9):>10.0f}")
+    print("-" * len(header))
+    print(f"{'total':<16}{elapsed:>10.2f}{'':>10}{input_mb / max(elapsed, 1e-9):>10.0f}")
+    print("=" * 60)
+    print(f"✓ Sorted {count:,} values")
+
+    if args.verify:
+        from verify_file import scan
+        start_time = time.perf_counter()
+        input_stats, output_stats = scan(args.input), scan(args.output)
+        ok = output_stats.is_sorted and output_stats.same_values(input_stats)
+        print(f"{'✓' if ok else '✗'} Output is {'' if ok else 'NOT '}a sorted permutation of the "
+              f"input (checked in {time.perf_counter() - start_time:.2f}s)")
+        if not ok:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
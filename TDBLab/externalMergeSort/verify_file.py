@@ -0,0 +1,156 @@
+import argparse
+import mmap
+import os
+import time
+
+import numpy as np
+
+from external_merge_sort import parse_lines
+
+CHUNK_SIZE = 16 * 1024 * 1024  # Bytes parsed per step
+HISTOGRAM_BINS = 10
+HISTOGRAM_MAX = 10_000_000     # Generator's value range; larger values land in the last bin
+
+MASK64 = (1 << 64) - 1
+
+
+def mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer of each value: a well-spread 64-bit hash (uint64 arithmetic wraps)."""
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class FileStats:
+    """
+    Statistics of a file of integers gathered in one pass.
+
+    checksum is the sum of a hash of every value modulo 2^64, so it
+    depends on which values the file holds but not on their order: a
+    sorted output matches its input on count, sum, histogram and
+    checksum.
+    """
+
+    def __init__(self, bins: int = HISTOGRAM_BINS, histogram_max: int = HISTOGRAM_MAX):
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.sum = 0
+        self.checksum = 0
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.bin_width = max(1, -(-histogram_max // bins))
+        self.descents = 0  # Places where a value is smaller than the one before it
+        self.last = None
+
+    @property
+    def is_sorted(self) -> bool:
+        return self.descents == 0
+
+    def update(self, values: np.ndarray):
+        """Fold the next values of the file in."""
+        if not len(values):
+            return
+        self.count += len(values)
+        low, high = int(values.min()), int(values.max())
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+        self.sum += int(values.sum(dtype=np.uint64))
+        self.checksum = (self.checksum + int(mix(values).sum(dtype=np.uint64))) & MASK64
+        bins = np.minimum(values // self.bin_width, len(self.histogram) - 1)
+        self.histogram += np.bincount(bins, minlength=len(self.histogram))
+        self.descents += int(np.count_nonzero(values[1:] < values[:-1]))
+        if self.last is not None and values[0] < self.last:
+            self.descents += 1
+        self.last = values[-1]
+
+    def same_values(self, other: 'FileStats') -> bool:
+        """True if both files appear to hold the same multiset of values."""
+        return (self.count == other.count and self.sum == other.sum
+                and self.checksum == other.checksum and self.minimum == other.minimum
+                and self.maximum == other.maximum
+                and np.array_equal(self.histogram, other.histogram))
+
+
+def scan(path: str, chunk_size: int = CHUNK_SIZE, bins: int = HISTOGRAM_BINS,
+         histogram_max: int = HISTOGRAM_MAX) -> FileStats:
+    """
+    Gather FileStats of a file of decimal lines in a single pass over a
+    read-only memory map, parsing chunk_size bytes (cut at a newline) at
+    a time without copying them.
+    """
+    stats = FileStats(bins, histogram_max)
+    size = os.path.getsize(path)
+    if size == 0:
+        return stats
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, 'madvise'):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    try:
+        view = memoryview(mapped)
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                end = mapped.rfind(b'\n', start, end) + 1 or mapped.find(b'\n', end) + 1 or size
+            chunk = view[start:end]
+            if chunk[-1] != ord('\n'):
+                # Last line without a trailing newline
+                chunk = bytes(chunk) + b'\n'
+            stats.update(parse_lines(chunk))
+            del chunk
+            start = end
+        view.release()
+    finally:
+        mapped.close()
+    return stats
+
+
+def print_stats(stats: FileStats, title: str = None):
+    """Print a FileStats summary."""
+    if title:
+        print(title)
+    print(f"  Count:     {stats.count:,}")
+    print(f"  Min / max: {stats.minimum} / {stats.maximum}")
+    print(f"  Sum:       {stats.sum:,}")
+    print(f"  Checksum:  {stats.checksum:016x}")
+    print(f"  Sorted:    {'yes' if stats.is_sorted else f'no ({stats.descents:,} descents)'}")
+    print("  Histogram:")
+    peak = max(int(stats.histogram.max()), 1)
+    for index, count in enumerate(stats.histogram):
+        low = index * stats.bin_width
+        label = f"{low:,}+" if index == len(stats.histogram) - 1 else f"{low:,}"
+        print(f"    {label:>12} {count:>12,} {'#' * int(30 * count / peak)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One-pass statistics and sort check of an integer file")
+    parser.add_argument('file')
+    parser.add_argument('--input', help="Confirm file is a sorted permutation of this input")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("FILE VERIFICATION")
+    print("=" * 60)
+    start_time = time.perf_counter()
+    stats = scan(args.file)
+    elapsed = time.perf_counter() - start_time
+    size_mb = os.path.getsize(args.file) / (1024 * 1024)
+    print_stats(stats, f"{args.file} ({size_mb:.1f} MB, {size_mb / max(elapsed, 1e-9):.0f} MB/s)")
+
+    ok = True
+    if args.input:
+        input_stats = scan(args.input)
+        print_stats(input_stats, args.input)
+        ok = stats.is_sorted and stats.same_values(input_stats)
+        print("=" * 60)
+        print(f"{'✓' if ok else '✗'} {args.file} is {'' if ok else 'NOT '}a sorted permutation "
+              f"of {args.input}")
+    print("=" * 60)
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()